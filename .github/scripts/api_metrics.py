@@ -0,0 +1,234 @@
+# 导入atexit库，用于在进程退出时写出指标
+import atexit
+# 导入bisect库，用于定位延迟直方图的桶
+import bisect
+# 导入json库，用于输出JSON汇总
+import json
+# 导入logging库，用于记录日志
+import logging
+# 导入os库，用于拼接输出路径
+import os
+# 导入threading库，保证多线程记录指标时的安全
+import threading
+# 导入Counter，用于统计状态码
+from collections import Counter
+
+# 延迟直方图的桶上限（秒），与Prometheus默认桶保持一致
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 这些路径段之后的部分是名称而不是固定路径，例如 branches/{branch}；
+# 名称本身可能包含"/"（如分支 feature/x），因此其后的所有路径段合并为一个占位符
+NAMED_SEGMENTS = {'branches': '{branch}', 'compare': '{basehead}', 'commits': '{ref}', 'contents': '{path}'}
+
+
+def endpoint_template(endpoint):
+    """
+    把具体的端点路径归一化为端点模板，使指标的基数不随数据（仓库、运行、分支、包名）增长，例如
+    "repos/a/b/actions/runs/123?page=2" -> "repos/{o}/{r}/actions/runs/{id}"，
+    "repos/a/b/commits/feature/x" -> "repos/{o}/{r}/commits/{ref}"，
+    "pypi.org/pypi/requests/json" -> "pypi.org/pypi/{path}"（非GitHub主机只保留主机名和第一段路径）。
+
+    参数:
+    endpoint - API端点路径（可带查询参数）；非GitHub主机的请求以"主机名/路径"的形式记录。
+
+    返回:
+    端点模板字符串。
+    """
+    parts = endpoint.split('?', 1)[0].strip('/').split('/')
+    if '.' in parts[0]:
+        return '/'.join(parts[:2] + ['{path}'] if len(parts) > 2 else parts)
+    if parts[0] == 'repos' and len(parts) >= 3:
+        parts[1:3] = ['{o}', '{r}']
+    elif parts[0] in ('users', 'orgs') and len(parts) >= 2:
+        parts[1] = '{u}'
+    for i, part in enumerate(parts):
+        if i > 0 and parts[i - 1] in NAMED_SEGMENTS:
+            parts[i:] = [NAMED_SEGMENTS[parts[i - 1]]]
+            break
+        if part.isdigit():
+            parts[i] = '{id}'
+    return '/'.join(parts)
+
+
+class _EndpointStats:
+    """
+    单个（方法, 端点模板）的统计数据。
+    """
+    __slots__ = ('requests', 'statuses', 'retries', 'bytes', 'latency_sum', 'buckets', 'rate_limit_units')
+
+    def __init__(self):
+        self.requests = 0
+        self.statuses = Counter()
+        self.retries = 0
+        self.bytes = 0
+        self.latency_sum = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # 最后一个桶为 +Inf
+        self.rate_limit_units = 0
+
+
+class APIMetrics:
+    """
+    按端点模板统计请求数、状态码、重试次数、接收字节数、延迟直方图和消耗的速率限制额度。
+    """
+
+    def __init__(self):
+        self._stats = {}
+        self._last_used = {}  # 各资源最近一次的 X-RateLimit-Used，用于估算GraphQL的消耗
+        self._lock = threading.Lock()
+
+    def record(self, method, endpoint, status, latency, response=None, retry=False, resource='core'):
+        """
+        记录一次请求（每次重试单独记录一次）。
+
+        参数:
+        method - 请求方法。
+        endpoint - API端点路径。
+        status - HTTP状态码；连接错误等没有响应时为"error"。
+        latency - 请求耗时（秒）。
+        response - requests.Response对象（可选），用于统计字节数和速率限制消耗。
+        retry - 是否为重试请求。
+        resource - 速率限制资源。
+        """
+        key = (method.upper(), endpoint_template(endpoint))
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _EndpointStats()
+            stats.requests += 1
+            stats.statuses[str(status)] += 1
+            stats.retries += int(retry)
+            stats.latency_sum += latency
+            stats.buckets[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+            if response is not None:
+                stats.bytes += len(response.content or b'')
+                stats.rate_limit_units += self._units_used(response, resource)
+
+    def _units_used(self, response, resource):
+        """
+        估算一次响应消耗的速率限制额度：304不计数；GraphQL按X-RateLimit-Used的增量计算；
+        其余REST请求各计1。
+        """
+        if response.status_code == 304:
+            return 0
+        resource = response.headers.get('X-RateLimit-Resource', resource)
+        used = response.headers.get('X-RateLimit-Used')
+        if resource != 'graphql' or used is None:
+            return 1
+        used = int(used)
+        previous = self._last_used.get(resource)
+        self._last_used[resource] = used
+        if previous is None or used <= previous:
+            return 1
+        return used - previous
+
+    def summary(self):
+        """
+        返回按端点模板汇总的字典，按请求数从高到低排列。
+
+        返回:
+        {"METHOD template": {...}} 字典。
+        """
+        with self._lock:
+            items = sorted(self._stats.items(), key=lambda item: -item[1].requests)
+            return {
+                f"{method} {template}": {
+                    'requests': stats.requests,
+                    'statuses': dict(stats.statuses),
+                    'retries': stats.retries,
+                    'bytes_received': stats.bytes,
+                    'latency_seconds_sum': round(stats.latency_sum, 4),
+                    'latency_seconds_avg': round(stats.latency_sum / stats.requests, 4),
+                    'latency_histogram': dict(zip([str(b) for b in LATENCY_BUCKETS] + ['+Inf'], stats.buckets)),
+                    'rate_limit_units': stats.rate_limit_units,
+                }
+                for (method, template), stats in items
+            }
+
+    def write_json(self, path):
+        """
+        把汇总写入JSON文件。
+
+        参数:
+        path - 输出文件路径。
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+
+    def write_prometheus(self, path):
+        """
+        以Prometheus textfile格式写出指标（供node_exporter的textfile收集器读取）。
+
+        参数:
+        path - 输出文件路径。
+        """
+        lines = [
+            '# HELP github_api_requests_total GitHub API requests by endpoint template and status.',
+            '# TYPE github_api_requests_total counter',
+        ]
+        with self._lock:
+            stats_items = sorted(self._stats.items())
+            for (method, template), stats in stats_items:
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append(
+                        f'github_api_requests_total{{method="{method}",endpoint="{template}",status="{status}"}} {count}'
+                    )
+            for name, attr, help_text in (
+                ('github_api_retries_total', 'retries', 'Retried GitHub API requests.'),
+                ('github_api_received_bytes_total', 'bytes', 'Response bytes received.'),
+                ('github_api_rate_limit_units_total', 'rate_limit_units', 'Rate-limit units consumed.'),
+            ):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} counter')
+                for (method, template), stats in stats_items:
+                    lines.append(f'{name}{{method="{method}",endpoint="{template}"}} {getattr(stats, attr)}')
+            lines.append('# HELP github_api_request_duration_seconds GitHub API request latency.')
+            lines.append('# TYPE github_api_request_duration_seconds histogram')
+            for (method, template), stats in stats_items:
+                labels = f'method="{method}",endpoint="{template}"'
+                cumulative = 0
+                for bound, count in zip([str(b) for b in LATENCY_BUCKETS] + ['+Inf'], stats.buckets):
+                    cumulative += count
+                    lines.append(f'github_api_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'github_api_request_duration_seconds_sum{{{labels}}} {stats.latency_sum:.6f}')
+                lines.append(f'github_api_request_duration_seconds_count{{{labels}}} {stats.requests}')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+
+_shared_metrics = APIMetrics()
+_exit_handler_installed = False
+
+
+def get_metrics():
+    """
+    返回进程内共享的APIMetrics实例。
+
+    返回:
+    APIMetrics实例。
+    """
+    return _shared_metrics
+
+
+def install_exit_handler(directory=None, name='api_metrics'):
+    """
+    注册退出处理函数，进程结束时写出 {name}.json 和 {name}.prom。
+
+    参数:
+    directory - 输出目录，默认读取GH_METRICS_DIR（当前目录）。
+    name - 输出文件名（不含扩展名），同一个作业中的多个脚本使用不同的名称，避免互相覆盖。
+    """
+    global _exit_handler_installed
+    if _exit_handler_installed:
+        return
+    _exit_handler_installed = True
+    directory = directory or os.getenv('GH_METRICS_DIR', '.')
+
+    def write_all():
+        if not _shared_metrics.summary():
+            return
+        os.makedirs(directory, exist_ok=True)
+        _shared_metrics.write_json(os.path.join(directory, f'{name}.json'))
+        _shared_metrics.write_prometheus(os.path.join(directory, f'{name}.prom'))
+        logging.info(f"API指标已写入 {directory}/{name}.json 和 {name}.prom")
+
+    atexit.register(write_all)
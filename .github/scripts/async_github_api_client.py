@@ -0,0 +1,173 @@
+# 导入asyncio库，用于异步调度和延迟操作
+import asyncio
+# 导入logging库，用于记录日志
+import logging
+# 导入os库，用于获取环境变量
+import os
+# 导入requests的异常类型，请求与同步客户端经过同一个传输层
+from requests.exceptions import ConnectionError, HTTPError, Timeout, TooManyRedirects
+
+from rate_limiter import resource_for
+from github_api_client import (
+    apply_response_cache, cache_key_for, default_response_cache, last_page_number, page_items
+)
+from github_transport import get_transport, is_rate_limited, retry_delay, should_retry
+
+# 默认的最大并发请求数，可通过环境变量GH_MAX_CONCURRENCY覆盖
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("GH_MAX_CONCURRENCY", "8"))
+
+
+class AsyncGitHubAPIClient:
+    """
+    异步GitHub API客户端类，接口与GitHubAPIClient保持一致。
+    请求通过共享传输层的 send 在线程中发送，与同步脚本共用同一个连接池、限速器和指标；
+    信号量限制同时在途的请求数量，避免触发GitHub的并发限制。
+    """
+    def __init__(self, max_concurrency=None, cache=None, transport=None):
+        """
+        初始化方法，设置API的基础URL、请求的默认头部、并发信号量和响应缓存。
+
+        参数:
+        max_concurrency - 同时在途请求的上限，默认读取GH_MAX_CONCURRENCY（8）。
+        cache - 可选的ResponseCache实例，默认与同步客户端共用同一个缓存文件。
+        transport - 可选的Transport实例，默认使用进程内共享的传输层。
+        """
+        self.base_url = 'https://api.github.com'  # GitHub API的基础URL
+        self.headers = {
+            'Authorization': f'token {os.getenv("GH_TOKEN")}',
+            'Accept': 'application/vnd.github.v3+json'
+        }
+        self.max_concurrency = max_concurrency or DEFAULT_MAX_CONCURRENCY
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        if cache is None and os.getenv('GH_HTTP_CACHE', '1') != '0':
+            cache = default_response_cache()
+        self.cache = cache
+        self.transport = transport or get_transport()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        """
+        传输层由进程内所有客户端共用，这里不关闭连接池；保留该方法以支持 async with。
+        """
+
+    async def api_request(self, method, endpoint, max_retries=3, expected_statuses=(), **kwargs):
+        """
+        异步发送API请求，并处理重试逻辑。
+
+        参数:
+        method - 请求的方法（GET、POST等）。
+        endpoint - API的端点路径。
+        max_retries - 最大重试次数，默认为3。
+        expected_statuses - 调用方自行处理的错误状态码（如删除运行中的工作流返回的409），
+                            遇到时直接返回响应，不视为失败也不重试。
+        **kwargs - 传递给requests请求方法的额外参数（如json、params）。
+
+        返回:
+        requests.Response对象（与同步客户端一致），如果所有重试都失败，则返回None。
+        """
+        url = f"{self.base_url}/{endpoint}"  # 构建请求的完整URL
+        resource = resource_for(endpoint)  # 请求消耗的速率限制资源
+        kwargs['headers'] = {**self.headers, **kwargs.get('headers', {})}
+        cache_key = None
+        if self.cache is not None and method.upper() == 'GET':
+            cache_key = cache_key_for(url, kwargs.get('params'))
+            kwargs['headers'] = {**self.cache.conditional_headers(cache_key), **kwargs['headers']}
+        retries = 0  # 初始化重试次数
+        while retries < max_retries:
+            response = None
+            try:
+                async with self.semaphore:  # 限制同时在途的请求数量
+                    # 传输层负责限速、刷新速率限制额度和记录指标
+                    response = await asyncio.to_thread(
+                        self.transport.send, method, url, endpoint, resource, retries > 0, **kwargs
+                    )
+                if response.status_code in expected_statuses and not is_rate_limited(response):
+                    return response  # 由调用方处理的状态码（速率限制的403/429仍按统一策略重试）
+                response.raise_for_status()  # 检查响应状态码，如有异常则抛出
+                if cache_key is not None:
+                    response = apply_response_cache(self.cache, cache_key, response)
+                return response  # 返回响应对象
+            except (HTTPError, Timeout, TooManyRedirects, ConnectionError) as e:  # 捕获HTTP错误、连接错误和超时
+                retries += 1  # 增加重试次数
+                logging.error(f"请求失败: {e}, URL: {url}. 重试 {retries}/{max_retries}")  # 记录错误日志
+                if response is not None and response.text:
+                    logging.error(f"响应内容: {response.text}")  # 如果有响应内容，则记录响应内容
+                if not should_retry(method, response):
+                    return None  # 重试也不会成功的错误（如404、422），与同步客户端一致
+                if retries < max_retries:
+                    await asyncio.sleep(retry_delay(retries, response))  # 指数退避或按Retry-After等待
+        return None  # 如果重试次数达到上限，返回None
+
+    async def graphql(self, query, variables=None):
+        """
+        异步发送GraphQL查询。
+
+        参数:
+        query - GraphQL查询语句。
+        variables - 查询变量字典。
+
+        返回:
+        响应中的data字段；请求失败或返回errors时返回None。
+        """
+        response = await self.api_request('POST', 'graphql', json={'query': query, 'variables': variables or {}})
+        if response is None or response.status_code != 200:
+            logging.error("GraphQL请求失败。")
+            return None
+        payload = response.json()
+        if payload.get('errors'):
+            logging.error(f"GraphQL查询返回错误: {payload['errors']}")
+            return None
+        return payload.get('data')
+
+    async def paginate(self, endpoint, params=None, item_key=None, per_page=100, decode=None):
+        """
+        异步遍历分页接口的所有条目。读取第一页的Link头部后，剩余页面同时发出
+        （受信号量限制），条目按页序以异步生成器的方式产出。
+
+        参数:
+        endpoint - API的端点路径（不含page参数）。
+        params - 额外的查询参数。
+        item_key - 条目所在的字段（如"workflow_runs"）；为None时响应本身就是列表。
+        per_page - 每页条目数，默认为100。
+        decode - 可选的解码函数，接收一页响应并返回条目列表，用于代替item_key。
+        """
+        first = await self._fetch_page(endpoint, params, per_page, 1)
+        if first is None:
+            return
+        decode = decode or (lambda response: page_items(response, item_key))
+        for item in decode(first):
+            yield item
+
+        tasks = [
+            asyncio.ensure_future(self._fetch_page(endpoint, params, per_page, page))
+            for page in range(2, last_page_number(first) + 1)
+        ]
+        try:
+            for task in tasks:
+                response = await task
+                if response is None:
+                    break
+                for item in decode(response):
+                    yield item
+        finally:
+            # 调用方提前停止遍历时，取消尚未完成的页面请求
+            for task in tasks:
+                task.cancel()
+
+    async def _fetch_page(self, endpoint, params, per_page, page):
+        """
+        请求分页接口的指定页。
+
+        返回:
+        状态码为200的requests.Response对象，失败时返回None。
+        """
+        response = await self.api_request('GET', endpoint, params={**(params or {}), 'per_page': per_page, 'page': page})
+        if response is None or response.status_code != 200:
+            logging.error(f"获取 {endpoint} 第 {page} 页失败。")
+            return None
+        return response
@@ -0,0 +1,596 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from async_github_api_client import AsyncGitHubAPIClient, DEFAULT_MAX_CONCURRENCY
+from github_api_client import last_page_number
+from github_graphql import fetch_pr_inventory_async
+from pr_snapshot import PullRequestSnapshot
+from repo_index import needs_run_probe, repo_capabilities
+from work_pipeline import CLOSED, COMMENTED
+from pr_activity import (
+    TIMELINE_PER_PAGE,
+    activity_cutoff,
+    comments_since_params,
+    latest_timeline_time,
+)
+from run_retention import log_plan, plan_retention
+from run_watermarks import merge_snapshot, next_watermark
+from workflow_runs import (
+    DELETED, FAILED, SKIPPED, TruncatedListing, capped_filters, decode_runs_page, truncation_guard
+)
+
+
+class AsyncGitHubRepoManager:
+    """
+    异步GitHub仓库管理类，方法与GitHubRepoManager一一对应。
+    批量操作（删除运行、检查PR等）会并发执行，并由信号量限制同时进行的操作数量。
+    """
+
+    def __init__(self, max_concurrency=None, client=None):
+        """
+        初始化AsyncGitHubAPIClient用于API请求。
+
+        :param max_concurrency: 同时进行的批量操作上限，默认读取GH_MAX_CONCURRENCY。
+        :param client: 可选的AsyncGitHubAPIClient实例，默认使用相同的并发上限新建。
+        """
+        self.max_concurrency = max_concurrency or DEFAULT_MAX_CONCURRENCY
+        self.client = client or AsyncGitHubAPIClient(self.max_concurrency)
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        """关闭底层的API客户端。"""
+        await self.client.close()
+
+    async def _gather_bounded(self, coros):
+        """
+        在信号量限制下并发执行一组协程。
+
+        :param coros: 协程列表。
+        :return: 按输入顺序排列的结果列表。
+        """
+
+        async def run(coro):
+            async with self.semaphore:
+                return await coro
+
+        return await asyncio.gather(*(run(coro) for coro in coros))
+
+    async def delete_run(self, owner, repo, run_id):
+        """
+        删除指定仓库的工作流运行。
+
+        :param owner: 仓库所有者。
+        :param repo: 仓库名称。
+        :param run_id: 工作流运行ID。
+        """
+        endpoint = f"repos/{owner}/{repo}/actions/runs/{run_id}"
+        response = await self.client.api_request("DELETE", endpoint)
+        if response and response.status_code == 204:
+            logging.info(f"从仓库 {repo} 删除运行记录 {run_id}")
+        else:
+            logging.error(f"无法从仓库 {repo} 删除运行记录 {run_id}")
+
+    async def get_repos(self, username):
+        """
+        获取指定用户的所有仓库。
+
+        :param username: 用户名。
+        :return: 仓库列表。
+        """
+        return [repo async for repo in self.client.paginate(f"users/{username}/repos")]
+
+    async def delete_non_successful_runs_for_repo(self, owner, repo):
+        """
+        删除指定仓库中所有未成功的工作流运行。
+
+        :param owner: 仓库所有者。
+        :param repo: 仓库名称。
+        """
+        # 运行中的记录不会被删除，只列举已结束的运行
+        all_runs = await self.get_run_records(owner, repo, status="completed")
+        await self.delete_runs(
+            owner, repo, [run for run in all_runs if not run.is_active and run.conclusion != "success"]
+        )
+
+    async def comment_on_pr(self, owner, repo, pr_number, body):
+        """
+        在指定的PR上发表评论。
+
+        :param owner: 仓库所有者。
+        :param repo: 仓库名称。
+        :param pr_number: PR编号。
+        :param body: 评论内容。
+        :return: COMMENTED或FAILED。
+        """
+        endpoint = f"repos/{owner}/{repo}/issues/{pr_number}/comments"
+        response = await self.client.api_request("POST", endpoint, json={"body": body})
+        if response and response.status_code == 201:
+            logging.info(f"在 {owner}/{repo} 的PR #{pr_number} 上发表评论")
+            return COMMENTED
+        logging.error(f"无法在 {owner}/{repo} 的PR #{pr_number} 上发表评论")
+        return FAILED
+
+    async def close_pr(self, owner, repo, pr_number):
+        """
+        关闭指定的PR。
+
+        :param owner: 仓库所有者。
+        :param repo: 仓库名称。
+        :param pr_number: PR编号。
+        :return: CLOSED或FAILED。
+        """
+        endpoint = f"repos/{owner}/{repo}/pulls/{pr_number}"
+        response = await self.client.api_request(
+            "PATCH", endpoint, json={"state": "closed"}
+        )
+        if response and response.status_code == 200:
+            logging.info(f"关闭了 {owner}/{repo} 的PR #{pr_number}")
+            return CLOSED
+        logging.error(f"无法关闭 {owner}/{repo} 的PR #{pr_number}")
+        return FAILED
+
+    async def get_pr_snapshot(self, owner, repo, pull_requests=None):
+        """
+        获取仓库开放PR的快照（完整分页，剩余分页并发获取），供各PR处理步骤共用。
+
+        :param owner: 仓库所有者。
+        :param repo: 仓库名称。
+        :param pull_requests: 可选的开放PR列表（如来自get_pr_inventory），提供时不再请求REST列表。
+        :return: PullRequestSnapshot实例。
+        """
+        if pull_requests is None:
+            pull_requests = [
+                pr
+                async for pr in self.client.paginate(
+                    f"repos/{owner}/{repo}/pulls", params={"state": "open"}
+                )
+            ]
+        return PullRequestSnapshot(owner, repo, pull_requests)
+
+    async def pr_mergeable_state(self, snapshot, pr_number):
+        """
+        返回PR的mergeable_state，第一次需要时请求单个PR并写回快照。
+
+        :param snapshot: PullRequestSnapshot实例。
+        :param pr_number: PR编号。
+        :return: mergeable_state字符串，获取失败时为None。
+        """
+        if snapshot.needs_details(pr_number):
+            endpoint = f"repos/{snapshot.owner}/{snapshot.repo}/pulls/{pr_number}"
+            response = await self.client.api_request("GET", endpoint)
+            if not (response and response.status_code == 200):
+                logging.error(f"无法获取 {snapshot.owner}/{snapshot.repo} 的PR #{pr_number} 详情")
+                return None
+            snapshot.update_details(pr_number, response.json())
+        return snapshot.get(pr_number).get("mergeable_state")
+
+    async def _process_dependabot_pr(self, owner, repo, snapshot, pr):
+        """处理单个dependabot PR：超过30天的关闭，落后于基础分支的请求rebase。"""
+        pr_created_at = datetime.strptime(pr["created_at"], "%Y-%m-%dT%H:%M:%SZ")
+        if datetime.now() - pr_created_at > timedelta(days=30):
+            snapshot.mark_closed(pr["number"])
+            await self.close_pr(owner, repo, pr["number"])
+        elif await self.pr_mergeable_state(snapshot, pr["number"]) == "behind":
+            await self.comment_on_pr(owner, repo, pr["number"], "@dependabot rebase")
+
+    async def process_dependabot_prs(self, owner, repo, snapshot=None):
+        """
+        处理指定仓库中由dependabot创建的PR。
+
+        :param owner: 仓库所有者。
+        :param repo: 仓库名称。
+        :param snapshot: 可选的PullRequestSnapshot，默认新获取；被关闭的PR会在快照中标记。
+        """
+        if snapshot is None:
+            snapshot = await self.get_pr_snapshot(owner, repo)
+        await self._gather_bounded(
+            [
+                self._process_dependabot_pr(owner, repo, snapshot, pr)
+                for pr in snapshot.open_pull_requests()
+                if pr["user"]["login"] == "dependabot[bot]"
+            ]
+        )
+
+    def is_inactive(self, updated_at):
+        """
+        判断PR是否不活跃（默认2天未活动），纯计算无需异步。
+
+        :param updated_at: PR的最后更新时间。
+        :return: 如果PR不活跃返回True，否则返回False。
+        """
+        # ISO 8601 UTC时间字符串可以直接按字典序比较，无需逐个strptime
+        return updated_at < activity_cutoff()
+
+    async def has_recent_activity(self, owner, repo, pr_number):
+        """
+        检查PR在过去2天内是否有评论或活动。
+        先用 since 只请求截止时间之后更新过的评论（最多一条），有则立即返回；
+        否则读取时间线的最后一页（最新的事件在最后一页）。
+
+        :param owner: 仓库所有者。
+        :param repo: 仓库名称。
+        :param pr_number: PR编号。
+        :return: 如果PR有 recent activity 返回True，否则返回False。
+        """
+        cutoff = activity_cutoff()
+        comments_endpoint = f"repos/{owner}/{repo}/issues/{pr_number}/comments"
+        response = await self.client.api_request(
+            "GET", comments_endpoint, params=comments_since_params(cutoff)
+        )
+        if response and response.status_code == 200 and response.json():
+            return True
+
+        latest = await self._latest_timeline_time(owner, repo, pr_number)
+        return latest is not None and latest > cutoff
+
+    async def _latest_timeline_time(self, owner, repo, pr_number):
+        """
+        获取PR时间线中最新事件的时间，只请求第一页和最后一页。
+
+        :return: ISO 8601时间字符串，获取失败或没有事件时为None。
+        """
+        endpoint = f"repos/{owner}/{repo}/issues/{pr_number}/timeline"
+        response = await self.client.api_request(
+            "GET", endpoint, params={"per_page": TIMELINE_PER_PAGE}
+        )
+        if not (response and response.status_code == 200):
+            return None
+        last = last_page_number(response)
+        if last > 1:
+            response = await self.client.api_request(
+                "GET", endpoint, params={"per_page": TIMELINE_PER_PAGE, "page": last}
+            )
+            if not (response and response.status_code == 200):
+                return None
+        return latest_timeline_time(response.json())
+
+    async def add_comment_to_pr(self, owner, repo, pr_number, comment):
+        """
+        给指定的Pull Request添加评论。
+
+        :param owner: 仓库所有者。
+        :param repo: 仓库名称。
+        :param pr_number: Pull Request的编号。
+        :param comment: 要添加的评论内容。
+        """
+        endpoint = f"repos/{owner}/{repo}/issues/{pr_number}/comments"
+        data = {"body": comment}
+        response = await self.client.api_request("POST", endpoint, json=data)
+        if response is None or response.status_code != 201:
+            logging.error(f"添加评论到PR #{pr_number} 失败")
+
+    async def close_inactive_pull_requests_for_repo(self, owner, repo, snapshot=None):
+        """
+        关闭指定仓库中所有超过2天没有活动的PR，并在关闭时添加评论说明原因。
+
+        :param owner: 仓库所有者。
+        :param repo: 仓库名称。
+        :param snapshot: 可选的PullRequestSnapshot，默认新获取；
+            带有 last_activity_at 的PR（来自GraphQL清单）直接据此判断，不再逐个请求评论和时间线。
+        """
+        if snapshot is None:
+            snapshot = await self.get_pr_snapshot(owner, repo)
+        pull_requests = snapshot.open_pull_requests()
+        stale = await self._gather_bounded(
+            [self._is_stale_pr(owner, repo, pr) for pr in pull_requests]
+        )
+        stale_prs = [pr for pr, is_stale in zip(pull_requests, stale) if is_stale]
+        for pr in stale_prs:
+            snapshot.mark_closed(pr["number"])
+        await self._gather_bounded(
+            [self._close_inactive_pr(owner, repo, pr["number"]) for pr in stale_prs]
+        )
+
+    async def _close_inactive_pr(self, owner, repo, pr_number):
+        """
+        在不活跃的PR上添加评论说明原因，然后关闭它。
+
+        :return: CLOSED或FAILED。
+        """
+        comment = "由于长时间无活动，此Pull Request已被自动关闭。"
+        await self.add_comment_to_pr(owner, repo, pr_number, comment)
+        outcome = await self.close_pr(owner, repo, pr_number)
+        if outcome == CLOSED:
+            logging.info(
+                f"由于长时间无活动，关闭了 {owner}/{repo} 的PR #{pr_number} 并添加了评论"
+            )
+        return outcome
+
+    async def _is_stale_pr(self, owner, repo, pr):
+        """
+        判断PR是否应因不活跃而关闭。
+
+        :param owner: 仓库所有者。
+        :param repo: 仓库名称。
+        :param pr: PR字典。
+        :return: 不活跃返回True。
+        """
+        if "last_activity_at" in pr:
+            return self.is_inactive(pr["last_activity_at"])
+        return self.is_inactive(pr["updated_at"]) and not await self.has_recent_activity(
+            owner, repo, pr["number"]
+        )
+
+    async def get_pr_inventory(self, username):
+        """
+        通过GraphQL一次性获取用户所有仓库的开放PR（每100个仓库一次请求），
+        包含作者、更新时间、合并状态和最近活动时间。
+
+        :param username: 用户名。
+        :return: {(owner, repo): [PR字典]}。
+        """
+        return {
+            (repo["owner"], repo["name"]): repo["pull_requests"]
+            async for repo in fetch_pr_inventory_async(self.client, username)
+        }
+
+    async def get_workflow_runs(self, owner, repo, per_page=100):
+        """
+        获取指定仓库的所有工作流运行的详细信息，剩余分页并发获取。
+        """
+        return [
+            run
+            async for run in self.client.paginate(
+                f"repos/{owner}/{repo}/actions/runs",
+                item_key="workflow_runs",
+                per_page=per_page,
+            )
+        ]
+
+    async def get_run_records(self, owner, repo, per_page=100, **filters):
+        """
+        获取指定仓库所有工作流运行的精简记录（WorkflowRun），剩余分页并发获取。
+        filters 作为服务端过滤的查询参数，含义与 GitHubRepoManager.iter_workflow_runs 相同，
+        过滤结果超过1000条的返回上限时同样改用不带过滤条件的完整列表。
+        """
+        endpoint = f"repos/{owner}/{repo}/actions/runs"
+        params = {"exclude_pull_requests": "true"}
+        if capped_filters(filters):
+            filtered = {**params, **{key: value for key, value in filters.items() if value is not None}}
+            try:
+                return [
+                    run
+                    async for run in self.client.paginate(
+                        endpoint, params=filtered, per_page=per_page, decode=truncation_guard()
+                    )
+                ]
+            except TruncatedListing as e:
+                logging.warning(f"{endpoint}: {e}，改为列举全部运行")
+        else:
+            params.update({key: value for key, value in filters.items() if value is not None})
+        return [
+            run
+            async for run in self.client.paginate(
+                endpoint,
+                params=params,
+                per_page=per_page,
+                decode=decode_runs_page,
+            )
+        ]
+
+    async def probe_runs(self, owner, repo):
+        """
+        只请求一条记录，获取仓库的工作流运行总数和最新一次运行的ID。
+
+        :return: (运行总数, 最新运行ID)；没有运行时为 (0, None)，请求失败时为 (None, None)。
+        """
+        response = await self.client.api_request(
+            "GET",
+            f"repos/{owner}/{repo}/actions/runs",
+            params={"exclude_pull_requests": "true", "per_page": 1},
+        )
+        if not (response and response.status_code == 200):
+            return None, None
+        data = response.json()
+        runs = data.get("workflow_runs") or []
+        return data.get("total_count", len(runs)), runs[0]["id"] if runs else None
+
+    async def build_repo_index(self, repos):
+        """
+        构建仓库能力索引：归档、禁用和空仓库不发请求，其余仓库并发探测工作流运行数量。
+
+        :param repos: get_repos返回的仓库列表。
+        :return: {full_name: RepoCapabilities}。
+        """
+        probed = [repo for repo in repos if needs_run_probe(repo)]
+        probes = await self._gather_bounded(
+            [self.probe_runs(repo["owner"]["login"], repo["name"]) for repo in probed]
+        )
+        results = dict(zip((repo["full_name"] for repo in probed), probes))
+        index = {}
+        for repo in repos:
+            run_count, last_run_id = results.get(repo["full_name"], (0, None))
+            index[repo["full_name"]] = repo_capabilities(
+                repo, 1 if run_count is None else run_count, last_run_id
+            )
+        return index
+
+    async def delete_run_record(self, owner, repo, run):
+        """
+        删除一条已经从列表中获取到的运行记录，不再先发送GET探测状态。
+
+        :param owner: 仓库所有者。
+        :param repo: 仓库名称。
+        :param run: WorkflowRun记录。
+        :return: DELETED、SKIPPED或FAILED。
+        """
+        if run.is_active:
+            logging.info(f"工作流 ID {run.id} 在仓库 '{repo}' 中状态为 '{run.status}'，跳过删除。")
+            return SKIPPED
+        logging.info(
+            f"工作流 ID {run.id} 状态为 '{run.status}'，准备删除。"
+            f" commit_id={run.head_sha}, 触发者={run.actor}, 创建时间={run.created_at}, 分支={run.head_branch}"
+        )
+        endpoint = f"repos/{owner}/{repo}/actions/runs/{run.id}"
+        response = await self.client.api_request("DELETE", endpoint, expected_statuses=(403, 404, 409))
+        if response is None:
+            logging.error(f"尝试删除仓库 '{repo}' 中ID为 '{run.id}' 的工作流失败。未收到有效响应。")
+            return FAILED
+        if response.status_code == 204:
+            logging.info(f"已成功删除仓库 '{repo}' 中ID为 '{run.id}' 的工作流。")
+            return DELETED
+        if response.status_code == 404:
+            # 保存在水位文件中的运行可能已被手动删除
+            logging.info(f"工作流 ID {run.id} 在仓库 '{repo}' 中已不存在。")
+            return DELETED
+        if response.status_code == 409:
+            logging.info(f"工作流 ID {run.id} 在仓库 '{repo}' 中仍在运行，跳过删除。")
+            return SKIPPED
+        logging.error(
+            f"尝试删除仓库 '{repo}' 中ID为 '{run.id}' 的工作流失败。状态码：{response.status_code}"
+        )
+        return FAILED
+
+    async def delete_runs(self, owner, repo, runs):
+        """
+        并发删除一组运行记录。
+
+        :return: 各结果的计数（Counter）。
+        """
+        return Counter(
+            await self._gather_bounded(
+                [self.delete_run_record(owner, repo, run) for run in runs]
+            )
+        )
+
+    async def apply_retention(self, owner, repo, watermarks=None, on_complete=None):
+        """
+        列举一次仓库的工作流运行，在同一份快照上评估所有保留规则，然后并发删除去重后的集合。
+        提供watermarks时只列举上次水位之后创建的运行，与上次未删除的运行合并成快照。
+
+        :param owner: 仓库所有者。
+        :param repo: 仓库名称。
+        :param watermarks: 可选的RunWatermarkStore实例。
+        :param on_complete: 可选的回调，所有删除完成后以删除结果的Counter和
+                            保留下来的运行列表（未删除和运行中的记录）调用。
+        :return: (RetentionPlan, 删除结果的Counter)。
+        """
+        watermark, survivors = watermarks.get(owner, repo) if watermarks else (None, [])
+        created = f">={watermark}" if watermark else None
+        runs = merge_snapshot(survivors, await self.get_run_records(owner, repo, created=created))
+        plan = plan_retention(runs)
+        log_plan(owner, repo, plan)
+        outcomes = await self._gather_bounded(
+            [self.delete_run_record(owner, repo, run) for run in plan.deletions]
+        )
+        deleted = {run.id for run, outcome in zip(plan.deletions, outcomes) if outcome == DELETED}
+        remaining = [run for run in runs if run.id not in deleted]
+        if watermarks is not None:
+            watermarks.update(owner, repo, next_watermark(runs) or watermark, remaining)
+        if on_complete is not None:
+            on_complete(Counter(outcomes), remaining)
+        return plan, Counter(outcomes)
+
+    async def delete_workflow(self, owner, repo, workflow_id):
+        """
+        删除指定仓库中的指定工作流。
+
+        :param owner: 仓库所有者。
+        :param repo: 仓库名称。
+        :param workflow_id: 工作流ID。
+        """
+        # 先检查工作流是否正在运行
+        endpoint = f"repos/{owner}/{repo}/actions/runs/{workflow_id}"
+        response = await self.client.api_request("GET", endpoint)
+
+        if response is not None and response.status_code == 200:
+            workflow_run = response.json()
+            if workflow_run.get("status") == "in_progress":
+                logging.info(
+                    f"工作流 ID {workflow_id} 在仓库 '{repo}' 中正在运行，跳过删除。"
+                )
+                return
+            else:
+                # 获取详细信息
+                commit_id = workflow_run.get("head_sha", "未知")
+                commit_pusher = (
+                    (workflow_run.get("head_commit") or {})
+                    .get("committer", {})
+                    .get("name", "未知")
+                )
+                created_at = workflow_run.get("created_at", "未知")
+                branch = workflow_run.get("head_branch", "未知")
+                logging.info(
+                    f"工作流 ID {workflow_id} 状态为 '{workflow_run.get('status')}'，准备删除。"
+                )
+                logging.info(f"  commit_id={commit_id}")
+                logging.info(f"  推送者={commit_pusher}")
+                logging.info(f"  创建时间={created_at}")
+                logging.info(f"  分支={branch}")
+        else:
+            logging.error(f"获取工作流 {workflow_id} 状态时失败，无法进行删除。")
+            return
+
+        # 尝试删除工作流
+        response = await self.client.api_request("DELETE", endpoint)
+
+        if response is None:
+            logging.error(
+                f"尝试删除仓库 '{repo}' 中ID为 '{workflow_id}' 的工作流失败。未收到有效响应。"
+            )
+        elif response.status_code == 204:
+            logging.info(f"已成功删除仓库 '{repo}' 中ID为 '{workflow_id}' 的工作流。")
+        else:
+            logging.error(
+                f"尝试删除仓库 '{repo}' 中ID为 '{workflow_id}' 的工作流失败。状态码：{response.status_code}"
+            )
+
+    async def maintain_repo_workflows(self, owner, repo):
+        """
+        维护指定仓库的工作流，保留最新的工作流运行并并发删除其他运行。
+
+        :param owner: 仓库所有者。
+        :param repo: 仓库名称。
+        """
+        all_runs = await self.get_run_records(owner, repo)
+        latest_runs = {}
+        for run in all_runs:
+            workflow_name = run.name
+            if (
+                workflow_name not in latest_runs
+                or latest_runs[workflow_name].created_at < run.created_at
+            ):
+                latest_runs[workflow_name] = run
+
+        await self.delete_runs(
+            owner,
+            repo,
+            [run for run in all_runs if run.id != latest_runs[run.name].id],
+        )
+
+    async def close_all_open_prs(self, owner, repo, snapshot=None):
+        """
+        关闭指定仓库中所有打开的PR。
+
+        :param owner: 仓库所有者。
+        :param repo: 仓库名称。
+        :param snapshot: 可选的PullRequestSnapshot，默认新获取。
+        """
+        if snapshot is None:
+            snapshot = await self.get_pr_snapshot(owner, repo)
+        pull_requests = snapshot.open_pull_requests()
+        for pr in pull_requests:
+            snapshot.mark_closed(pr["number"])
+        await self._gather_bounded(
+            [self.close_pr(owner, repo, pr["number"]) for pr in pull_requests]
+        )
+
+    async def delete_dependabot_runs_for_repo(self, owner, repo):
+        """
+        删除指定仓库中所有由 dependabot[bot] 触发的工作流运行。
+
+        :param owner: 仓库所有者。
+        :param repo: 仓库名称。
+        """
+        # 由服务端按触发者过滤，只下载 dependabot 触发的运行
+        all_runs = await self.get_run_records(owner, repo, actor="dependabot[bot]")
+        targets = [run for run in all_runs if run.actor == "dependabot[bot]"]
+        logging.info(f"准备删除 {len(targets)} 个 dependabot 触发的 workflow_run")
+        await self.delete_runs(owner, repo, targets)
@@ -1,8 +1,14 @@
 # 导入必要的库，用于操作GitHub API、处理HTTP请求和日志记录
 import os
+import json
+import time
 import requests
 import logging
-from requests.structures import CaseInsensitiveDict
+from concurrent.futures import ThreadPoolExecutor
+
+from api_metrics import install_exit_handler
+from github_transport import get_transport
+from response_cache import ResponseCache
 
 # 配置日志记录，以便在文件和控制台中记录信息、警告和错误
 # 设置日志记录
@@ -19,14 +25,21 @@ base_url = 'https://api.github.com'
 TOKEN = os.getenv('GH_TOKEN')
 USERNAME = os.getenv('USERNAME')
 
+# 并发检查工作流权限的线程数
+AUDIT_WORKERS = int(os.getenv('GH_AUDIT_WORKERS', '8'))
+# 设置为1时只统计合规情况，不修改任何仓库的权限
+SUMMARY_ONLY = os.getenv('AUTO_PERMS_SUMMARY') == '1'
+# 持久化状态的目录，与其他维护脚本共用同一个响应缓存文件
+STATE_DIR = os.getenv('GH_STATE_DIR', '.github-state')
+
 def create_headers():
     """
     创建请求头字典，包含GitHub Token进行身份验证
     返回:
-        CaseInsensitiveDict: 包含Authorization头部的字典
+        dict: 包含Authorization头部的字典（传输层会与会话的默认头部合并）
     """
     """创建请求头"""
-    headers = CaseInsensitiveDict()
+    headers = {}
     headers["Authorization"] = f"token {TOKEN}"
     return headers
 
@@ -45,8 +58,8 @@ def list_repositories(user):
         # 构建API URL，包括当前页码和每页项目数量
         repos_url = f"{base_url}/users/{user}/repos?page={page}&per_page=100"
         try:
-            # 发送GET请求获取仓库列表
-            response = requests.get(repos_url, headers=headers)
+            # 通过共享传输层发送GET请求获取仓库列表（连接复用、限速和重试）
+            response = get_transport().request('GET', repos_url, headers=headers)
             response.raise_for_status()
             repos = response.json()
             # 如果当前页没有仓库，则停止循环
@@ -62,22 +75,42 @@ def list_repositories(user):
             break
     return all_repos
 
-def get_workflow_permissions(repo):
+def get_response_cache():
+    """
+    打开共享的响应缓存文件，设置环境变量GH_HTTP_CACHE=0时不使用缓存
+    返回:
+        ResponseCache: 响应缓存，不使用缓存时为None
+    """
+    if os.getenv('GH_HTTP_CACHE', '1') == '0':
+        return None
+    return ResponseCache(os.path.join(STATE_DIR, 'http_cache.sqlite3'))
+
+def get_workflow_permissions(repo, cache=None):
     """
     获取指定仓库的工作流权限信息
     参数:
         repo (dict): 包含仓库名称和其它信息的字典
+        cache (ResponseCache): 可选的响应缓存，权限没有变化时服务器返回304（不计入速率限制）
     返回:
         dict: 包含工作流权限信息的字典
     """
     """获取仓库的当前工作流权限"""
     permissions_url = f"{base_url}/repos/{USERNAME}/{repo['name']}/actions/permissions"
     headers = create_headers()
+    if cache is not None:
+        headers.update(cache.conditional_headers(permissions_url))
     
     try:
-        # 发送GET请求获取权限信息
-        response = requests.get(permissions_url, headers=headers)
+        # 发送（条件）GET请求获取权限信息
+        response = get_transport().request('GET', permissions_url, headers=headers)
+        if response.status_code == 304 and cache is not None:
+            cached = cache.lookup(permissions_url)
+            if cached is not None:
+                logging.info(f"仓库 {repo['name']} 的工作流权限没有变化（304）")
+                return json.loads(cached[1])
         response.raise_for_status()
+        if cache is not None:
+            cache.store(permissions_url, response.headers, response.content)
 
         # 记录成功获取权限信息的日志
         # 添加详细日志记录
@@ -92,6 +125,48 @@ def get_workflow_permissions(repo):
         # 记录请求异常的日志
         logging.error(f"无法获取仓库 {repo['name']} 的工作流权限: {e}")
 
+def is_compliant(permissions):
+    """
+    判断工作流权限是否合规：未启用工作流，或者允许所有Action
+    参数:
+        permissions (dict): 工作流权限信息
+    返回:
+        bool: 合规返回True
+    """
+    return not permissions.get('enabled', False) or permissions.get('allowed_actions', '') == 'all'
+
+def audit_repositories(repos, cache=None, workers=AUDIT_WORKERS):
+    """
+    通过有上限的线程池并发获取所有仓库的工作流权限，线程之间共用同一个连接池
+    参数:
+        repos (list): 仓库信息列表
+        cache (ResponseCache): 可选的响应缓存
+        workers (int): 并发线程数
+    返回:
+        list: (仓库, 权限信息) 列表，获取失败时权限信息为None
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        permissions = list(executor.map(lambda repo: get_workflow_permissions(repo, cache), repos))
+    return list(zip(repos, permissions))
+
+def summarize(results):
+    """
+    统计合规、不合规和检查失败的仓库数量
+    参数:
+        results (list): audit_repositories的返回值
+    返回:
+        dict: 包含total、compliant、non_compliant和errors的字典
+    """
+    summary = {'total': len(results), 'compliant': 0, 'non_compliant': 0, 'errors': 0}
+    for _, permissions in results:
+        if permissions is None:
+            summary['errors'] += 1
+        elif is_compliant(permissions):
+            summary['compliant'] += 1
+        else:
+            summary['non_compliant'] += 1
+    return summary
+
 def set_workflow_permissions(repo, permission):
     """
     设置指定仓库的工作流权限
@@ -112,7 +187,7 @@ def set_workflow_permissions(repo, permission):
 
     try:
         # 发送PUT请求更新权限
-        response = requests.put(permissions_url, headers=headers, json=data)
+        response = get_transport().request('PUT', permissions_url, headers=headers, json=data)
         response.raise_for_status()
 
         # 记录成功更新权限的日志
@@ -124,19 +199,35 @@ def set_workflow_permissions(repo, permission):
         logging.error(f"无法设置仓库 {repo['name']} 的工作流权限, 错误信息: {e}")
 
 def main():
+    started = time.monotonic()
     # 获取用户名下的所有仓库
     repos = list_repositories(USERNAME)
     # 记录仓库总数的日志
     logging.info(f"需要检查的仓库总数: {len(repos)}")
 
-    # 遍历所有仓库，检查并更新工作流权限
-    for repo in repos:
-        permissions = get_workflow_permissions(repo)
+    # 并发检查所有仓库的工作流权限
+    cache = get_response_cache()
+    results = audit_repositories(repos, cache)
+
+    if not SUMMARY_ONLY:
         # 如果工作流已启用但权限不是"all"，则更新权限为"all"
-        if permissions and permissions.get('enabled', False) and permissions.get('allowed_actions', '') != 'all':
-            logging.info(f"正在将仓库: {repo['name']} 的权限更新为 'all'")
-            set_workflow_permissions(repo, "all")
+        for repo, permissions in results:
+            if permissions and not is_compliant(permissions):
+                logging.info(f"正在将仓库: {repo['name']} 的权限更新为 'all'")
+                set_workflow_permissions(repo, "all")
+
+    summary = summarize(results)
+    logging.info(
+        f"工作流权限检查完成：共 {summary['total']} 个仓库，合规 {summary['compliant']} 个，"
+        f"不合规 {summary['non_compliant']} 个，检查失败 {summary['errors']} 个，"
+        f"耗时 {time.monotonic() - started:.1f} 秒"
+    )
+    if cache is not None:
+        cache.log_stats()
+        cache.close()
+    return summary
 
 # 当脚本直接运行时执行main函数
 if __name__ == "__main__":
+    install_exit_handler(name='api_metrics_auto_perms')
     main()
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""
+保留策略基准测试：对比逐条评估（plan_retention的逐行实现）和列式向量化评估（RunTable + NumPy）。
+
+生成指定数量的合成工作流运行（多个工作流名称、部分失败、部分由dependabot触发、少量运行中），
+分别统计两种实现的耗时。列式实现另外单独统计构建RunTable的耗时和只做规则计算（掩码运算）的耗时；
+完整的列式评估还包括构建表和生成删除列表。
+
+用法:
+    python bench_retention.py --sizes 10000 100000 1000000 --workflows 50 --max-age-days 90
+
+需要 numpy。
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import run_retention
+from run_retention import plan_retention, plan_retention_columnar, retention_masks
+from run_table import RunTable, np
+from workflow_runs import WorkflowRun
+
+
+def synthetic_runs(count, workflows, seed=0):
+    """
+    生成count条合成运行，创建时间分布在最近一年内。
+    """
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    names = [f"workflow-{i}" for i in range(workflows)]
+    runs = []
+    for i in range(count):
+        created = (start + timedelta(seconds=rng.randrange(365 * 86400))).strftime("%Y-%m-%dT%H:%M:%SZ")
+        status = "in_progress" if rng.random() < 0.001 else "completed"
+        conclusion = None if status != "completed" else ("success" if rng.random() < 0.8 else "failure")
+        actor = "dependabot[bot]" if rng.random() < 0.1 else "octocat"
+        runs.append(WorkflowRun(i, rng.choice(names), 0, status, conclusion, created, actor, "main", "sha"))
+    return runs
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def run_benchmark(size, workflows, max_age_days, now):
+    runs = synthetic_runs(size, workflows)
+    # 强制走逐行实现，与运行数无关
+    threshold = run_retention.COLUMNAR_MIN_RUNS
+    run_retention.COLUMNAR_MIN_RUNS = float("inf")
+    try:
+        row_plan, row_seconds = timed(plan_retention, runs, max_age_days, now)
+    finally:
+        run_retention.COLUMNAR_MIN_RUNS = threshold
+    table, build_seconds = timed(RunTable.from_runs, runs)
+    _, rules_seconds = timed(retention_masks, table, max_age_days, now)
+    col_plan, col_seconds = timed(plan_retention_columnar, runs, max_age_days, now)
+    same = [r.id for r in row_plan.deletions] == [r.id for r in col_plan.deletions] and row_plan.matched == col_plan.matched
+    print(
+        f"{size:>9} {row_seconds:>10.3f} {col_seconds:>10.3f} {build_seconds:>10.3f} {rules_seconds:>10.4f} "
+        f"{row_seconds / col_seconds:>8.1f}x {row_seconds / max(rules_seconds, 1e-9):>10.1f}x {len(col_plan.deletions):>9} {'yes' if same else 'NO':>5}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比逐行与列式保留策略评估")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000], help="运行数量")
+    parser.add_argument("--workflows", type=int, default=50, help="不同工作流名称的数量")
+    parser.add_argument("--max-age-days", type=int, default=0, help="过期规则的天数，0表示不启用")
+    args = parser.parse_args()
+
+    if np is None:
+        raise SystemExit("需要安装 numpy：pip install numpy")
+
+    now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    print(
+        f"{'runs':>9} {'row(s)':>10} {'column(s)':>10} {'build(s)':>10} {'rules(s)':>10} "
+        f"{'total':>9} {'rules':>11} {'deleted':>9} {'same':>5}"
+    )
+    for size in args.sizes:
+        run_benchmark(size, args.workflows, args.max_age_days or None, now)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+传输层基准测试：对比默认的requests会话（HTTP/1.1连接池）和HTTP/2多路复用传输层。
+
+在本地启动一个模拟api.github.com的TLS服务器（通过ALPN同时支持h2和http/1.1），
+用GitHubAPIClient并发发送请求，统计耗时、吞吐量和服务器端建立的连接数。
+--connect-delay 让每个新连接在处理第一个请求前额外等待，用于模拟到api.github.com建立
+TCP+TLS连接时的往返时间。
+
+用法:
+    python bench_transport.py --requests 500 --concurrency 16 --latency 0.02 --connect-delay 0.05
+
+需要 openssl 命令行和 httpx[http2]。
+"""
+import argparse
+import asyncio
+import json
+import os
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import h2.config
+import h2.connection
+import h2.events
+
+from github_api_client import GitHubAPIClient
+from github_transport import HTTP2Transport, create_session
+
+RESPONSE_BODY = json.dumps({"workflow_runs": [{"id": i, "name": "ci"} for i in range(10)]}).encode()
+
+
+class StandInServer:
+    """
+    本地模拟服务器，所有请求都返回同一个JSON响应。
+    """
+
+    def __init__(self, latency, connect_delay):
+        self.latency = latency
+        self.connect_delay = connect_delay
+        self.connections = {"h2": 0, "http/1.1": 0}
+        self.port = None
+        self._loop = None
+        self._started = threading.Event()
+        self._tmpdir = tempfile.TemporaryDirectory()
+
+    def _ssl_context(self):
+        cert = os.path.join(self._tmpdir.name, "cert.pem")
+        key = os.path.join(self._tmpdir.name, "key.pem")
+        subprocess.run(
+            ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+             "-subj", "/CN=localhost", "-keyout", key, "-out", cert],
+            check=True, capture_output=True,
+        )
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        context.load_cert_chain(cert, key)
+        context.set_alpn_protocols(["h2", "http/1.1"])
+        return context
+
+    def start(self):
+        context = self._ssl_context()
+        threading.Thread(target=self._run, args=(context,), daemon=True).start()
+        self._started.wait()
+        return f"https://localhost:{self.port}"
+
+    def stop(self):
+        # 服务器运行在守护线程中，随进程退出；这里只清理证书文件
+        self._tmpdir.cleanup()
+
+    def _run(self, context):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+
+        async def handle(reader, writer):
+            # 模拟新建连接时握手所需的网络往返
+            await asyncio.sleep(self.connect_delay)
+            protocol = writer.get_extra_info("ssl_object").selected_alpn_protocol() or "http/1.1"
+            self.connections[protocol] += 1
+            try:
+                if protocol == "h2":
+                    await self._serve_h2(reader, writer)
+                else:
+                    await self._serve_http1(reader, writer)
+            except (ConnectionError, asyncio.IncompleteReadError, ssl.SSLError):
+                pass
+            finally:
+                writer.close()
+
+        server = self._loop.run_until_complete(asyncio.start_server(handle, "127.0.0.1", 0, ssl=context))
+        self.port = server.sockets[0].getsockname()[1]
+        self._started.set()
+        self._loop.run_forever()
+
+    async def _serve_http1(self, reader, writer):
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            headers = head.decode().lower()
+            if "content-length:" in headers:
+                length = int(headers.split("content-length:")[1].split("\r\n")[0])
+                await reader.readexactly(length)
+            await asyncio.sleep(self.latency)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                + f"Content-Length: {len(RESPONSE_BODY)}\r\n\r\n".encode()
+                + RESPONSE_BODY
+            )
+            await writer.drain()
+
+    async def _serve_h2(self, reader, writer):
+        conn = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False))
+        conn.initiate_connection()
+        writer.write(conn.data_to_send())
+
+        async def respond(stream_id):
+            await asyncio.sleep(self.latency)
+            conn.send_headers(stream_id, [
+                (":status", "200"),
+                ("content-type", "application/json"),
+                ("content-length", str(len(RESPONSE_BODY))),
+            ])
+            conn.send_data(stream_id, RESPONSE_BODY, end_stream=True)
+            writer.write(conn.data_to_send())
+
+        while True:
+            data = await reader.read(65535)
+            if not data:
+                return
+            for event in conn.receive_data(data):
+                if isinstance(event, h2.events.StreamEnded):
+                    asyncio.ensure_future(respond(event.stream_id))
+                elif isinstance(event, h2.events.ConnectionTerminated):
+                    return
+            writer.write(conn.data_to_send())
+
+
+def make_client(kind, base_url, concurrency):
+    """
+    创建指向模拟服务器的GitHubAPIClient（关闭证书校验和响应缓存）。
+    """
+    client = GitHubAPIClient(transport=kind)
+    client.cache = None
+    if kind == "http2":
+        client.session = HTTP2Transport(max_connections=concurrency, verify=False)
+    else:
+        client.session = create_session("requests", max_connections=concurrency)
+        client.session.verify = False
+        client.session.trust_env = False  # 避免REQUESTS_CA_BUNDLE等环境变量覆盖verify=False
+    client.base_url = base_url
+    return client
+
+
+def run_benchmark(kind, server, base_url, total, concurrency):
+    before = dict(server.connections)
+    client = make_client(kind, base_url, concurrency)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(
+            lambda i: client.api_request("GET", f"repos/o/r/actions/runs/{i}"), range(total)
+        ))
+    elapsed = time.perf_counter() - start
+    client.session.close()
+    failures = sum(1 for response in results if response is None)
+    opened = sum(server.connections.values()) - sum(before.values())
+    print(f"{kind:<9} {total:>8} {concurrency:>6} {elapsed:>9.2f} {total / elapsed:>9.1f} {opened:>6} {failures:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比requests与HTTP/2传输层")
+    parser.add_argument("--requests", type=int, default=500, help="每种传输层发送的请求数")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发线程数")
+    parser.add_argument("--latency", type=float, default=0.02, help="服务器处理每个请求的延迟（秒）")
+    parser.add_argument("--connect-delay", type=float, default=0.05, help="每个新连接握手前的延迟（秒）")
+    args = parser.parse_args()
+
+    import urllib3
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    server = StandInServer(args.latency, args.connect_delay)
+    base_url = server.start()
+    print(f"{'transport':<9} {'requests':>8} {'conc':>6} {'seconds':>9} {'req/s':>9} {'conns':>6} {'failed':>6}")
+    try:
+        for kind in ("requests", "http2"):
+            run_benchmark(kind, server, base_url, args.requests, args.concurrency)
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,39 @@
 # 导入必要的库，用于与GitHub API交互和日志记录
 import os
-import requests
 import logging
-from requests.exceptions import HTTPError, RetryError
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.exceptions import HTTPError, RequestException
+
+from fork_parents import ForkParentCache, slim_parent
+from api_metrics import install_exit_handler
+from github_transport import get_transport
+
+# 持久化状态的目录，可在Actions中通过actions/cache在多次运行之间保留
+STATE_DIR = os.getenv('GH_STATE_DIR', '.github-state')
+
+# 并发获取fork详情（父仓库信息）的线程数
+FORK_DETAIL_WORKERS = int(os.getenv('GH_FORK_DETAIL_WORKERS', '16'))
+
+# 两次写请求（创建PR）之间的最小间隔（秒），写请求受更严格的次级速率限制
+WRITE_INTERVAL = float(os.getenv('GH_WRITE_INTERVAL', '1'))
+
+# 一次查询所有fork仓库及其开放PR的head/base，用于判断同步PR是否已经存在
+OPEN_PR_HEADS_QUERY = """
+query($login: String!, $after: String) {
+  repositoryOwner(login: $login) {
+    repositories(first: 100, after: $after, isFork: true, ownerAffiliations: OWNER) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        nameWithOwner
+        pullRequests(states: OPEN, first: 100) {
+          nodes { headRepositoryOwner { login } headRefName baseRefName }
+        }
+      }
+    }
+  }
+}
+"""
 
 # 配置日志记录的基本设置
 # 设置日志记录的基本配置
@@ -44,42 +73,33 @@ def create_headers(token):
         "Accept": "application/vnd.github.v3+json"
     }
 
-def get_repositories(username, token):
+def get_repositories(username, token, transport=None):
     """
     获取用户的GitHub仓库列表。
 
     参数:
         username (str): GitHub用户名。
         token (str): GitHub令牌。
+        transport (Transport): 可选的传输层，默认使用共享的传输层。
 
     返回:
         一个生成器，生成每个仓库的详细信息（字典）。
     """
     page = 1
     headers = create_headers(token)
-    
-    # 设置重试策略
-    retry_strategy = Retry(
-        total=5,
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods=["HEAD", "GET", "OPTIONS"],  # 将method_whitelist更改为allowed_methods
-        backoff_factor=1
-    )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    session = requests.Session()
-    session.mount("https://", adapter)
+    transport = transport or get_transport()
 
     while True:
         url = f"https://api.github.com/users/{username}/repos?type=all&per_page=100&page={page}"
         try:
-            with session.get(url, headers=headers) as response:
-                response.raise_for_status()
-                repos = response.json()
-                if not repos:
-                    break
-                for repo in repos:
-                    yield repo
-                page += 1
+            response = transport.request('GET', url, headers=headers)
+            response.raise_for_status()
+            repos = response.json()
+            if not repos:
+                break
+            for repo in repos:
+                yield repo
+            page += 1
         except HTTPError as http_err:
             logging.error(f"发生HTTP错误: {http_err}")
             break
@@ -87,6 +107,65 @@ def get_repositories(username, token):
             logging.error(f"发生其他错误: {err}")
             break
 
+def fetch_parent(transport, repo, token):
+    """
+    请求 /repos/{full_name} 获取 fork 的父仓库信息。
+
+    参数:
+        transport (Transport): 传输层。
+        repo (dict): 仓库列表中的 fork 信息。
+        token (str): GitHub令牌。
+
+    返回:
+        slim_parent 返回的父仓库信息字典；失败或没有父仓库时为None。
+    """
+    url = f"https://api.github.com/repos/{repo['full_name']}"
+    try:
+        response = transport.request('GET', url, headers=create_headers(token))
+        response.raise_for_status()
+        parent = response.json().get('parent')
+    except RequestException as err:
+        logging.error(f"获取仓库 {repo['full_name']} 的详情时发生HTTP错误: {err}")
+        return None
+    except Exception as err:
+        logging.error(f"获取仓库 {repo['full_name']} 的详情时发生其他错误: {err}")
+        return None
+    return slim_parent(parent) if parent else None
+
+def resolve_parents(transport, forks, token, cache, workers=FORK_DETAIL_WORKERS):
+    """
+    为 fork 列表补充 parent 字段：updated_at 未变化的 fork 使用缓存，
+    其余 fork 通过线程池并发请求详情，并写入缓存。
+
+    参数:
+        transport (Transport): 传输层（连接池在线程之间共享）。
+        forks (list): 仓库列表中的 fork 信息。
+        token (str): GitHub令牌。
+        cache (ForkParentCache): 父仓库缓存。
+        workers (int): 并发线程数。
+    """
+    start = time.monotonic()
+    missing = []
+    for repo in forks:
+        parent = cache.get(repo['full_name'], repo.get('updated_at'))
+        if parent:
+            repo['parent'] = parent
+        else:
+            missing.append(repo)
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            parents = list(executor.map(lambda repo: fetch_parent(transport, repo, token), missing))
+        for repo, parent in zip(missing, parents):
+            if parent:
+                repo['parent'] = parent
+                cache.update(repo['full_name'], repo.get('updated_at'), parent)
+
+    logging.info(
+        f"解析了 {len(forks)} 个fork的父仓库（缓存命中 {len(forks) - len(missing)} 个），"
+        f"耗时 {time.monotonic() - start:.1f} 秒"
+    )
+
 def get_upstream_repo_info(repo):
     """
     获取上游仓库的信息。
@@ -110,13 +189,133 @@ def get_upstream_repo_info(repo):
         logging.warning(f"仓库 {repo['name']} 没有上游仓库信息。")
         return None, None
 
-def create_pull_request(repo, token):
+def sync_pr_key(repo):
+    """
+    返回fork的同步PR的 (上游所有者, 上游分支, fork分支)。
+
+    参数:
+        repo (dict): 已补充 parent 字段的 fork 信息。
+
+    返回:
+        三元组；缺少父仓库信息时为None。
+    """
+    parent = repo.get('parent')
+    if not parent or not parent.get('owner') or not parent.get('default_branch'):
+        return None
+    return parent['owner']['login'], parent['default_branch'], repo['default_branch']
+
+def fetch_open_pr_heads(transport, username, token):
+    """
+    用分页的GraphQL查询一次获取用户所有fork的开放PR。
+
+    参数:
+        transport (Transport): 传输层。
+        username (str): GitHub用户名。
+        token (str): GitHub令牌。
+
+    返回:
+        {fork全名: {(head所有者, head分支, base分支), ...}} 字典；查询失败时为None。
+    """
+    heads = {}
+    after = None
+    while True:
+        try:
+            response = transport.request(
+                'POST',
+                "https://api.github.com/graphql",
+                json={"query": OPEN_PR_HEADS_QUERY, "variables": {"login": username, "after": after}},
+                headers=create_headers(token),
+            )
+            response.raise_for_status()
+            payload = response.json()
+        except Exception as err:
+            logging.error(f"查询fork的开放PR时发生错误: {err}")
+            return None
+        owner = (payload.get('data') or {}).get('repositoryOwner')
+        if not owner:
+            logging.error(f"查询fork的开放PR失败: {payload.get('errors')}")
+            return None
+        repositories = owner['repositories']
+        for node in repositories['nodes']:
+            heads[node['nameWithOwner']] = {
+                ((pr['headRepositoryOwner'] or {}).get('login'), pr['headRefName'], pr['baseRefName'])
+                for pr in node['pullRequests']['nodes']
+            }
+        if not repositories['pageInfo']['hasNextPage']:
+            return heads
+        after = repositories['pageInfo']['endCursor']
+
+def fetch_behind_by(transport, repo, token):
+    """
+    调用 compare 接口计算 fork 落后上游多少个提交。
+
+    参数:
+        transport (Transport): 传输层。
+        repo (dict): 已补充 parent 字段的 fork 信息。
+        token (str): GitHub令牌。
+
+    返回:
+        落后的提交数；无法比较时为None。
+    """
+    upstream_owner, upstream_branch, base = sync_pr_key(repo)
+    url = f"https://api.github.com/repos/{repo['full_name']}/compare/{base}...{upstream_owner}:{upstream_branch}"
+    try:
+        # 只需要提交数，不需要提交列表
+        response = transport.request('GET', url, headers=create_headers(token), params={'per_page': 1})
+        response.raise_for_status()
+        # 以 fork 为 base、上游为 head：ahead_by 即上游领先 fork 的提交数
+        return response.json()['ahead_by']
+    except Exception as err:
+        logging.error(f"比较仓库 {repo['name']} 与上游时发生错误: {err}")
+        return None
+
+def plan_pull_requests(transport, forks, open_heads, token, workers=FORK_DETAIL_WORKERS):
+    """
+    找出需要创建同步PR的fork：已有开放的同步PR的fork直接跳过，
+    其余fork并发比较，只保留落后于上游的。
+
+    参数:
+        transport (Transport): 传输层。
+        forks (list): 已补充 parent 字段的 fork 信息。
+        open_heads (dict): fetch_open_pr_heads 的返回值；为None时不跳过任何fork。
+        token (str): GitHub令牌。
+        workers (int): 并发线程数。
+
+    返回:
+        需要创建同步PR的 fork 列表。
+    """
+    candidates = []
+    for repo in forks:
+        key = sync_pr_key(repo)
+        if key is None:
+            logging.warning(f"仓库 {repo['name']} 无法获取上游仓库信息。")
+        elif open_heads is not None and key in open_heads.get(repo['full_name'], ()):
+            logging.info(f"仓库 {repo['name']} 已有开放的同步PR，跳过。")
+        else:
+            candidates.append(repo)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        behind = list(executor.map(lambda repo: fetch_behind_by(transport, repo, token), candidates))
+    planned = []
+    for repo, behind_by in zip(candidates, behind):
+        if behind_by == 0:
+            logging.info(f"仓库 {repo['name']} 没有落后于上游，跳过。")
+        elif behind_by is not None:
+            planned.append(repo)
+    logging.info(
+        f"{len(forks)} 个fork中有 {len(planned)} 个需要创建同步PR"
+        f"（比较了 {len(candidates)} 个）"
+    )
+    return planned
+
+def create_pull_request(repo, token, transport=None):
     """
     为仓库创建一个拉取请求，以同步更新上游仓库的更改。
 
     参数:
         repo (dict): 需要创建拉取请求的仓库的详细信息。
         token (str): GitHub令牌。
+        transport (Transport): 可选的传输层，默认使用共享的传输层。
     """
     upstream_repo_info, upstream_repo_url = get_upstream_repo_info(repo)
     if not upstream_repo_info:
@@ -141,8 +340,14 @@ def create_pull_request(repo, token):
         "base": repo['default_branch']  # 使用 fork 仓库的默认分支
     }
 
+    transport = transport or get_transport()
     try:
-        response = requests.post(f"https://api.github.com/repos/{fork_full_name}/pulls", json=pull_data, headers=headers)
+        # 传输层按共享额度限速，写请求只在触发速率限制时重试，不会重复创建PR
+        response = transport.request('POST', f"https://api.github.com/repos/{fork_full_name}/pulls", json=pull_data, headers=headers)
+        if response.status_code == 422:
+            # 并发运行等情况下仍可能遇到已存在或无差异的PR，不视为错误
+            logging.info(f"仓库 {repo_name} 无需创建拉取请求: {response.json().get('errors') or response.text}")
+            return
         response.raise_for_status()
         logging.info(f"成功创建拉取请求: {response.json()['html_url']}")
     except HTTPError as http_err:
@@ -160,10 +365,25 @@ def main():
         logging.error("GitHub令牌或用户名未设置。")
         return
 
-    for repo in get_repositories(username, token):
+    transport = get_transport()
+    forks = []
+    for repo in get_repositories(username, token, transport):
         logging.info(f"仓库名称: {repo['name']}, 是否为Fork: {repo['fork']}")
         if repo['fork']:
-            create_pull_request(repo, token)
+            forks.append(repo)
+
+    # 仓库列表不包含 parent 字段，先并发解析所有 fork 的父仓库
+    cache = ForkParentCache(os.path.join(STATE_DIR, 'fork_parents.json'))
+    resolve_parents(transport, forks, token, cache)
+    cache.save()
+
+    # 一次查询已有的开放PR，只为缺少同步PR且落后于上游的fork创建PR
+    open_heads = fetch_open_pr_heads(transport, username, token)
+    for i, repo in enumerate(plan_pull_requests(transport, forks, open_heads, token)):
+        if i:
+            time.sleep(WRITE_INTERVAL)
+        create_pull_request(repo, token, transport)
 
 if __name__ == "__main__":
+    install_exit_handler(name='api_metrics_cleanup_forks')
     main()
\ No newline at end of file
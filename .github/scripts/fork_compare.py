@@ -0,0 +1,64 @@
+import os
+import sqlite3
+import threading
+
+from mirror_cache import MIRROR_CACHE_DIR
+
+# 比较结果缓存文件（与镜像一起通过 actions/cache 跨运行保留）
+FORK_COMPARE_CACHE = os.getenv(
+    "FORK_COMPARE_CACHE", os.path.join(MIRROR_CACHE_DIR, "fork_compare.sqlite3")
+)
+
+
+class ForkCompareCache:
+    """
+    fork 与父仓库分支比较结果的持久化缓存，以两边分支的 head SHA 为键。
+    SHA 对没有变化时比较结果也不会变化，因此同一对 SHA 只需要调用一次 compare 接口。
+    """
+
+    def __init__(self, path=FORK_COMPARE_CACHE):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS comparisons ("
+            "fork_sha TEXT, parent_sha TEXT, ahead_by INTEGER, behind_by INTEGER, "
+            "PRIMARY KEY (fork_sha, parent_sha))"
+        )
+        self._conn.commit()
+
+    def get(self, fork_sha, parent_sha):
+        """
+        返回缓存的 (ahead_by, behind_by)，没有缓存时返回 None。
+        两边 SHA 相同时无需查询，直接视为已同步。
+        """
+        if fork_sha == parent_sha:
+            return 0, 0
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT ahead_by, behind_by FROM comparisons WHERE fork_sha = ? AND parent_sha = ?",
+                (fork_sha, parent_sha),
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row
+
+    def put(self, fork_sha, parent_sha, ahead_by, behind_by):
+        """保存一对 SHA 的比较结果"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO comparisons VALUES (?, ?, ?, ?)",
+                (fork_sha, parent_sha, ahead_by, behind_by),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,93 @@
+# 导入json库，用于读写缓存文件
+import json
+# 导入logging库，用于记录日志
+import logging
+# 导入os库，用于创建状态目录和原子替换文件
+import os
+# 导入threading库，解析父仓库的工作线程会并发写入缓存
+import threading
+
+
+def slim_parent(parent):
+    """
+    从 /repos/{full_name} 返回的 parent 字段中提取同步所需的字段。
+
+    参数:
+    parent - 父仓库信息字典。
+
+    返回:
+    只包含 full_name、default_branch 和 owner（login、html_url）的字典。
+    """
+    owner = parent.get('owner') or {}
+    return {
+        'full_name': parent['full_name'],
+        'default_branch': parent.get('default_branch'),
+        'owner': {'login': owner.get('login'), 'html_url': owner.get('html_url')},
+    }
+
+
+class ForkParentCache:
+    """
+    按 fork 保存父仓库信息，以 fork 的 updated_at 作为版本。
+    /users/{username}/repos 的列表不包含 parent 字段，updated_at 没有变化的 fork
+    可以直接使用缓存的父仓库信息，不必再请求 /repos/{full_name}。
+    """
+
+    def __init__(self, path):
+        """
+        读取（不存在时新建）缓存文件。
+
+        参数:
+        path - JSON缓存文件路径。
+        """
+        self.path = path
+        self._forks = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    self._forks = json.load(f)
+            except (OSError, ValueError) as e:
+                # 文件损坏时重新解析所有父仓库，而不是中断维护任务
+                logging.warning(f"无法读取父仓库缓存文件 {path}，将重新解析: {e}")
+                self._forks = {}
+
+    def get(self, full_name, updated_at):
+        """
+        返回缓存的父仓库信息。
+
+        参数:
+        full_name - fork 的 "owner/repo"。
+        updated_at - fork 当前的 updated_at。
+
+        返回:
+        父仓库信息字典；没有缓存或 updated_at 已变化时为None。
+        """
+        entry = self._forks.get(full_name)
+        if not entry or entry['updated_at'] != updated_at:
+            return None
+        return entry['parent']
+
+    def update(self, full_name, updated_at, parent):
+        """
+        更新 fork 的父仓库信息。
+
+        参数:
+        full_name - fork 的 "owner/repo"。
+        updated_at - fork 当前的 updated_at。
+        parent - slim_parent 返回的父仓库信息字典。
+        """
+        with self._lock:
+            self._forks[full_name] = {'updated_at': updated_at, 'parent': parent}
+
+    def save(self):
+        """
+        写回缓存文件（先写临时文件再替换，避免进程中断时留下半个文件）。
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with self._lock, open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._forks, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -1,13 +1,29 @@
 # 导入requests库，用于发送HTTP请求
 import requests
 # 导入requests的异常类，用于处理请求中可能出现的异常
-from requests.exceptions import HTTPError, Timeout, TooManyRedirects
+from requests.exceptions import ConnectionError, HTTPError, Timeout, TooManyRedirects
 # 导入logging库，用于记录日志
 import logging
 # 导入os库，用于获取环境变量
 import os
 # 导入time库，用于延迟操作
 import time
+# 导入线程池，用于并发预取分页
+from concurrent.futures import ThreadPoolExecutor
+# 导入URL解析工具，用于从Link头部中读取页码
+from urllib.parse import parse_qs, urlparse
+
+from github_transport import (
+    Transport, build_response, create_session, get_transport, is_rate_limited, retry_delay, should_retry
+)
+from rate_limiter import resource_for
+from response_cache import ResponseCache
+
+# 持久化状态（响应缓存等）的目录，可在Actions中通过actions/cache在多次运行之间保留
+STATE_DIR = os.getenv('GH_STATE_DIR', '.github-state')
+
+# 并发预取分页时的默认线程数
+DEFAULT_PAGE_WORKERS = int(os.getenv('GH_PAGE_WORKERS', '4'))
 
 # 设置日志记录的基本配置
 # 设置日志记录
@@ -19,64 +35,260 @@ class GitHubAPIClient:
     """
     GitHub API客户端类，用于封装对GitHub API的请求。
     """
-    def __init__(self):
+    def __init__(self, cache=None, rate_limiter=None, transport=None, metrics=None):
         """
-        初始化方法，设置API的基础URL和请求的默认头部。
+        初始化方法，设置API的基础URL、请求的默认头部和响应缓存。
+
+        参数:
+        cache - 可选的ResponseCache实例；默认使用STATE_DIR下的缓存文件，
+                设置环境变量GH_HTTP_CACHE=0可关闭缓存。
+        rate_limiter - 可选的RateLimiter实例，默认使用进程内共享的限速器。
+        transport - 可选的Transport实例，默认使用所有脚本共享的传输层；
+                    也可以传入传输层类型"requests"或"http2"，创建独立的连接池。
+        metrics - 可选的APIMetrics实例，默认使用进程内共享的指标。
         """
         self.base_url = 'https://api.github.com'  # GitHub API的基础URL
-        self.session = requests.Session()  # 创建一个请求会话，用于复用连接和头部信息
-        # 更新会话的头部，包括认证令牌和接受的API版本
-        self.session.headers.update({
+        if isinstance(transport, str):
+            transport = Transport(create_session(transport), rate_limiter, metrics)
+        elif transport is None and (rate_limiter or metrics):
+            # 单独指定限速器或指标时仍然复用共享的连接池
+            transport = Transport(get_transport().session, rate_limiter, metrics)
+        self.transport = transport or get_transport()
+        # 认证和API版本头部随每个请求发送，共享连接池的会话不带GitHub令牌
+        self.headers = {
             'Authorization': f'token {os.getenv("GH_TOKEN")}',
             'Accept': 'application/vnd.github.v3+json'
-        })
+        }
+        if cache is None and os.getenv('GH_HTTP_CACHE', '1') != '0':
+            cache = default_response_cache()
+        self.cache = cache
+        self.rate_limiter = self.transport.rate_limiter
+        self.metrics = self.transport.metrics
+
+    @property
+    def session(self):
+        """
+        传输层使用的会话（requests.Session或HTTP2Transport）。
+        """
+        return self.transport.session
 
-    def api_request(self, method, endpoint, max_retries=3, **kwargs):
+    @session.setter
+    def session(self, session):
+        self.transport.session = session
+
+    def api_request(self, method, endpoint, max_retries=3, expected_statuses=(), **kwargs):
         """
         发送API请求，并处理重试逻辑。
-        
+        GET请求会带上缓存中的ETag / Last-Modified发送条件请求，304时返回缓存内容。
+        是否重试以及重试前的等待时间由传输层的统一重试策略决定（should_retry / retry_delay）。
+
         参数:
         method - 请求的方法（GET、POST等）。
         endpoint - API的端点路径。
         max_retries - 最大重试次数，默认为3。
+        expected_statuses - 调用方自行处理的错误状态码（如删除运行中的工作流返回的409），
+                            遇到时直接返回响应，不视为失败也不重试。
         **kwargs - 传递给requests请求方法的额外参数。
         
         返回:
         requests.Response对象，如果所有重试都失败，则返回None。
         """
-        """
-        发送API请求并返回响应，带重试逻辑，并自动设置头部
-        """
         url = f"{self.base_url}/{endpoint}"  # 构建请求的完整URL
+        resource = resource_for(endpoint)  # 请求消耗的速率限制资源
+        kwargs['headers'] = {**self.headers, **kwargs.get('headers', {})}
+        cache_key = None
+        if self.cache is not None and method.upper() == 'GET':
+            cache_key = cache_key_for(url, kwargs.get('params'))
+            kwargs['headers'] = {**self.cache.conditional_headers(cache_key), **kwargs['headers']}
         retries = 0  # 初始化重试次数
         while retries < max_retries:
+            response = None
             try:
-                response = self.session.request(method, url, **kwargs)  # 发送请求
+                response = self._send(method, url, endpoint, resource, retries > 0, **kwargs)  # 发送请求
+                if response.status_code in expected_statuses and not is_rate_limited(response):
+                    return response  # 由调用方处理的状态码（速率限制的403/429仍按统一策略重试）
                 response.raise_for_status()  # 检查响应状态码，如有异常则抛出
-                self._check_rate_limit(response)  # 检查速率限制
+                if cache_key is not None:
+                    response = apply_response_cache(self.cache, cache_key, response)
                 return response  # 返回响应对象
-            except (HTTPError, Timeout, TooManyRedirects) as e:  # 捕获请求过程中可能出现的异常
+            except (HTTPError, Timeout, TooManyRedirects, ConnectionError) as e:  # 捕获请求过程中可能出现的异常
                 retries += 1  # 增加重试次数
                 logging.error(f"请求失败: {e}, URL: {url}. 重试 {retries}/{max_retries}")  # 记录错误日志
-                if e.response:
-                    logging.error(f"响应内容: {e.response.text}")  # 如果有响应内容，则记录响应内容
-                time.sleep(2**retries)  # 指数退避策略，延迟重试时间
+                if response is not None and response.text:
+                    logging.error(f"响应内容: {response.text}")  # 如果有响应内容，则记录响应内容
+                if not should_retry(method, response):
+                    return None  # 重试也不会成功的错误（如404、422）
+                if retries < max_retries:
+                    time.sleep(retry_delay(retries, response))  # 指数退避或按Retry-After等待
         return None  # 如果重试次数达到上限，返回None
 
-    def _check_rate_limit(self, response):
+    def _send(self, method, url, endpoint, resource, retry, **kwargs):
         """
-        检查API速率限制，并根据情况暂停请求。
-        
+        通过传输层发送一次请求：按剩余额度均匀限速，用响应头部刷新限速器（包括错误响应），
+        并按端点模板记录状态码、耗时、字节数和速率限制消耗。
+
+        返回:
+        requests.Response对象。
+        """
+        return self.transport.send(method, url, endpoint, resource, retry, **kwargs)
+
+    def paginate(self, endpoint, params=None, item_key=None, per_page=100, max_workers=None, decode=None):
+        """
+        遍历分页接口的所有条目。先请求第一页，从Link头部的rel="last"读取总页数，
+        再并发预取剩余页面；条目按页序以流的方式产出，调用方无需等待最后一页。
+
         参数:
-        response - requests.Response对象，用于获取响应头部信息。
+        endpoint - API的端点路径（不含page参数）。
+        params - 额外的查询参数。
+        item_key - 条目所在的字段（如"workflow_runs"）；为None时响应本身就是列表。
+        per_page - 每页条目数，默认为100（GitHub允许的最大值）。
+        max_workers - 预取线程数，默认读取GH_PAGE_WORKERS（4）。
+        decode - 可选的解码函数，接收一页响应并返回条目列表，用于代替item_key。
+
+        返回:
+        条目的生成器。
+        """
+        first = self._fetch_page(endpoint, params, per_page, 1)
+        if first is None:
+            return
+        decode = decode or (lambda response: page_items(response, item_key))
+        yield from decode(first)
+
+        last_page = last_page_number(first)
+        if last_page <= 1:
+            return
+        executor = ThreadPoolExecutor(max_workers=max_workers or DEFAULT_PAGE_WORKERS)
+        try:
+            pages = executor.map(
+                lambda page: self._fetch_page(endpoint, params, per_page, page),
+                range(2, last_page + 1),
+            )
+            for response in pages:
+                if response is None:
+                    break
+                yield from decode(response)
+        finally:
+            # 调用方提前停止遍历时，取消尚未开始的页面请求
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _fetch_page(self, endpoint, params, per_page, page):
+        """
+        请求分页接口的指定页。
+
+        返回:
+        状态码为200的requests.Response对象，失败时返回None。
         """
+        response = self.api_request('GET', endpoint, params={**(params or {}), 'per_page': per_page, 'page': page})
+        if response is None or response.status_code != 200:
+            logging.error(f"获取 {endpoint} 第 {page} 页失败。")
+            return None
+        return response
+
+    def graphql(self, query, variables=None):
         """
-        检查速率限制，如果接近限制则暂停
+        发送GraphQL查询。
+
+        参数:
+        query - GraphQL查询语句。
+        variables - 查询变量字典。
+
+        返回:
+        响应中的data字段；请求失败或返回errors时返回None。
         """
-        if 'X-RateLimit-Remaining' in response.headers:  # 检查剩余请求次数
-            remaining = int(response.headers['X-RateLimit-Remaining'])  # 获取剩余请求次数
-            if remaining < 10:  # 如果剩余请求次数少于10次
-                reset_time = int(response.headers.get('X-RateLimit-Reset', time.time() + 60))  # 获取速率限制重置的时间戳
-                sleep_time = max(reset_time - time.time(), 3)  # 计算需要暂停的时间，至少为3秒
-                logging.info(f"达到速率限制，暂停 {sleep_time} 秒")  # 记录信息日志
-                time.sleep(sleep_time)  # 暂停请求
\ No newline at end of file
+        response = self.api_request('POST', 'graphql', json={'query': query, 'variables': variables or {}})
+        if response is None or response.status_code != 200:
+            logging.error("GraphQL请求失败。")
+            return None
+        payload = response.json()
+        if payload.get('errors'):
+            logging.error(f"GraphQL查询返回错误: {payload['errors']}")
+            return None
+        return payload.get('data')
+
+
+def last_page_number(response):
+    """
+    从Link头部的rel="last"读取最后一页的页码。
+
+    参数:
+    response - 第一页的requests.Response对象。
+
+    返回:
+    最后一页的页码；没有Link头部（只有一页）时返回1。
+    """
+    last = response.links.get('last')
+    if not last:
+        return 1
+    page = parse_qs(urlparse(last['url']).query).get('page')
+    return int(page[0]) if page else 1
+
+
+def page_items(response, item_key=None):
+    """
+    取出一页响应中的条目列表。
+
+    参数:
+    response - requests.Response对象。
+    item_key - 条目所在的字段；为None时响应本身就是列表。
+
+    返回:
+    条目列表。
+    """
+    data = response.json()
+    if item_key is not None:
+        return data.get(item_key, [])
+    return data
+
+
+def cache_key_for(url, params=None):
+    """
+    计算响应缓存的键：带上查询参数的完整URL。
+
+    参数:
+    url - 请求URL。
+    params - 请求的查询参数（可选）。
+
+    返回:
+    字符串形式的缓存键。
+    """
+    if not params:
+        return url
+    return requests.Request('GET', url, params=params).prepare().url
+
+
+def apply_response_cache(cache, cache_key, response):
+    """
+    304时用缓存内容构造响应，200时把响应写入缓存。同步和异步客户端共用。
+
+    参数:
+    cache - ResponseCache实例。
+    cache_key - 缓存键（完整URL）。
+    response - requests.Response对象。
+
+    返回:
+    调用方实际使用的requests.Response对象。
+    """
+    if response.status_code == 304:
+        cached = cache.lookup(cache_key)
+        if cached is not None:
+            headers, body = cached
+            return build_response(200, {**response.headers, **headers}, body, response.url)
+    elif response.status_code == 200:
+        cache.store(cache_key, response.headers, response.content)
+    return response
+
+
+_default_cache = None
+
+
+def default_response_cache():
+    """
+    返回进程内共享的默认响应缓存（STATE_DIR/http_cache.sqlite3）。
+
+    返回:
+    ResponseCache实例。
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResponseCache(os.path.join(STATE_DIR, 'http_cache.sqlite3'))
+    return _default_cache
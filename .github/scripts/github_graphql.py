@@ -0,0 +1,196 @@
+import logging
+
+# 每页仓库数量。每个仓库最多带回100个开放PR，仓库数过多时单次查询可能超时
+REPOS_PER_PAGE = 100
+
+# PR字段：作者、时间、合并状态，以及最新评论和时间线的更新时间，用于判断活跃度
+PR_FIELDS = """
+number
+author { __typename login }
+createdAt
+updatedAt
+mergeable
+mergeStateStatus
+comments(last: 1) { nodes { createdAt } }
+timelineItems(last: 1) { updatedAt }
+"""
+
+PR_INVENTORY_QUERY = """
+query($login: String!, $first: Int!, $after: String) {
+  repositoryOwner(login: $login) {
+    repositories(first: $first, after: $after, ownerAffiliations: OWNER) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        name
+        owner { login }
+        isArchived
+        pullRequests(states: OPEN, first: 100) {
+          pageInfo { hasNextPage endCursor }
+          nodes { %s }
+        }
+      }
+    }
+  }
+}
+""" % PR_FIELDS
+
+REPO_PRS_QUERY = """
+query($owner: String!, $name: String!, $after: String) {
+  repository(owner: $owner, name: $name) {
+    pullRequests(states: OPEN, first: 100, after: $after) {
+      pageInfo { hasNextPage endCursor }
+      nodes { %s }
+    }
+  }
+}
+""" % PR_FIELDS
+
+
+def normalize_pull_request(node):
+    """
+    将GraphQL的PR节点转换为与REST /pulls 列表相同形状的字典，
+    并附加 last_activity_at（更新时间、最新评论、时间线更新的最大值）。
+
+    :param node: GraphQL返回的PR节点。
+    :return: PR字典。
+    """
+    author = node.get("author") or {}
+    login = author.get("login")
+    # GraphQL中机器人账号不带 [bot] 后缀，与REST保持一致
+    if login and author.get("__typename") == "Bot":
+        login = f"{login}[bot]"
+    timestamps = [node["updatedAt"]]
+    comments = (node.get("comments") or {}).get("nodes") or []
+    if comments:
+        timestamps.append(comments[-1]["createdAt"])
+    timeline_updated = (node.get("timelineItems") or {}).get("updatedAt")
+    if timeline_updated:
+        timestamps.append(timeline_updated)
+    merge_state = node.get("mergeStateStatus")
+    return {
+        "number": node["number"],
+        "user": {"login": login},
+        "created_at": node["createdAt"],
+        "updated_at": node["updatedAt"],
+        "mergeable": {"MERGEABLE": True, "CONFLICTING": False}.get(node.get("mergeable")),
+        "mergeable_state": merge_state.lower() if merge_state else None,
+        # ISO 8601 UTC时间字符串可以直接按字典序比较
+        "last_activity_at": max(timestamps),
+    }
+
+
+def fetch_pr_inventory(client, login, repos_per_page=REPOS_PER_PAGE):
+    """
+    用一个分页的GraphQL查询获取用户所有仓库及其开放PR。
+    每100个仓库一次请求；开放PR超过100个的仓库再单独补齐剩余分页。
+
+    :param client: GitHubAPIClient实例。
+    :param login: 用户或组织名。
+    :param repos_per_page: 每页仓库数量。
+    :return: 生成器，产出 {"owner", "name", "archived", "pull_requests"} 字典。
+    """
+    after = None
+    while True:
+        repositories = _repositories_page(
+            client.graphql(PR_INVENTORY_QUERY, _inventory_variables(login, repos_per_page, after)), login
+        )
+        if repositories is None:
+            return
+        for repo in repositories["nodes"]:
+            nodes = repo["pullRequests"]["nodes"]
+            page_info = repo["pullRequests"]["pageInfo"]
+            if page_info["hasNextPage"]:
+                nodes = nodes + list(
+                    _fetch_remaining_prs(client, repo["owner"]["login"], repo["name"], page_info["endCursor"])
+                )
+            yield _inventory_entry(repo, nodes)
+        after = _next_cursor(repositories)
+        if after is None:
+            return
+
+
+async def fetch_pr_inventory_async(client, login, repos_per_page=REPOS_PER_PAGE):
+    """
+    fetch_pr_inventory的异步版本，查询和结果与同步版本相同。
+    游标分页只能依次请求，这里只是不阻塞事件循环。
+
+    :param client: AsyncGitHubAPIClient实例。
+    :param login: 用户或组织名。
+    :param repos_per_page: 每页仓库数量。
+    :return: 异步生成器，产出与fetch_pr_inventory相同的字典。
+    """
+    after = None
+    while True:
+        repositories = _repositories_page(
+            await client.graphql(PR_INVENTORY_QUERY, _inventory_variables(login, repos_per_page, after)), login
+        )
+        if repositories is None:
+            return
+        for repo in repositories["nodes"]:
+            nodes = repo["pullRequests"]["nodes"]
+            after_pr = _next_cursor(repo["pullRequests"])
+            while after_pr:
+                pull_requests = _remaining_prs_page(
+                    await client.graphql(
+                        REPO_PRS_QUERY, {"owner": repo["owner"]["login"], "name": repo["name"], "after": after_pr}
+                    ),
+                    repo["owner"]["login"],
+                    repo["name"],
+                )
+                if pull_requests is None:
+                    break
+                nodes = nodes + pull_requests["nodes"]
+                after_pr = _next_cursor(pull_requests)
+            yield _inventory_entry(repo, nodes)
+        after = _next_cursor(repositories)
+        if after is None:
+            return
+
+
+def _fetch_remaining_prs(client, owner, name, after):
+    """
+    获取单个仓库剩余分页的开放PR节点。
+    """
+    while after:
+        pull_requests = _remaining_prs_page(
+            client.graphql(REPO_PRS_QUERY, {"owner": owner, "name": name, "after": after}), owner, name
+        )
+        if pull_requests is None:
+            return
+        yield from pull_requests["nodes"]
+        after = _next_cursor(pull_requests)
+
+
+def _inventory_variables(login, repos_per_page, after):
+    return {"login": login, "first": repos_per_page, "after": after}
+
+
+def _repositories_page(data, login):
+    """返回清单查询一页的 repositories 连接，失败时记录日志并返回None"""
+    if not data or not data.get("repositoryOwner"):
+        logging.error(f"无法通过GraphQL获取 {login} 的仓库和PR清单")
+        return None
+    return data["repositoryOwner"]["repositories"]
+
+
+def _remaining_prs_page(data, owner, name):
+    """返回单仓库PR查询一页的 pullRequests 连接，失败时记录日志并返回None"""
+    if not data or not data.get("repository"):
+        logging.error(f"无法通过GraphQL获取 {owner}/{name} 的剩余PR")
+        return None
+    return data["repository"]["pullRequests"]
+
+
+def _next_cursor(connection):
+    """返回连接的下一页游标，没有下一页时为None"""
+    page_info = connection["pageInfo"]
+    return page_info["endCursor"] if page_info["hasNextPage"] else None
+
+
+def _inventory_entry(repo, nodes):
+    return {
+        "owner": repo["owner"]["login"],
+        "name": repo["name"],
+        "archived": repo["isArchived"],
+        "pull_requests": [normalize_pull_request(node) for node in nodes],
+    }
@@ -1,6 +1,27 @@
 import logging
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from github_api_client import GitHubAPIClient
+from github_api_client import GitHubAPIClient, last_page_number
+from github_graphql import fetch_pr_inventory
+from pr_snapshot import PullRequestSnapshot
+from repo_index import needs_run_probe, repo_capabilities
+from pr_activity import (
+    TIMELINE_PER_PAGE,
+    activity_cutoff,
+    comments_since_params,
+    latest_timeline_time,
+)
+from run_retention import log_plan, plan_retention
+from run_watermarks import merge_snapshot, next_watermark
+from work_pipeline import CLOSED, COMMENTED, when_all_done
+from workflow_runs import (
+    DELETED, FAILED, SKIPPED, TruncatedListing, capped_filters, decode_runs_page, truncation_guard
+)
+
+# 并发检查PR活跃度、探测仓库运行数量的线程数
+ACTIVITY_CHECK_WORKERS = int(os.getenv("GH_ACTIVITY_WORKERS", "8"))
 
 
 class GitHubRepoManager:
@@ -8,11 +29,23 @@ class GitHubRepoManager:
     GitHub仓库管理类，提供对GitHub仓库的各种操作，如删除工作流运行、获取仓库列表、关闭PR等。
     """
 
-    def __init__(self):
+    def __init__(self, pipeline=None):
         """
         初始化GitHubAPIClient用于API请求。
+
+        :param pipeline: 可选的WorkPipeline实例；提供时删除运行、关闭PR和发表评论
+            提交到流水线并发执行，结果汇总在pipeline.report中。
         """
         self.client = GitHubAPIClient()
+        self.pipeline = pipeline
+
+    def _dispatch(self, owner, repo, kind, func, *args):
+        """
+        执行一个写操作：没有流水线时立即执行并返回结果，有流水线时提交并返回Future。
+        """
+        if self.pipeline is None:
+            return func(*args)
+        return self.pipeline.submit(f"{owner}/{repo}", kind, func, *args)
 
     def delete_run(self, owner, repo, run_id):
         """
@@ -38,20 +71,7 @@ class GitHubRepoManager:
         :return: 仓库列表。
         """
         """获取用户的所有仓库，支持分页"""
-        repos = []
-        page = 1
-        while True:
-            endpoint = f"users/{username}/repos?page={page}&per_page=100"
-            response = self.client.api_request("GET", endpoint)
-            if response and response.status_code == 200:
-                page_repos = response.json()
-                if not page_repos:
-                    break
-                repos.extend(page_repos)
-                page += 1
-            else:
-                break
-        return repos
+        return list(self.client.paginate(f"users/{username}/repos"))
 
     def delete_non_successful_runs_for_repo(self, owner, repo):
         """
@@ -61,25 +81,15 @@ class GitHubRepoManager:
         :param repo: 仓库名称。
         """
         """删除仓库中所有未成功的工作流运行记录"""
-        page = 1
-        while True:
-            endpoint = f"repos/{owner}/{repo}/actions/runs?page={page}&per_page=100"
-            response = self.client.api_request("GET", endpoint)
-            if response and response.status_code == 200:
-                runs_data = response.json()
-                runs = runs_data.get("workflow_runs", [])
-                if not runs:
-                    break
-
-                for run in runs:
-                    if run["conclusion"] != "success":
-                        self.delete_workflow(
-                            owner, repo, run["id"]
-                        )  # 使用统一的删除方法
-
-                page += 1
-            else:
-                break
+        # 先在流式遍历中收集待删除的记录，遍历结束后再删除，避免边分页边删除导致条目前移而被跳过
+        # 运行中的记录不会被删除，只列举已结束的运行；conclusion没有“不等于”的过滤条件，仍在本地判断
+        targets = [
+            run
+            for run in self.iter_workflow_runs(owner, repo, status="completed")
+            # 超过返回上限改用完整列表时也会包含运行中的记录
+            if not run.is_active and run.conclusion != "success"
+        ]
+        self.delete_runs(owner, repo, targets)  # 使用统一的删除方法
 
     def comment_on_pr(self, owner, repo, pr_number, body):
         """
@@ -89,14 +99,16 @@ class GitHubRepoManager:
         :param repo: 仓库名称。
         :param pr_number: PR编号。
         :param body: 评论内容。
+        :return: COMMENTED或FAILED。
         """
         """在指定的PR上发布评论"""
         endpoint = f"repos/{owner}/{repo}/issues/{pr_number}/comments"
         response = self.client.api_request("POST", endpoint, json={"body": body})
         if response and response.status_code == 201:
             logging.info(f"在 {owner}/{repo} 的PR #{pr_number} 上发表评论")
-        else:
-            logging.error(f"无法在 {owner}/{repo} 的PR #{pr_number} 上发表评论")
+            return COMMENTED
+        logging.error(f"无法在 {owner}/{repo} 的PR #{pr_number} 上发表评论")
+        return FAILED
 
     def close_pr(self, owner, repo, pr_number):
         """
@@ -105,42 +117,73 @@ class GitHubRepoManager:
         :param owner: 仓库所有者。
         :param repo: 仓库名称。
         :param pr_number: PR编号。
+        :return: CLOSED或FAILED。
         """
         """关闭指定的PR"""
         endpoint = f"repos/{owner}/{repo}/pulls/{pr_number}"
         response = self.client.api_request("PATCH", endpoint, json={"state": "closed"})
         if response and response.status_code == 200:
             logging.info(f"关闭了 {owner}/{repo} 的PR #{pr_number}")
-        else:
-            logging.error(f"无法关闭 {owner}/{repo} 的PR #{pr_number}")
+            return CLOSED
+        logging.error(f"无法关闭 {owner}/{repo} 的PR #{pr_number}")
+        return FAILED
+
+    def get_pr_snapshot(self, owner, repo, pull_requests=None):
+        """
+        获取仓库开放PR的快照（完整分页），供各PR处理步骤共用。
 
-    def process_dependabot_prs(self, owner, repo):
+        :param owner: 仓库所有者。
+        :param repo: 仓库名称。
+        :param pull_requests: 可选的开放PR列表（如来自get_pr_inventory），提供时不再请求REST列表。
+        :return: PullRequestSnapshot实例。
+        """
+        if pull_requests is None:
+            pull_requests = list(
+                self.client.paginate(f"repos/{owner}/{repo}/pulls", params={"state": "open"})
+            )
+        return PullRequestSnapshot(owner, repo, pull_requests)
+
+    def pr_mergeable_state(self, snapshot, pr_number):
+        """
+        返回PR的mergeable_state。列表接口不返回该字段，第一次需要时请求单个PR并写回快照。
+
+        :param snapshot: PullRequestSnapshot实例。
+        :param pr_number: PR编号。
+        :return: mergeable_state字符串，获取失败时为None。
+        """
+        if snapshot.needs_details(pr_number):
+            endpoint = f"repos/{snapshot.owner}/{snapshot.repo}/pulls/{pr_number}"
+            response = self.client.api_request("GET", endpoint)
+            if not (response and response.status_code == 200):
+                logging.error(f"无法获取 {snapshot.owner}/{snapshot.repo} 的PR #{pr_number} 详情")
+                return None
+            snapshot.update_details(pr_number, response.json())
+        return snapshot.get(pr_number).get("mergeable_state")
+
+    def process_dependabot_prs(self, owner, repo, snapshot=None):
         """
-        处理指定仓库中由dependabot创建的PR。
+        处理指定仓库中由dependabot创建的PR：超过30天的关闭，落后于基础分支的请求rebase。
 
         :param owner: 仓库所有者。
         :param repo: 仓库名称。
+        :param snapshot: 可选的PullRequestSnapshot，默认新获取；被关闭的PR会在快照中标记。
         """
         """处理指定仓库中由dependabot创建的PR"""
-        endpoint = f"repos/{owner}/{repo}/pulls"
-        response = self.client.api_request("GET", endpoint)
-        if response and response.status_code == 200:
-            prs = response.json()
-            for pr in prs:
-                if pr["user"]["login"] == "dependabot[bot]":
-                    mergeable_state = pr.get("mergeable_state")
-                    if mergeable_state is not None and mergeable_state == "behind":
-                        self.comment_on_pr(
-                            owner, repo, pr["number"], "@dependabot rebase"
-                        )
-
-                    pr_created_at = datetime.strptime(
-                        pr["created_at"], "%Y-%m-%dT%H:%M:%SZ"
-                    )
-                    if datetime.now() - pr_created_at > timedelta(days=30):
-                        self.close_pr(owner, repo, pr["number"])
-        else:
-            logging.error(f"无法从仓库 {repo} 获取PRs")
+        if snapshot is None:
+            snapshot = self.get_pr_snapshot(owner, repo)
+        for pr in snapshot.open_pull_requests():
+            if pr["user"]["login"] != "dependabot[bot]":
+                continue
+            pr_created_at = datetime.strptime(pr["created_at"], "%Y-%m-%dT%H:%M:%SZ")
+            if datetime.now() - pr_created_at > timedelta(days=30):
+                # 即将关闭的PR不再请求详情、也不再请求rebase
+                self._dispatch(owner, repo, "close_pr", self.close_pr, owner, repo, pr["number"])
+                snapshot.mark_closed(pr["number"])
+            elif self.pr_mergeable_state(snapshot, pr["number"]) == "behind":
+                self._dispatch(
+                    owner, repo, "comment_pr",
+                    self.comment_on_pr, owner, repo, pr["number"], "@dependabot rebase",
+                )
 
     def is_inactive(self, updated_at):
         """
@@ -150,42 +193,49 @@ class GitHubRepoManager:
         :return: 如果PR不活跃返回True，否则返回False。
         """
         """判断PR是否不活跃（默认2天未活动）"""
-        inactive_time = datetime.now() - timedelta(days=2)
-        pr_last_updated = datetime.strptime(updated_at, "%Y-%m-%dT%H:%M:%SZ")
-        return pr_last_updated < inactive_time
+        # ISO 8601 UTC时间字符串可以直接按字典序比较，无需逐个strptime
+        return updated_at < activity_cutoff()
 
     def has_recent_activity(self, owner, repo, pr_number):
         """
         检查PR在过去2天内是否有评论或活动。
+        先用 since 只请求截止时间之后更新过的评论（最多一条），有则立即返回；
+        否则读取时间线的最后一页（时间线按时间正序排列，最新的事件在最后一页）。
 
         :param owner: 仓库所有者。
         :param repo: 仓库名称。
         :param pr_number: PR编号。
         :return: 如果PR有 recent activity 返回True，否则返回False。
         """
-        """检查PR在过去2天内是否有评论或活动"""
+        cutoff = activity_cutoff()
         comments_endpoint = f"repos/{owner}/{repo}/issues/{pr_number}/comments"
-        events_endpoint = f"repos/{owner}/{repo}/issues/{pr_number}/events"
-
-        comments_response = self.client.api_request("GET", comments_endpoint)
-        if comments_response and comments_response.status_code == 200:
-            comments = comments_response.json()
-            for comment in comments:
-                if datetime.strptime(
-                    comment["created_at"], "%Y-%m-%dT%H:%M:%SZ"
-                ) > datetime.now() - timedelta(days=2):
-                    return True
-
-        events_response = self.client.api_request("GET", events_endpoint)
-        if events_response and events_response.status_code == 200:
-            events = events_response.json()
-            for event in events:
-                if datetime.strptime(
-                    event["created_at"], "%Y-%m-%dT%H:%M:%SZ"
-                ) > datetime.now() - timedelta(days=2):
-                    return True
-
-        return False
+        response = self.client.api_request(
+            "GET", comments_endpoint, params=comments_since_params(cutoff)
+        )
+        if response and response.status_code == 200 and response.json():
+            return True
+
+        latest = self._latest_timeline_time(owner, repo, pr_number)
+        return latest is not None and latest > cutoff
+
+    def _latest_timeline_time(self, owner, repo, pr_number):
+        """
+        获取PR时间线中最新事件的时间：第一页的Link头部给出最后一页，只需再请求最后一页。
+
+        :return: ISO 8601时间字符串，获取失败或没有事件时为None。
+        """
+        endpoint = f"repos/{owner}/{repo}/issues/{pr_number}/timeline"
+        response = self.client.api_request("GET", endpoint, params={"per_page": TIMELINE_PER_PAGE})
+        if not (response and response.status_code == 200):
+            return None
+        last = last_page_number(response)
+        if last > 1:
+            response = self.client.api_request(
+                "GET", endpoint, params={"per_page": TIMELINE_PER_PAGE, "page": last}
+            )
+            if not (response and response.status_code == 200):
+                return None
+        return latest_timeline_time(response.json())
 
     def add_comment_to_pr(self, owner, repo, pr_number, comment):
         """
@@ -202,64 +252,262 @@ class GitHubRepoManager:
         if response.status_code != 201:
             logging.error(f"添加评论到PR #{pr_number} 失败")
 
-    def close_inactive_pull_requests_for_repo(self, owner, repo):
+    def close_inactive_pull_requests_for_repo(self, owner, repo, snapshot=None):
         """
         关闭指定仓库中所有超过2天没有活动的PR，并在关闭时添加评论说明原因。
 
         :param owner: 仓库所有者。
         :param repo: 仓库名称。
+        :param snapshot: 可选的PullRequestSnapshot，默认新获取；
+            带有 last_activity_at 的PR（来自GraphQL清单）直接据此判断，不再逐个请求评论和时间线。
+        """
+        if snapshot is None:
+            snapshot = self.get_pr_snapshot(owner, repo)
+        pull_requests = snapshot.open_pull_requests()
+        # 各PR的活跃度检查互不依赖，并发进行
+        with ThreadPoolExecutor(max_workers=ACTIVITY_CHECK_WORKERS) as executor:
+            stale = list(executor.map(lambda pr: self._is_stale_pr(owner, repo, pr), pull_requests))
+        for pr, is_stale in zip(pull_requests, stale):
+            if is_stale:
+                # 评论和关闭作为一个任务提交，保证先评论后关闭
+                self._dispatch(
+                    owner, repo, "close_inactive_pr",
+                    self._close_inactive_pr, owner, repo, pr["number"],
+                )
+                snapshot.mark_closed(pr["number"])
+
+    def _close_inactive_pr(self, owner, repo, pr_number):
         """
-        endpoint = f"repos/{owner}/{repo}/pulls?state=open"
-        response = self.client.api_request("GET", endpoint)
-        if response and response.status_code == 200:
-            pull_requests = response.json()
-            for pr in pull_requests:
-                if self.is_inactive(pr["updated_at"]) and not self.has_recent_activity(
-                    owner, repo, pr["number"]
-                ):
-                    comment = "由于长时间无活动，此Pull Request已被自动关闭。"
-                    self.add_comment_to_pr(owner, repo, pr["number"], comment)
-                    self.close_pr(owner, repo, pr["number"])
-                    logging.info(
-                        f"由于长时间无活动，关闭了 {owner}/{repo} 的PR #{pr['number']} 并添加了评论"
-                    )
-        else:
-            logging.error(f"无法获取 {owner}/{repo} 的开放PR列表")
+        在不活跃的PR上添加评论说明原因，然后关闭它。
+
+        :return: CLOSED或FAILED。
+        """
+        comment = "由于长时间无活动，此Pull Request已被自动关闭。"
+        self.add_comment_to_pr(owner, repo, pr_number, comment)
+        outcome = self.close_pr(owner, repo, pr_number)
+        if outcome == CLOSED:
+            logging.info(
+                f"由于长时间无活动，关闭了 {owner}/{repo} 的PR #{pr_number} 并添加了评论"
+            )
+        return outcome
+
+    def _is_stale_pr(self, owner, repo, pr):
+        """
+        判断PR是否应因不活跃而关闭。
+
+        :param owner: 仓库所有者。
+        :param repo: 仓库名称。
+        :param pr: PR字典。
+        :return: 不活跃返回True。
+        """
+        if "last_activity_at" in pr:
+            return self.is_inactive(pr["last_activity_at"])
+        return self.is_inactive(pr["updated_at"]) and not self.has_recent_activity(
+            owner, repo, pr["number"]
+        )
+
+    def get_pr_inventory(self, username):
+        """
+        通过GraphQL一次性获取用户所有仓库的开放PR（每100个仓库一次请求），
+        包含作者、更新时间、合并状态和最近活动时间。
+
+        :param username: 用户名。
+        :return: {(owner, repo): [PR字典]}。
+        """
+        return {
+            (repo["owner"], repo["name"]): repo["pull_requests"]
+            for repo in fetch_pr_inventory(self.client, username)
+        }
 
     def get_workflow_runs(self, owner, repo, per_page=100):
         """
         获取指定仓库的所有工作流运行的详细信息，改进错误处理。
+        分页由GitHubAPIClient.paginate根据Link头部并发预取。
         """
-        runs_data = []
-        page = 1
-        while True:
-            endpoint = (
-                f"repos/{owner}/{repo}/actions/runs?page={page}&per_page={per_page}"
+        return list(
+            self.client.paginate(
+                f"repos/{owner}/{repo}/actions/runs",
+                item_key="workflow_runs",
+                per_page=per_page,
             )
-            response = self.client.api_request("GET", endpoint)
+        )
 
-            if response is not None:
-                if response.status_code == 200:
-                    runs = response.json().get("workflow_runs", [])
-                    runs_data.extend(runs)
-
-                    if len(runs) < per_page:
-                        break
-                    page += 1
-                else:
-                    logging.error(
-                        f"获取仓库 '{repo}' 的工作流运行失败。状态码：{response.status_code}"
-                    )
-                    break
-            else:
-                logging.error(f"请求仓库 '{repo}' 的工作流运行时未获得响应。")
-                break
+    def iter_workflow_runs(self, owner, repo, per_page=100, **filters):
+        """
+        以流的方式遍历指定仓库的工作流运行，产出只含保留策略所需字段的精简记录。
+
+        带 created/status/actor/branch/event 过滤时GitHub最多只返回最新的1000条结果；
+        过滤结果超过上限时改用不带过滤条件的完整列表，调用方收到的是过滤结果的超集，
+        需要自行在客户端按记录字段过滤（或像水位快照那样本来就能处理更多的运行）。
+
+        :param owner: 仓库所有者。
+        :param repo: 仓库名称。
+        :param per_page: 每页条目数。
+        :param filters: 服务端过滤条件，直接作为查询参数，例如 status="completed"、
+                        actor="dependabot[bot]"、created=">=2024-01-01T00:00:00Z"、branch="main"。
+        :return: WorkflowRun生成器。
+        """
+        endpoint = f"repos/{owner}/{repo}/actions/runs"
+        # 不需要关联的PR列表，减少响应体积
+        params = {"exclude_pull_requests": "true"}
+        if not capped_filters(filters):
+            params.update({key: value for key, value in filters.items() if value is not None})
+            return self.client.paginate(endpoint, params=params, per_page=per_page, decode=decode_runs_page)
+        return self._iter_capped_runs(endpoint, params, per_page, filters)
 
-        return runs_data
+    def _iter_capped_runs(self, endpoint, params, per_page, filters):
+        """
+        先按过滤条件列举；第一页报告的总数超过返回上限时（此时尚未产出任何条目），
+        改为列举不带过滤条件的完整列表。
+        """
+        filtered = {**params, **{key: value for key, value in filters.items() if value is not None}}
+        try:
+            yield from self.client.paginate(endpoint, params=filtered, per_page=per_page, decode=truncation_guard())
+        except TruncatedListing as e:
+            logging.warning(f"{endpoint}: {e}，改为列举全部运行")
+            yield from self.client.paginate(endpoint, params=params, per_page=per_page, decode=decode_runs_page)
+
+    def probe_runs(self, owner, repo):
+        """
+        只请求一条记录，获取仓库的工作流运行总数和最新一次运行的ID
+        （响应缓存命中时为不计额度的304）。
+
+        :param owner: 仓库所有者。
+        :param repo: 仓库名称。
+        :return: (运行总数, 最新运行ID)；没有运行时为 (0, None)，请求失败时为 (None, None)。
+        """
+        response = self.client.api_request(
+            "GET",
+            f"repos/{owner}/{repo}/actions/runs",
+            params={"exclude_pull_requests": "true", "per_page": 1},
+        )
+        if not (response and response.status_code == 200):
+            return None, None
+        data = response.json()
+        runs = data.get("workflow_runs") or []
+        return data.get("total_count", len(runs)), runs[0]["id"] if runs else None
+
+    def build_repo_index(self, repos):
+        """
+        构建仓库能力索引：归档、禁用和空仓库不发请求，其余仓库并发探测工作流运行数量。
+
+        :param repos: get_repos返回的仓库列表。
+        :return: {full_name: RepoCapabilities}。
+        """
+        probed = [repo for repo in repos if needs_run_probe(repo)]
+        with ThreadPoolExecutor(max_workers=ACTIVITY_CHECK_WORKERS) as executor:
+            results = dict(zip(
+                (repo["full_name"] for repo in probed),
+                executor.map(lambda repo: self.probe_runs(repo["owner"]["login"], repo["name"]), probed),
+            ))
+        index = {}
+        for repo in repos:
+            run_count, last_run_id = results.get(repo["full_name"], (0, None))
+            # 探测失败时不能确定没有运行，按有运行处理
+            index[repo["full_name"]] = repo_capabilities(
+                repo, 1 if run_count is None else run_count, last_run_id
+            )
+        return index
+
+    def delete_run_record(self, owner, repo, run):
+        """
+        删除一条已经从列表中获取到的运行记录，不再先发送GET探测状态。
+        运行中的记录根据列表中的状态直接跳过；若状态在列表之后发生变化，
+        由DELETE的409/403响应报告冲突。
+
+        :param owner: 仓库所有者。
+        :param repo: 仓库名称。
+        :param run: WorkflowRun记录。
+        :return: DELETED、SKIPPED或FAILED。
+        """
+        if run.is_active:
+            logging.info(f"工作流 ID {run.id} 在仓库 '{repo}' 中状态为 '{run.status}'，跳过删除。")
+            return SKIPPED
+        logging.info(
+            f"工作流 ID {run.id} 状态为 '{run.status}'，准备删除。"
+            f" commit_id={run.head_sha}, 触发者={run.actor}, 创建时间={run.created_at}, 分支={run.head_branch}"
+        )
+        endpoint = f"repos/{owner}/{repo}/actions/runs/{run.id}"
+        response = self.client.api_request("DELETE", endpoint, expected_statuses=(403, 404, 409))
+        if response is None:
+            logging.error(f"尝试删除仓库 '{repo}' 中ID为 '{run.id}' 的工作流失败。未收到有效响应。")
+            return FAILED
+        if response.status_code == 204:
+            logging.info(f"已成功删除仓库 '{repo}' 中ID为 '{run.id}' 的工作流。")
+            return DELETED
+        if response.status_code == 404:
+            # 保存在水位文件中的运行可能已被手动删除
+            logging.info(f"工作流 ID {run.id} 在仓库 '{repo}' 中已不存在。")
+            return DELETED
+        if response.status_code == 409:
+            logging.info(f"工作流 ID {run.id} 在仓库 '{repo}' 中仍在运行，跳过删除。")
+            return SKIPPED
+        logging.error(
+            f"尝试删除仓库 '{repo}' 中ID为 '{run.id}' 的工作流失败。状态码：{response.status_code}"
+        )
+        return FAILED
+
+    def delete_runs(self, owner, repo, runs):
+        """
+        删除一组运行记录：没有流水线时依次删除，有流水线时提交给工作线程并发删除。
+
+        :param owner: 仓库所有者。
+        :param repo: 仓库名称。
+        :param runs: WorkflowRun记录的可迭代对象。
+        :return: 各结果的计数（Counter）；使用流水线时结果汇总在pipeline.report中，返回None。
+        """
+        outcomes = [
+            self._dispatch(owner, repo, "delete_run", self.delete_run_record, owner, repo, run)
+            for run in runs
+        ]
+        if self.pipeline is not None:
+            return None
+        return Counter(outcomes)
+
+    def apply_retention(self, owner, repo, watermarks=None, on_complete=None):
+        """
+        列举一次仓库的工作流运行，在同一份快照上评估所有保留规则（保留每个工作流的
+        最新运行、删除未成功的运行、删除dependabot触发的运行），然后删除去重后的集合。
+
+        提供watermarks时只列举上次水位之后创建的运行（created>=水位），
+        再与上次保存的未删除运行合并成快照，扫描量与新增运行数成正比而不是与历史总数成正比。
+
+        :param owner: 仓库所有者。
+        :param repo: 仓库名称。
+        :param watermarks: 可选的RunWatermarkStore实例。
+        :param on_complete: 可选的回调，所有删除完成后以删除结果的Counter和
+                            保留下来的运行列表（未删除和运行中的记录）调用。
+        :return: (RetentionPlan, 删除结果的Counter)；使用流水线时第二项为None。
+        """
+        watermark, survivors = watermarks.get(owner, repo) if watermarks else (None, [])
+        created = f">={watermark}" if watermark else None
+        runs = merge_snapshot(survivors, self.iter_workflow_runs(owner, repo, created=created))
+        plan = plan_retention(runs)
+        log_plan(owner, repo, plan)
+        outcomes = [
+            self._dispatch(owner, repo, "delete_run", self.delete_run_record, owner, repo, run)
+            for run in plan.deletions
+        ]
+
+        def finish(outcomes):
+            deleted = {run.id for run, outcome in zip(plan.deletions, outcomes) if outcome == DELETED}
+            remaining = [run for run in runs if run.id not in deleted]
+            if watermarks is not None:
+                watermarks.update(owner, repo, next_watermark(runs) or watermark, remaining)
+            if on_complete is not None:
+                on_complete(Counter(outcomes), remaining)
+
+        if self.pipeline is not None:
+            # 删除在工作线程中进行，全部完成后再更新水位，删除失败的运行保留在survivors中
+            when_all_done(outcomes, finish)
+            return plan, None
+        finish(outcomes)
+        return plan, Counter(outcomes)
 
     def delete_workflow(self, owner, repo, workflow_id):
         """
-        删除指定仓库中的指定工作流。
+        删除指定仓库中的指定工作流。只有运行ID时使用；已有列表记录时应使用
+        delete_run_record，避免额外的GET探测请求。
 
         :param owner: 仓库所有者。
         :param repo: 仓库名称。
@@ -320,37 +568,35 @@ class GitHubRepoManager:
         :param repo: 仓库名称。
         """
         """维护特定仓库的工作流，保留最新的工作流运行并删除其他的"""
-        all_runs = self.get_workflow_runs(owner, repo)
+        all_runs = list(self.iter_workflow_runs(owner, repo))
         latest_runs = {}
         for run in all_runs:
-            workflow_name = run["name"]
             if (
-                workflow_name not in latest_runs
-                or latest_runs[workflow_name]["created_at"] < run["created_at"]
+                run.name not in latest_runs
+                or latest_runs[run.name].created_at < run.created_at
             ):
-                latest_runs[workflow_name] = run
+                latest_runs[run.name] = run
 
-        for run in all_runs:
-            if run["id"] != latest_runs[run["name"]]["id"]:
-                self.delete_workflow(owner, repo, run["id"])  # 统一调用删除方法
+        self.delete_runs(
+            owner,
+            repo,
+            [run for run in all_runs if run.id != latest_runs[run.name].id],
+        )  # 统一调用删除方法
 
-    def close_all_open_prs(self, owner, repo):
+    def close_all_open_prs(self, owner, repo, snapshot=None):
         """
         关闭指定仓库中所有打开的PR。
 
         :param owner: 仓库所有者。
         :param repo: 仓库名称。
+        :param snapshot: 可选的PullRequestSnapshot，默认新获取。
         """
         """关闭指定仓库中所有打开的PR"""
-        endpoint = f"repos/{owner}/{repo}/pulls?state=open"
-        response = self.client.api_request("GET", endpoint)
-        if response and response.status_code == 200:
-            pull_requests = response.json()
-            for pr in pull_requests:
-                self.close_pr(owner, repo, pr["number"])
-                logging.info(f"关闭了 {owner}/{repo} 的PR #{pr['number']}")
-        else:
-            logging.error(f"无法获取 {owner}/{repo} 的开放PR列表")
+        if snapshot is None:
+            snapshot = self.get_pr_snapshot(owner, repo)
+        for pr in snapshot.open_pull_requests():
+            self._dispatch(owner, repo, "close_pr", self.close_pr, owner, repo, pr["number"])
+            snapshot.mark_closed(pr["number"])
 
     def delete_dependabot_runs_for_repo(self, owner, repo):
         """
@@ -359,27 +605,11 @@ class GitHubRepoManager:
         :param owner: 仓库所有者。
         :param repo: 仓库名称。
         """
-        all_runs = self.get_workflow_runs(owner, repo)
-        for run in all_runs:
-            actor = run.get("triggering_actor") or run.get("actor")
-            # triggering_actor 结构为 dict，actor 也可能为 dict
-            login = None
-            if isinstance(actor, dict):
-                login = actor.get("login")
-            elif isinstance(actor, str):
-                login = actor
-            if login == "dependabot[bot]":
-                # 打印详细信息
-                commit_id = run.get("head_sha", "未知")
-                commit_pusher = (
-                    run.get("head_commit", {}).get("committer", {}).get("name", "未知")
-                )
-                created_at = run.get("created_at", "未知")
-                branch = run.get("head_branch", "未知")
-                logging.info(f"准备删除 dependabot 触发的 workflow_run:")
-                logging.info("  id=" + str(run["id"]))
-                logging.info(f"  commit_id={commit_id}")
-                logging.info(f"  推送者={commit_pusher}")
-                logging.info(f"  创建时间={created_at}")
-                logging.info(f"  分支={branch}")
-                self.delete_workflow(owner, repo, run["id"])
+        # 由服务端按触发者过滤，只下载 dependabot 触发的运行
+        targets = [
+            run
+            for run in self.iter_workflow_runs(owner, repo, actor="dependabot[bot]")
+            if run.actor == "dependabot[bot]"
+        ]
+        logging.info(f"准备删除 {len(targets)} 个 dependabot 触发的 workflow_run")
+        self.delete_runs(owner, repo, targets)
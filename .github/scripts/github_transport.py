@@ -0,0 +1,342 @@
+# 导入asyncio库，异步脚本在线程中使用同一个连接池
+import asyncio
+# 导入logging库，用于记录日志
+import logging
+# 导入threading库，保证共享传输层只创建一次
+import threading
+# 导入time库，用于计时和重试延迟
+import time
+# 导入URL解析工具，用于按主机决定是否限速
+from urllib.parse import urlparse
+# 导入requests库，默认传输层基于requests.Session
+import requests
+# 导入HTTPAdapter，用于配置连接池大小
+from requests.adapters import HTTPAdapter
+# 导入CaseInsensitiveDict，用于构造与requests一致的响应头部
+from requests.structures import CaseInsensitiveDict
+# 导入os库，用于获取环境变量
+import os
+
+from api_metrics import get_metrics
+from rate_limiter import get_rate_limiter, resource_for
+
+# 传输层类型：requests（HTTP/1.1，默认）或 http2（基于httpx，多路复用）
+DEFAULT_TRANSPORT = os.getenv('GH_HTTP_TRANSPORT', 'requests')
+# 连接池上限（requests为每个主机的连接数，http2为总连接数）
+DEFAULT_MAX_CONNECTIONS = int(os.getenv('GH_HTTP_MAX_CONNECTIONS', '10'))
+# 保持空闲长连接的数量上限
+DEFAULT_MAX_KEEPALIVE = int(os.getenv('GH_HTTP_MAX_KEEPALIVE', '10'))
+# 空闲长连接的保持时间（秒）
+DEFAULT_KEEPALIVE_EXPIRY = float(os.getenv('GH_HTTP_KEEPALIVE_EXPIRY', '30'))
+# 每个请求的最大尝试次数
+DEFAULT_MAX_RETRIES = int(os.getenv('GH_HTTP_MAX_RETRIES', '3'))
+
+# 需要重试的状态码（403只在触发速率限制时重试，见should_retry）
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+# 重复发送不会产生副作用的方法，连接错误和5xx时可以安全重试
+IDEMPOTENT_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'))
+# 使用GitHub速率限制额度的主机
+GITHUB_API_HOSTS = frozenset(('api.github.com',))
+
+
+def build_response(status_code, headers, content, url):
+    """
+    构造一个requests.Response对象，使非requests传输层（如httpx）返回的数据
+    与GitHubAPIClient.api_request的返回值保持一致。
+
+    参数:
+    status_code - HTTP状态码。
+    headers - 响应头部（映射类型）。
+    content - 响应体（bytes）。
+    url - 请求的URL。
+
+    返回:
+    requests.Response对象。
+    """
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers = CaseInsensitiveDict(headers)
+    response._content = content
+    response.url = url
+    response.encoding = 'utf-8'
+    return response
+
+
+class HTTP2Transport:
+    """
+    基于httpx的HTTP/2传输层，并发请求在同一条连接上多路复用，避免每个连接都做一次TLS握手。
+    接口与requests.Session一致（headers属性和request方法），可以直接替换GitHubAPIClient.session。
+    """
+
+    def __init__(self, max_connections=DEFAULT_MAX_CONNECTIONS, max_keepalive=DEFAULT_MAX_KEEPALIVE,
+                 keepalive_expiry=DEFAULT_KEEPALIVE_EXPIRY, verify=True, http1=True):
+        """
+        参数:
+        max_connections - 连接总数上限。
+        max_keepalive - 保持空闲长连接的数量上限。
+        keepalive_expiry - 空闲长连接的保持时间（秒）。
+        verify - 是否校验TLS证书（基准测试连接本地自签名服务器时关闭）。
+        http1 - 是否允许协商回退到HTTP/1.1；为False时对http://地址直接使用HTTP/2。
+        """
+        try:
+            import httpx
+        except ImportError as e:
+            raise ImportError("HTTP/2传输层需要安装 httpx[http2]：pip install 'httpx[http2]'") from e
+        self._httpx = httpx
+        self.headers = CaseInsensitiveDict()
+        self._client = httpx.Client(
+            http1=http1,
+            http2=True,
+            verify=verify,
+            # 与requests一致，默认不设超时（httpx默认5秒）
+            timeout=None,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        )
+
+    def request(self, method, url, params=None, data=None, headers=None, json=None, timeout=None, **kwargs):
+        """
+        发送请求并返回requests.Response对象。
+
+        参数与requests.Session.request相同（只支持常用参数）：
+        data为字典时按表单编码发送，其它类型作为原始请求体发送；
+        timeout可以是秒数或 (连接超时, 读取超时) 元组，为None时不限时。
+        超时和连接错误转换为requests对应的异常，使调用方的重试逻辑对两种传输层都有效。
+        """
+        httpx = self._httpx
+        body = {'data': data} if isinstance(data, dict) else {'content': data}
+        try:
+            response = self._client.request(
+                method,
+                url,
+                params=params,
+                json=json,
+                headers={**self.headers, **(headers or {})},
+                timeout=self._timeout(timeout),
+                **body,
+            )
+        except httpx.TimeoutException as e:
+            raise requests.Timeout(str(e)) from e
+        except httpx.TransportError as e:
+            raise requests.ConnectionError(str(e)) from e
+        return build_response(response.status_code, response.headers, response.content, str(response.url))
+
+    def _timeout(self, timeout):
+        """
+        把requests风格的超时参数转换为httpx.Timeout。
+        """
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            return self._httpx.Timeout(read, connect=connect)
+        return self._httpx.Timeout(timeout)
+
+    def close(self):
+        """
+        关闭连接池。
+        """
+        self._client.close()
+
+
+def create_session(kind=None, max_connections=DEFAULT_MAX_CONNECTIONS, **kwargs):
+    """
+    按类型创建GitHubAPIClient使用的会话对象。
+
+    参数:
+    kind - "requests"（默认，HTTP/1.1连接池）或 "http2"（多路复用）；默认读取GH_HTTP_TRANSPORT。
+    max_connections - 连接池上限。
+    **kwargs - 传递给HTTP2Transport的其它参数。
+
+    返回:
+    requests.Session或HTTP2Transport实例。
+    """
+    kind = kind or DEFAULT_TRANSPORT
+    if kind == 'http2':
+        return HTTP2Transport(max_connections=max_connections, **kwargs)
+    if kind != 'requests':
+        raise ValueError(f"未知的传输层类型: {kind}")
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def is_rate_limited(response):
+    """
+    判断响应是否为速率限制（429，或带Retry-After / 额度耗尽的403）。
+
+    参数:
+    response - requests.Response对象。
+
+    返回:
+    布尔值。
+    """
+    if response.status_code == 429:
+        return True
+    return response.status_code == 403 and (
+        'Retry-After' in response.headers or response.headers.get('X-RateLimit-Remaining') == '0'
+    )
+
+
+def should_retry(method, response=None):
+    """
+    所有脚本共用的重试策略：速率限制总是重试（请求未被处理）；
+    5xx和连接错误（response为None）只对幂等方法重试，避免重复创建PR等写操作。
+
+    参数:
+    method - 请求方法。
+    response - requests.Response对象；连接错误或超时时为None。
+
+    返回:
+    布尔值。
+    """
+    if response is not None and is_rate_limited(response):
+        return True
+    if method.upper() not in IDEMPOTENT_METHODS:
+        return False
+    return response is None or response.status_code in RETRY_STATUSES
+
+
+def retry_delay(attempt, response=None):
+    """
+    计算第attempt次重试前的等待秒数：优先使用Retry-After，否则指数退避。
+
+    参数:
+    attempt - 已失败的次数（从1开始）。
+    response - 上一次的requests.Response对象（可选）。
+
+    返回:
+    秒数。
+    """
+    if response is not None:
+        retry_after = response.headers.get('Retry-After', '')
+        if retry_after.isdigit():
+            return int(retry_after)
+    return 2 ** attempt
+
+
+class Transport:
+    """
+    所有维护脚本共用的HTTP传输层：一个按主机分配连接池的会话、进程内共享的限速器
+    （只作用于GitHub API）、统一的重试策略（should_retry / retry_delay）和共享的请求指标。
+    同步代码直接调用request，异步代码通过request_async在线程中使用同一个连接池。
+    """
+
+    def __init__(self, session=None, rate_limiter=None, metrics=None, max_retries=DEFAULT_MAX_RETRIES):
+        """
+        参数:
+        session - requests.Session或HTTP2Transport实例，默认按GH_HTTP_TRANSPORT创建。
+        rate_limiter - 可选的RateLimiter实例，默认使用进程内共享的限速器。
+        metrics - 可选的APIMetrics实例，默认使用进程内共享的指标。
+        max_retries - request的默认最大尝试次数。
+        """
+        self.session = session or create_session()
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.metrics = metrics or get_metrics()
+        self.max_retries = max_retries
+
+    def send(self, method, url, endpoint=None, resource=None, retry=False, **kwargs):
+        """
+        发送一次请求（不重试）：GitHub API请求先按剩余额度限速，响应后刷新限速器，
+        并按端点模板记录状态码、耗时、字节数和速率限制消耗。
+
+        参数:
+        method - 请求方法。
+        url - 完整的请求URL。
+        endpoint - 记录指标用的端点路径，默认由URL推断（非GitHub主机带上主机名）。
+        resource - 速率限制资源，默认由URL推断；非GitHub主机不限速。
+        retry - 是否为重试请求。
+        **kwargs - 传递给session.request的参数。
+
+        返回:
+        requests.Response对象；连接错误时抛出requests.RequestException。
+        """
+        parsed = urlparse(url)
+        github = parsed.hostname in GITHUB_API_HOSTS
+        if endpoint is None:
+            endpoint = parsed.path.lstrip('/') if github else f"{parsed.hostname}{parsed.path}"
+        if resource is None and github:
+            resource = resource_for(endpoint)
+        if resource is not None:
+            self.rate_limiter.acquire(resource)
+        started = time.monotonic()
+        status, response = 'error', None
+        try:
+            response = self.session.request(method, url, **kwargs)
+            status = response.status_code
+        finally:
+            self.metrics.record(
+                method, endpoint, status, time.monotonic() - started, response, retry, resource or 'core'
+            )
+        if resource is not None:
+            self.rate_limiter.update(response.headers, resource)
+        return response
+
+    def request(self, method, url, max_retries=None, **kwargs):
+        """
+        发送请求，按统一的重试策略重试速率限制、5xx和连接错误。
+
+        参数:
+        method - 请求方法。
+        url - 完整的请求URL。
+        max_retries - 最大尝试次数，默认为self.max_retries。
+        **kwargs - 传递给send的参数。
+
+        返回:
+        最后一次的requests.Response对象（可能是错误状态码，由调用方处理）；
+        重试耗尽后仍然连接失败时抛出最后一次的requests.RequestException。
+        """
+        max_retries = max_retries or self.max_retries
+        attempt = 0
+        while True:
+            try:
+                response = self.send(method, url, retry=attempt > 0, **kwargs)
+            except requests.RequestException as e:
+                response = None
+                error = e
+            attempt += 1
+            if attempt >= max_retries or not should_retry(method, response):
+                if response is None:
+                    raise error
+                return response
+            delay = retry_delay(attempt, response)
+            logging.warning(
+                f"请求失败（{response.status_code if response is not None else error}）: "
+                f"{method} {url}，{delay} 秒后重试 {attempt}/{max_retries}"
+            )
+            time.sleep(delay)
+
+    async def request_async(self, method, url, **kwargs):
+        """
+        在线程中调用request，异步脚本与同步脚本共用同一个连接池、限速器和指标。
+
+        参数与request相同。
+        """
+        return await asyncio.to_thread(self.request, method, url, **kwargs)
+
+    def close(self):
+        """
+        关闭连接池。
+        """
+        self.session.close()
+
+
+_shared_transport = None
+_shared_lock = threading.Lock()
+
+
+def get_transport():
+    """
+    返回进程内共享的Transport实例，所有脚本和客户端共用同一个连接池。
+
+    返回:
+    Transport实例。
+    """
+    global _shared_transport
+    with _shared_lock:
+        if _shared_transport is None:
+            _shared_transport = Transport()
+        return _shared_transport
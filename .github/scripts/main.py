@@ -1,6 +1,14 @@
 import os
+import asyncio
+import argparse
 import logging
+from api_metrics import install_exit_handler
+from github_api_client import STATE_DIR
 from github_repo_manager import GitHubRepoManager
+from repo_index import log_index
+from repo_state import RepoStateStore, mark_cleaned_on_success, repo_fingerprint
+from run_watermarks import RunWatermarkStore
+from work_pipeline import WorkPipeline
 
 # 设置日志记录配置
 # 设置日志记录
@@ -11,15 +19,58 @@ logging.basicConfig(
 )
 
 
-def main():
+def parse_args(argv=None):
+    """
+    解析命令行参数。
+
+    :param argv: 参数列表，默认读取sys.argv。
+    :return: argparse.Namespace。
+    """
+    parser = argparse.ArgumentParser(description="清理工作流运行记录并处理PR")
+    parser.add_argument(
+        "--full-rescan",
+        action="store_true",
+        help="忽略仓库状态和运行水位，重新完整扫描所有仓库",
+    )
+    return parser.parse_args(argv)
+
+
+def open_run_watermarks(full_rescan=False):
+    """
+    打开状态目录中的运行水位文件，使保留策略只扫描上次运行之后新建的运行。
+    设置 GH_RUN_WATERMARK=0 时返回None，每次都全量扫描。
+
+    :param full_rescan: 为True时忽略已保存的水位（扫描后重新写入）。
+    :return: RunWatermarkStore实例或None。
+    """
+    if os.getenv("GH_RUN_WATERMARK") == "0":
+        return None
+    watermarks = RunWatermarkStore(os.path.join(STATE_DIR, "run_watermarks.json"))
+    if full_rescan:
+        watermarks.clear()
+    return watermarks
+
+
+def open_repo_state():
+    """
+    打开状态目录中的仓库状态文件。
+
+    :return: RepoStateStore实例。
+    """
+    return RepoStateStore(os.path.join(STATE_DIR, "repo_state.sqlite3"))
+
+
+def main(argv=None):
     """
     主函数，执行GitHub仓库的维护操作。
     它首先从环境变量获取GitHub Token和用户名。
     然后，它创建一个GitHubRepoManager实例来管理仓库。
-    对于每个仓库，它获取所有工作流运行的历史记录，
-    并保留每个工作流的最新运行。它删除除最新运行之外的所有其他运行。
-    此外，它还处理PRs（拉取请求），关闭不成功的运行、处理依赖Bot的PRs和关闭活跃度低的PRs。
+    对于每个仓库，它只获取一次所有工作流运行的历史记录，
+    保留每个工作流的最新运行，并删除其余运行、不成功的运行和dependabot触发的运行。
+    此外，它还处理PRs（拉取请求），处理依赖Bot的PRs和关闭活跃度低的PRs。
+    自上次成功清理以来没有变化的仓库会被跳过，--full-rescan 强制重新扫描所有仓库。
     """
+    args = parse_args(argv)
 
     # 从环境变量获取GitHub Token和用户名
     # 从环境变量获取GitHub Token和用户名
@@ -31,6 +82,14 @@ def main():
         logging.error("GitHub Token或用户名未设置。")
         return
 
+    # 进程退出时按端点写出请求指标（JSON汇总和Prometheus textfile）
+    install_exit_handler()
+
+    # 设置 GH_ASYNC=1 时使用异步管理器，多个仓库的列举、检查和删除可以重叠进行
+    if os.getenv("GH_ASYNC") == "1":
+        asyncio.run(async_main(username, args.full_rescan))
+        return
+
     # 创建GitHub仓库管理器实例
     # 创建GitHub仓库管理器实例
     manager = GitHubRepoManager()
@@ -39,40 +98,161 @@ def main():
     # 获取用户的所有仓库
     repos = manager.get_repos(username)
 
-    # 遍历所有仓库
-    for repo in repos:
-        repo_name = repo["name"]
-        repo_owner = repo["owner"]["login"]
-
-        # 获取该仓库所有工作流运行的详细信息
-        # 获取该仓库所有工作流运行的详细信息
-        all_runs = manager.get_workflow_runs(repo_owner, repo_name)
-
-        # 为每个工作流保留最新的运行记录
-        # 按工作流名称分组，并保留每个名称的最新运行
-        latest_runs = {}
-        for run in all_runs:
-            workflow_name = run["name"]
-            if (
-                workflow_name not in latest_runs
-                or latest_runs[workflow_name]["created_at"] < run["created_at"]
-            ):
-                latest_runs[workflow_name] = run
-
-        # 删除除最新运行之外的所有运行记录
-        # 删除除最新之外的所有运行
-        for run in all_runs:
-            if run["id"] != latest_runs[run["name"]]["id"]:
-                manager.delete_workflow(repo_owner, repo_name, run["id"])
-
-        # 处理PRs和工作流运行记录
-        manager.delete_non_successful_runs_for_repo(repo_owner, repo_name)
-        manager.process_dependabot_prs(repo_owner, repo_name)
-        manager.close_inactive_pull_requests_for_repo(repo_owner, repo_name)
+    # 设置 GH_PR_BACKEND=graphql 时，用一个分页的GraphQL查询获取所有仓库的开放PR及其活动时间，
+    # 代替逐个PR请求评论和事件
+    pr_inventory = {}
+    if os.getenv("GH_PR_BACKEND") == "graphql":
+        pr_inventory = manager.get_pr_inventory(username)
+
+    watermarks = open_run_watermarks(args.full_rescan)
+    repo_state = open_repo_state()
+
+    # 预筛选：根据仓库列表中的字段和一次 per_page=1 的运行探测，
+    # 判断每个仓库需要执行哪些步骤（归档、禁用、空仓库和没有运行的仓库不做无用的列举）
+    index = manager.build_repo_index(repos)
+    log_index(index)
+
+    # 列举在主线程中进行，删除运行、关闭PR、发表评论提交到有界流水线由工作线程并发执行
+    with WorkPipeline() as pipeline:
+        manager.pipeline = pipeline
+
+        # 这一步针对固定仓库，只需执行一次；放在循环中会在前一次的关闭尚未完成时重复提交
         manager.close_all_open_prs("Happy-clo", "ChatGPT-Shortcut")
 
-        # 删除 dependabot 触发的 workflow_run
-        manager.delete_dependabot_runs_for_repo(repo_owner, repo_name)
+        # 遍历所有仓库
+        for repo in repos:
+            repo_name = repo["name"]
+            repo_owner = repo["owner"]["login"]
+            caps = index[repo["full_name"]]
+
+            reason = caps.skip_reason()
+            if reason:
+                logging.info(f"仓库 {repo['full_name']} {reason}，跳过")
+                continue
+
+            # 指纹（推送/更新时间、开放Issue/PR数、最新运行ID）与上次成功清理时相同的仓库直接跳过
+            fingerprint = repo_fingerprint(repo, caps.last_run_id)
+            if not args.full_rescan and repo_state.should_skip(repo["full_name"], fingerprint):
+                repo_state.log_skipped(repo["full_name"])
+                continue
+
+            # 只列举一次工作流运行，在同一份快照上评估所有保留规则：
+            # 保留每个工作流的最新运行、删除未成功的运行、删除 dependabot 触发的运行
+            if caps.needs_retention:
+                manager.apply_retention(
+                    repo_owner,
+                    repo_name,
+                    watermarks,
+                    mark_cleaned_on_success(repo_state, repo),
+                )
+
+            # 处理PRs（没有开放Issue/PR的仓库不请求PR列表）
+            if caps.needs_pr_steps:
+                # 开放PR只完整获取一次，两个步骤共用同一份快照
+                snapshot = manager.get_pr_snapshot(
+                    repo_owner, repo_name, pr_inventory.get((repo_owner, repo_name))
+                )
+                manager.process_dependabot_prs(repo_owner, repo_name, snapshot)
+                manager.close_inactive_pull_requests_for_repo(repo_owner, repo_name, snapshot)
+
+            # 已完成删除的仓库的水位随时写回，进程中断时不必从头扫描
+            if watermarks is not None:
+                watermarks.save()
+
+    manager.pipeline = None
+    pipeline.log_report()
+    if watermarks is not None:
+        watermarks.save()
+    repo_state.close()
+
+    # 输出响应缓存的命中统计，用于确认条件请求节省的请求次数
+    if manager.client.cache is not None:
+        manager.client.cache.log_stats()
+
+
+async def process_repo_async(
+    manager, repo, caps, watermarks=None, repo_state=None, full_rescan=False, pull_requests=None
+):
+    """
+    使用异步管理器对单个仓库执行与main()相同的维护步骤。
+
+    :param manager: AsyncGitHubRepoManager实例。
+    :param repo: get_repos返回的仓库信息。
+    :param caps: 仓库的RepoCapabilities，决定执行哪些步骤。
+    :param watermarks: 可选的RunWatermarkStore实例。
+    :param repo_state: 可选的RepoStateStore实例，用于跳过没有变化的仓库。
+    :param full_rescan: 为True时不跳过任何仓库。
+    :param pull_requests: 可选的开放PR列表（来自GraphQL清单），提供时不再请求REST列表。
+    """
+    repo_name = repo["name"]
+    repo_owner = repo["owner"]["login"]
+
+    reason = caps.skip_reason()
+    if reason:
+        logging.info(f"仓库 {repo['full_name']} {reason}，跳过")
+        return
+
+    on_complete = None
+    if repo_state is not None:
+        fingerprint = repo_fingerprint(repo, caps.last_run_id)
+        if not full_rescan and repo_state.should_skip(repo["full_name"], fingerprint):
+            repo_state.log_skipped(repo["full_name"])
+            return
+        on_complete = mark_cleaned_on_success(repo_state, repo)
+
+    # 只列举一次工作流运行，评估所有保留规则后并发删除
+    if caps.needs_retention:
+        await manager.apply_retention(repo_owner, repo_name, watermarks, on_complete)
+
+    # 处理PRs
+    if caps.needs_pr_steps:
+        snapshot = await manager.get_pr_snapshot(repo_owner, repo_name, pull_requests)
+        await manager.process_dependabot_prs(repo_owner, repo_name, snapshot)
+        await manager.close_inactive_pull_requests_for_repo(repo_owner, repo_name, snapshot)
+
+
+async def async_main(username, full_rescan=False):
+    """
+    main()的异步版本。所有仓库并发处理，同时在途的请求数由
+    GH_MAX_CONCURRENCY 限制（默认8）。
+
+    :param username: GitHub用户名。
+    :param full_rescan: 为True时忽略仓库状态和运行水位。
+    """
+    # 只在 GH_ASYNC=1 时导入异步管理器
+    from async_github_repo_manager import AsyncGitHubRepoManager
+
+    async with AsyncGitHubRepoManager() as manager:
+        repos = await manager.get_repos(username)
+        # 与同步流程相同，GH_PR_BACKEND=graphql 时用GraphQL清单代替逐个仓库的PR列表和活跃度请求
+        pr_inventory = {}
+        if os.getenv("GH_PR_BACKEND") == "graphql":
+            pr_inventory = await manager.get_pr_inventory(username)
+        # 这一步针对固定仓库，与同步流程中逐仓库重复调用效果相同，只需执行一次
+        await manager.close_all_open_prs("Happy-clo", "ChatGPT-Shortcut")
+        watermarks = open_run_watermarks(full_rescan)
+        repo_state = open_repo_state()
+        index = await manager.build_repo_index(repos)
+        log_index(index)
+        results = await asyncio.gather(
+            *(
+                process_repo_async(
+                    manager, repo, index[repo["full_name"]], watermarks, repo_state, full_rescan,
+                    pr_inventory.get((repo["owner"]["login"], repo["name"])),
+                )
+                for repo in repos
+            ),
+            return_exceptions=True,
+        )
+        if watermarks is not None:
+            watermarks.save()
+        repo_state.close()
+        for repo, result in zip(repos, results):
+            if isinstance(result, Exception):
+                logging.error(f"处理仓库 {repo['full_name']} 时出错: {result}")
+
+        if manager.client.cache is not None:
+            manager.client.cache.log_stats()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,247 @@
+import asyncio
+import base64
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from contextlib import asynccontextmanager
+
+# 镜像缓存目录（在工作流中通过 actions/cache 跨运行保留）
+MIRROR_CACHE_DIR = os.getenv("MIRROR_CACHE_DIR", ".mirror-cache")
+# 缓存大小上限（MB），超过时按最近使用时间淘汰镜像
+MIRROR_CACHE_MAX_MB = int(os.getenv("MIRROR_CACHE_MAX_MB", "2048"))
+# 同时进行的网络操作（clone/fetch）和磁盘密集操作（检出工作树、合并）数量
+GIT_NETWORK_CONCURRENCY = int(os.getenv("GIT_NETWORK_CONCURRENCY", "8"))
+GIT_DISK_CONCURRENCY = int(os.getenv("GIT_DISK_CONCURRENCY", "2"))
+# 单条 git 命令的超时时间（秒）
+GIT_NETWORK_TIMEOUT = int(os.getenv("GIT_NETWORK_TIMEOUT", "600"))
+GIT_LOCAL_TIMEOUT = int(os.getenv("GIT_LOCAL_TIMEOUT", "120"))
+
+
+async def run_git(*args, cwd=None, timeout=GIT_LOCAL_TIMEOUT, env=None):
+    """
+    以子进程异步运行 git 命令，不阻塞事件循环。
+
+    :param env: 附加的环境变量（与当前进程的环境合并）。
+    :raises subprocess.CalledProcessError: 命令返回非零状态码。
+    :raises subprocess.TimeoutExpired: 命令超时（子进程会被终止）。
+    """
+    command = ["git", *args] if cwd is None else ["git", "-C", cwd, *args]
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        env={**os.environ, **env} if env else None,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise subprocess.TimeoutExpired(command, timeout)
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(
+            process.returncode, command, stdout.decode(), stderr.decode()
+        )
+    return stdout.decode()
+
+
+def git_auth_env(token, host="github.com"):
+    """
+    返回让 git 通过 HTTPS 访问指定主机时携带令牌的环境变量。
+    令牌以 GIT_CONFIG_* 环境变量传入，不写入镜像的配置文件（镜像目录会被 actions/cache 保存），
+    也不出现在命令行参数中。
+
+    :param token: GitHub 令牌，为空时返回空字典。
+    :param host: 需要认证的主机。
+    :return: 环境变量字典。
+    """
+    if not token:
+        return {}
+    credentials = base64.b64encode(f"x-access-token:{token}".encode()).decode()
+    return {
+        "GIT_CONFIG_COUNT": "1",
+        "GIT_CONFIG_KEY_0": f"http.https://{host}/.extraheader",
+        "GIT_CONFIG_VALUE_0": f"AUTHORIZATION: basic {credentials}",
+    }
+
+
+def directory_size(path):
+    """统计目录占用的字节数"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class MirrorCache:
+    """
+    fork 仓库的裸镜像缓存：第一次使用时以 blob-less 部分克隆（--filter=blob:none）创建，
+    之后只做增量 fetch；实际的合并在从镜像创建的临时工作树中进行并推送回 fork，
+    工作树用完即删，镜像保留。
+    每次使用都会刷新镜像目录的修改时间，evict() 按该时间从最久未使用的镜像开始淘汰。
+    网络操作和磁盘操作分别受两个信号量限制，多个 fork 并发同步时 fetch 可以重叠，
+    而检出和合并不会同时占满磁盘。
+    """
+
+    def __init__(
+        self,
+        root=MIRROR_CACHE_DIR,
+        max_bytes=MIRROR_CACHE_MAX_MB * 1024 * 1024,
+        network_concurrency=GIT_NETWORK_CONCURRENCY,
+        disk_concurrency=GIT_DISK_CONCURRENCY,
+        git_env=None,
+    ):
+        """
+        :param git_env: 网络操作（clone/fetch/push）附加的环境变量，通常为 git_auth_env 的返回值。
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.network_concurrency = network_concurrency
+        self.disk_concurrency = disk_concurrency
+        self.git_env = git_env or {}
+        self._network = None
+        self._disk = None
+        os.makedirs(root, exist_ok=True)
+
+    @property
+    def network(self):
+        """网络操作的信号量（在事件循环中第一次使用时创建）"""
+        if self._network is None:
+            self._network = asyncio.Semaphore(self.network_concurrency)
+        return self._network
+
+    @property
+    def disk(self):
+        """磁盘密集操作的信号量（在事件循环中第一次使用时创建）"""
+        if self._disk is None:
+            self._disk = asyncio.Semaphore(self.disk_concurrency)
+        return self._disk
+
+    def mirror_path(self, full_name):
+        """返回仓库镜像的路径（owner/repo -> owner__repo.git）"""
+        return os.path.join(self.root, full_name.replace("/", "__") + ".git")
+
+    def touch(self, full_name):
+        """记录镜像的最近使用时间"""
+        path = self.mirror_path(full_name)
+        if os.path.exists(path):
+            now = time.time()
+            os.utime(path, (now, now))
+
+    async def ensure_mirror(self, full_name, url):
+        """
+        创建或增量更新仓库镜像。
+
+        :param full_name: 仓库全名（owner/repo）。
+        :param url: 克隆地址。
+        :return: 镜像路径，失败时为 None。
+        """
+        path = self.mirror_path(full_name)
+        try:
+            async with self.network:
+                if os.path.exists(path):
+                    logging.info(f"增量更新 {full_name} 的镜像...")
+                    await run_git(
+                        "fetch", "--prune", "origin", cwd=path, timeout=GIT_NETWORK_TIMEOUT, env=self.git_env
+                    )
+                else:
+                    logging.info(f"正在为 {full_name} 创建部分克隆镜像...")
+                    await run_git(
+                        "clone", "--bare", "--filter=blob:none", url, path,
+                        timeout=GIT_NETWORK_TIMEOUT, env=self.git_env,
+                    )
+                    # 裸克隆默认不配置 fetch 规则，补上后增量 fetch 才会更新各分支
+                    await run_git("config", "remote.origin.fetch", "+refs/heads/*:refs/heads/*", cwd=path)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            logging.error(f"更新 {full_name} 的镜像失败: {e.stderr or e}")
+            if not os.path.exists(os.path.join(path, "HEAD")):
+                shutil.rmtree(path, ignore_errors=True)
+            return None
+        self.touch(full_name)
+        return path
+
+    async def set_remote(self, full_name, name, url):
+        """在镜像中添加或更新远程仓库（工作树共享镜像的配置）"""
+        path = self.mirror_path(full_name)
+        try:
+            await run_git("remote", "set-url", name, url, cwd=path)
+        except subprocess.CalledProcessError:
+            await run_git("remote", "add", name, url, cwd=path)
+
+    async def fetch(self, full_name, *args):
+        """在镜像中执行受网络信号量限制的 fetch"""
+        async with self.network:
+            await run_git(
+                "fetch", *args, cwd=self.mirror_path(full_name), timeout=GIT_NETWORK_TIMEOUT, env=self.git_env
+            )
+
+    async def push(self, full_name, work_dir, branch):
+        """
+        将工作树的 HEAD 推送到 fork（origin）的指定分支，受网络信号量限制。
+
+        :param full_name: 仓库全名。
+        :param work_dir: worktree() 创建的工作树。
+        :param branch: 目标分支。
+        """
+        async with self.network:
+            await run_git(
+                "push", "origin", f"HEAD:refs/heads/{branch}",
+                cwd=work_dir, timeout=GIT_NETWORK_TIMEOUT, env=self.git_env,
+            )
+        self.touch(full_name)
+
+    @asynccontextmanager
+    async def worktree(self, full_name, branch):
+        """
+        从镜像创建指定分支的临时工作树，退出时删除工作树。
+        整个工作树的生命周期占用一个磁盘信号量。
+
+        :param full_name: 仓库全名。
+        :param branch: 要检出的分支。
+        """
+        path = self.mirror_path(full_name)
+        async with self.disk:
+            work_dir = tempfile.mkdtemp(prefix=full_name.replace("/", "__") + "-")
+            try:
+                # 部分克隆在检出时才按需下载文件内容
+                await run_git("worktree", "add", "--force", work_dir, branch, cwd=path, timeout=GIT_NETWORK_TIMEOUT)
+                yield work_dir
+            finally:
+                try:
+                    await run_git("worktree", "remove", "--force", work_dir, cwd=path)
+                except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+                    shutil.rmtree(work_dir, ignore_errors=True)
+                    await run_git("worktree", "prune", cwd=path)
+                self.touch(full_name)
+
+    def evict(self):
+        """
+        缓存超过大小上限时，按最近使用时间从旧到新删除镜像。
+
+        :return: 被删除的镜像数量。
+        """
+        mirrors = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if os.path.isdir(path):
+                mirrors.append((os.path.getmtime(path), directory_size(path), path))
+        total = sum(size for _, size, _ in mirrors)
+        evicted = 0
+        for _, size, path in sorted(mirrors):
+            if total <= self.max_bytes:
+                break
+            logging.info(f"镜像缓存超过上限，删除最久未使用的镜像 {path}")
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            evicted += 1
+        logging.info(
+            f"镜像缓存：{len(mirrors) - evicted} 个镜像，共 {total / 1024 / 1024:.1f} MB，淘汰 {evicted} 个"
+        )
+        return evicted
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta, timezone
+
+# PR超过该天数没有活动即视为不活跃
+INACTIVE_DAYS = 2
+
+# 时间线每页条目数，越大越可能在最后一页拿到足够的最新事件
+TIMELINE_PER_PAGE = 100
+
+
+def activity_cutoff(days=INACTIVE_DAYS):
+    """
+    返回活跃判断的截止时间（UTC ISO 8601字符串），可以直接与GitHub返回的时间字符串按字典序比较，
+    也可以作为 since 查询参数。
+
+    :param days: 天数。
+    :return: 形如 "2024-01-01T00:00:00Z" 的字符串。
+    """
+    return (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def comments_since_params(cutoff):
+    """
+    只查询截止时间之后更新过的评论，且只需要一条即可判断为活跃。
+    """
+    return {"since": cutoff, "per_page": 1}
+
+
+def timeline_item_time(item):
+    """
+    取出时间线条目的时间。不同事件类型的时间字段不同：
+    大多数事件为created_at，评审为submitted_at，提交为committer.date。
+
+    :param item: /issues/{number}/timeline 返回的条目。
+    :return: ISO 8601时间字符串，没有时间字段时为None。
+    """
+    for field in ("created_at", "submitted_at", "updated_at"):
+        if item.get(field):
+            return item[field]
+    for field in ("committer", "author"):
+        person = item.get(field)
+        if isinstance(person, dict) and person.get("date"):
+            return person["date"]
+    return None
+
+
+def latest_timeline_time(items):
+    """
+    返回一页时间线条目中最新的时间。
+
+    :param items: 时间线条目列表。
+    :return: ISO 8601时间字符串，没有可用时间时为None。
+    """
+    times = [t for t in (timeline_item_time(item) for item in items) if t]
+    return max(times) if times else None
@@ -0,0 +1,70 @@
+import threading
+
+# 列表接口（/pulls）不返回、需要按PR单独请求的字段
+DETAIL_FIELDS = ("mergeable", "mergeable_state")
+
+
+class PullRequestSnapshot:
+    """
+    单个仓库开放PR的快照：完整分页获取一次，供dependabot处理、不活跃PR关闭和
+    关闭所有PR等步骤共用。列表接口不返回的字段（如mergeable_state）在第一次需要时按PR补充；
+    关闭PR后立即从快照中标记，后续步骤不会再处理已关闭的PR。
+    """
+
+    def __init__(self, owner, repo, pull_requests):
+        """
+        :param owner: 仓库所有者。
+        :param repo: 仓库名称。
+        :param pull_requests: 开放PR字典列表（REST /pulls 或 get_pr_inventory 的结果）。
+        """
+        self.owner = owner
+        self.repo = repo
+        self._prs = {pr["number"]: pr for pr in pull_requests}
+        self._closed = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.open_pull_requests())
+
+    def open_pull_requests(self):
+        """
+        返回尚未关闭的PR列表（按列表顺序）。
+        """
+        with self._lock:
+            return [pr for number, pr in self._prs.items() if number not in self._closed]
+
+    def get(self, number):
+        """返回PR字典，不在快照中时为None。"""
+        with self._lock:
+            return self._prs.get(number)
+
+    def is_open(self, number):
+        """PR是否仍在快照中且未关闭。"""
+        with self._lock:
+            return number in self._prs and number not in self._closed
+
+    def needs_details(self, number):
+        """
+        PR是否缺少列表接口不返回的详情字段。
+        """
+        with self._lock:
+            return any(field not in self._prs[number] for field in DETAIL_FIELDS)
+
+    def update_details(self, number, details):
+        """
+        用单个PR接口（/pulls/{number}）的响应补充详情字段。
+
+        :param number: PR编号。
+        :param details: 单个PR的字典。
+        """
+        with self._lock:
+            pr = self._prs[number]
+            for field in DETAIL_FIELDS:
+                pr[field] = details.get(field)
+
+    def mark_closed(self, number):
+        """
+        标记PR已关闭（或已提交关闭），后续步骤不再处理。
+        """
+        with self._lock:
+            self._closed.add(number)
@@ -0,0 +1,195 @@
+# 导入asyncio库，用于在异步任务中等待
+import asyncio
+# 导入logging库，用于记录日志
+import logging
+# 导入os库，用于获取环境变量
+import os
+# 导入threading库，保证多线程共享限速状态时的安全
+import threading
+# 导入time库，用于计时和延迟
+import time
+
+# 可以不经限速直接使用的额度占总额度的比例，超出后按剩余额度均匀限速
+DEFAULT_BURST_FRACTION = float(os.getenv('GH_RATE_BURST_FRACTION', '0.2'))
+
+
+def resource_for(endpoint):
+    """
+    根据端点推断请求消耗的速率限制资源（core、search、graphql）。
+
+    参数:
+    endpoint - API端点路径，例如"search/issues"。
+
+    返回:
+    资源名称字符串。
+    """
+    path = endpoint.lstrip('/')
+    if path.startswith('graphql'):
+        return 'graphql'
+    if path.startswith('search/'):
+        return 'search'
+    return 'core'
+
+
+class _Bucket:
+    """
+    单个资源的令牌桶状态。
+    """
+    __slots__ = ('limit', 'remaining', 'reset', 'rate', 'tokens', 'updated', 'blocked_until')
+
+    def __init__(self, now):
+        self.limit = None  # 未收到任何响应前不限速
+        self.remaining = None
+        self.reset = None
+        self.rate = 0.0  # 每秒补充的令牌数
+        self.tokens = 0.0
+        self.updated = now
+        self.blocked_until = 0.0  # Retry-After 要求的暂停截止时间
+
+
+class RateLimiter:
+    """
+    主动限速器。每次响应后读取X-RateLimit-*头部，把剩余额度均匀分摊到
+    剩余的时间窗口内（令牌桶），按资源分别计数，并在进程内的所有线程和
+    异步任务之间共享，避免先突发、后整段冻结。
+    """
+
+    def __init__(self, burst_fraction=DEFAULT_BURST_FRACTION, clock=time.time):
+        """
+        参数:
+        burst_fraction - 令牌桶容量占额度上限的比例，即可以突发使用的额度。
+        clock - 返回当前时间戳的函数，便于测试替换。
+        """
+        self.burst_fraction = burst_fraction
+        self.clock = clock
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, resource, now):
+        bucket = self._buckets.get(resource)
+        if bucket is None:
+            bucket = self._buckets[resource] = _Bucket(now)
+        return bucket
+
+    def update(self, headers, resource='core'):
+        """
+        根据响应头部刷新对应资源的额度和补充速率。
+
+        参数:
+        headers - 响应头部（映射类型）。
+        resource - 请求前推断的资源，响应中带有X-RateLimit-Resource时以响应为准。
+        """
+        now = self.clock()
+        resource = headers.get('X-RateLimit-Resource', resource)
+        with self._lock:
+            bucket = self._bucket(resource, now)
+            retry_after = headers.get('Retry-After', '')
+            if retry_after.isdigit():  # 触发次级速率限制时按要求暂停
+                bucket.blocked_until = max(bucket.blocked_until, now + int(retry_after))
+            if 'X-RateLimit-Remaining' not in headers:
+                return
+            calibrated = bucket.remaining is not None
+            if calibrated:
+                self._refill(bucket, now)
+            bucket.remaining = int(headers['X-RateLimit-Remaining'])
+            bucket.limit = int(headers.get('X-RateLimit-Limit', bucket.limit or bucket.remaining))
+            bucket.reset = int(headers.get('X-RateLimit-Reset', now + 60))
+            bucket.rate = bucket.remaining / max(bucket.reset - now, 1)
+            bucket.updated = now
+            if not calibrated:  # 首次收到额度信息（或窗口重置后），令牌桶从满桶开始
+                bucket.tokens = self._capacity(bucket)
+            bucket.tokens = min(bucket.tokens, self._capacity(bucket), bucket.remaining)
+
+    def _capacity(self, bucket):
+        return max(1.0, (bucket.limit or 0) * self.burst_fraction)
+
+    def _refill(self, bucket, now):
+        bucket.tokens = min(self._capacity(bucket), bucket.tokens + (now - bucket.updated) * bucket.rate)
+        bucket.updated = now
+
+    def reserve(self, resource='core'):
+        """
+        为一次请求预留额度，返回发送前需要等待的秒数（不实际等待）。
+
+        参数:
+        resource - 资源名称。
+
+        返回:
+        需要等待的秒数，0表示可以立即发送。
+        """
+        now = self.clock()
+        with self._lock:
+            bucket = self._bucket(resource, now)
+            delay = max(bucket.blocked_until - now, 0.0)
+            if bucket.remaining is None:
+                return delay
+            if now >= bucket.reset:  # 时间窗口已重置，等待下一次响应重新校准
+                bucket.remaining = None
+                bucket.tokens = self._capacity(bucket)
+                return delay
+            self._refill(bucket, now)
+            bucket.tokens -= 1  # 允许为负数，后续请求依次排在后面
+            bucket.remaining = max(bucket.remaining - 1, 0)
+            if bucket.tokens < 0:
+                if bucket.rate > 0:
+                    delay = max(delay, -bucket.tokens / bucket.rate)
+                else:  # 额度已用完，只能等待窗口重置
+                    delay = max(delay, bucket.reset - now)
+            return delay
+
+    def acquire(self, resource='core'):
+        """
+        阻塞当前线程直到可以发送请求。
+
+        参数:
+        resource - 资源名称。
+        """
+        delay = self.reserve(resource)
+        if delay > 0:
+            if delay > 5:
+                logging.info(f"速率限制({resource})：暂停 {delay:.1f} 秒")
+            time.sleep(delay)
+
+    async def acquire_async(self, resource='core'):
+        """
+        异步等待直到可以发送请求，不阻塞事件循环中的其他任务。
+
+        参数:
+        resource - 资源名称。
+        """
+        delay = self.reserve(resource)
+        if delay > 0:
+            if delay > 5:
+                logging.info(f"速率限制({resource})：暂停 {delay:.1f} 秒")
+            await asyncio.sleep(delay)
+
+    def snapshot(self):
+        """
+        返回各资源当前的剩余额度和重置时间，便于记录日志。
+
+        返回:
+        {资源: {'remaining': ..., 'reset': ...}} 字典。
+        """
+        with self._lock:
+            return {
+                name: {'remaining': bucket.remaining, 'reset': bucket.reset}
+                for name, bucket in self._buckets.items()
+            }
+
+
+_shared_limiter = None
+_shared_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """
+    返回进程内共享的RateLimiter实例，所有客户端（同步或异步）共用同一份额度。
+
+    返回:
+    RateLimiter实例。
+    """
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter()
+        return _shared_limiter
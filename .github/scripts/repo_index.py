@@ -0,0 +1,100 @@
+import logging
+
+
+class RepoCapabilities:
+    """
+    单个仓库的能力索引：根据仓库列表中已有的字段和一次 per_page=1 的运行探测，
+    判断每个维护步骤在该仓库上是否可能有事可做。
+    """
+
+    __slots__ = (
+        "full_name",
+        "archived",
+        "disabled",
+        "empty",
+        "has_issues",
+        "open_issues_count",
+        "run_count",
+        "last_run_id",
+    )
+
+    def __init__(self, full_name, archived, disabled, empty, has_issues, open_issues_count, run_count, last_run_id):
+        self.full_name = full_name
+        self.archived = archived  # 归档仓库只读，无法删除运行或关闭PR
+        self.disabled = disabled
+        self.empty = empty  # size为0：没有提交，也就不会有工作流运行
+        self.has_issues = has_issues
+        self.open_issues_count = open_issues_count  # GitHub把开放的PR也计入其中
+        self.run_count = run_count  # 工作流运行总数（total_count），未探测时为0
+        self.last_run_id = last_run_id
+
+    @property
+    def writable(self):
+        """仓库是否可写（未归档、未禁用）。"""
+        return not (self.archived or self.disabled)
+
+    @property
+    def needs_retention(self):
+        """是否需要执行工作流运行的保留策略。"""
+        return self.writable and self.run_count > 0
+
+    @property
+    def needs_pr_steps(self):
+        """是否需要处理PR（dependabot PR、不活跃PR）。"""
+        return self.writable and self.open_issues_count > 0
+
+    def skip_reason(self):
+        """
+        所有步骤都可以跳过时返回原因，否则返回None。
+        """
+        if self.archived:
+            return "已归档"
+        if self.disabled:
+            return "已禁用"
+        if self.needs_retention or self.needs_pr_steps:
+            return None
+        if self.empty:
+            return "空仓库"
+        return "没有工作流运行和开放PR"
+
+
+def needs_run_probe(repo):
+    """
+    只有可写且非空的仓库才需要探测工作流运行数量。
+    """
+    return not (repo.get("archived") or repo.get("disabled")) and repo.get("size", 1) > 0
+
+
+def repo_capabilities(repo, run_count=0, last_run_id=None):
+    """
+    根据 /users/{username}/repos 返回的仓库信息和运行探测结果构建能力索引。
+
+    :param repo: 仓库信息字典。
+    :param run_count: 工作流运行总数。
+    :param last_run_id: 最新工作流运行的ID。
+    :return: RepoCapabilities实例。
+    """
+    return RepoCapabilities(
+        repo["full_name"],
+        bool(repo.get("archived")),
+        bool(repo.get("disabled")),
+        repo.get("size", 1) == 0,
+        bool(repo.get("has_issues")),
+        repo.get("open_issues_count", 0),
+        run_count,
+        last_run_id,
+    )
+
+
+def log_index(index):
+    """
+    汇总记录预筛选结果。
+
+    :param index: {full_name: RepoCapabilities}。
+    """
+    retention = sum(1 for caps in index.values() if caps.needs_retention)
+    pr_steps = sum(1 for caps in index.values() if caps.needs_pr_steps)
+    skipped = sum(1 for caps in index.values() if caps.skip_reason())
+    logging.info(
+        f"仓库预筛选：共 {len(index)} 个仓库，需要清理运行 {retention} 个，需要处理PR {pr_steps} 个，全部跳过 {skipped} 个"
+    )
@@ -0,0 +1,147 @@
+# 导入logging库，用于记录日志
+import logging
+# 导入os库，用于创建状态目录
+import os
+# 导入sqlite3库，用于持久化仓库状态
+import sqlite3
+# 导入threading库，删除流水线的工作线程会在完成清理后写入状态
+import threading
+# 导入datetime，用于记录清理时间
+from datetime import datetime, timezone
+
+from workflow_runs import FAILED, SKIPPED, latest_run_id
+
+# 组成仓库指纹的字段
+FINGERPRINT_FIELDS = ('pushed_at', 'updated_at', 'open_issues_count', 'last_run_id')
+
+
+def repo_fingerprint(repo, last_run_id):
+    """
+    根据 /users/{username}/repos 返回的仓库信息和最新一次工作流运行的ID计算仓库指纹。
+
+    参数:
+    repo - 仓库信息字典。
+    last_run_id - 最新工作流运行的ID，没有运行时为None。
+
+    返回:
+    指纹字典。
+    """
+    return {
+        'pushed_at': repo.get('pushed_at'),
+        'updated_at': repo.get('updated_at'),
+        # GitHub把开放的PR也计入open_issues_count
+        'open_issues_count': repo.get('open_issues_count', 0),
+        'last_run_id': last_run_id,
+    }
+
+
+def mark_cleaned_on_success(store, repo):
+    """
+    返回apply_retention的完成回调：清理完全结束时记录仓库已清理。
+
+    有删除失败、因仍在运行而跳过，或快照中还有运行中记录的仓库不记录：
+    运行结束后可能需要删除，但仓库指纹不会因此变化，记录后会一直被跳过。
+    指纹使用清理后保留下来的最新运行ID，与下一次探测得到的ID一致。
+
+    参数:
+    store - RepoStateStore实例。
+    repo - 仓库信息字典。
+
+    返回:
+    以 (删除结果的Counter, 保留下来的WorkflowRun列表) 调用的回调函数。
+    """
+
+    def on_complete(outcomes, remaining):
+        if outcomes[FAILED] or outcomes[SKIPPED]:
+            return
+        if any(run.is_active for run in remaining):
+            logging.info(f"仓库 {repo['full_name']} 还有运行中的工作流，下次运行时重新检查")
+            return
+        store.mark_cleaned(repo['full_name'], repo_fingerprint(repo, latest_run_id(remaining)))
+
+    return on_complete
+
+
+class RepoStateStore:
+    """
+    保存每个仓库上次成功清理时的指纹（pushed_at、updated_at、开放Issue/PR数、最新运行ID）
+    和清理时间。指纹没有变化的仓库在下一次运行时可以跳过。
+    """
+
+    def __init__(self, path):
+        """
+        打开（必要时创建）状态文件，并一次性读入所有仓库的状态。
+
+        参数:
+        path - SQLite状态文件路径。
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS repos ("
+            "full_name TEXT PRIMARY KEY, pushed_at TEXT, updated_at TEXT, "
+            "open_issues_count INTEGER, last_run_id INTEGER, last_cleanup_at TEXT)"
+        )
+        self._conn.commit()
+        self._states = {
+            row[0]: dict(zip(FINGERPRINT_FIELDS + ('last_cleanup_at',), row[1:]))
+            for row in self._conn.execute("SELECT * FROM repos")
+        }
+
+    def get(self, full_name):
+        """
+        返回仓库上次成功清理时的状态字典，没有记录时返回None。
+        """
+        return self._states.get(full_name)
+
+    def should_skip(self, full_name, fingerprint):
+        """
+        判断仓库能否跳过：指纹与上次成功清理时相同，并且没有开放的Issue/PR。
+        有开放PR的仓库即使没有变化也要处理，因为PR是否不活跃取决于当前时间。
+
+        参数:
+        full_name - "owner/repo"。
+        fingerprint - repo_fingerprint的返回值。
+
+        返回:
+        可以跳过返回True。
+        """
+        state = self._states.get(full_name)
+        if state is None or fingerprint['open_issues_count']:
+            return False
+        return all(state[field] == fingerprint[field] for field in FINGERPRINT_FIELDS)
+
+    def mark_cleaned(self, full_name, fingerprint):
+        """
+        记录仓库已成功清理及清理时的指纹。
+
+        参数:
+        full_name - "owner/repo"。
+        fingerprint - repo_fingerprint的返回值。
+        """
+        state = dict(fingerprint, last_cleanup_at=datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"))
+        with self._lock:
+            self._states[full_name] = state
+            self._conn.execute(
+                "INSERT OR REPLACE INTO repos VALUES (?, ?, ?, ?, ?, ?)",
+                (full_name,) + tuple(state[field] for field in FINGERPRINT_FIELDS + ('last_cleanup_at',)),
+            )
+            self._conn.commit()
+
+    def log_skipped(self, full_name):
+        """
+        记录跳过未变化仓库的日志。
+        """
+        state = self._states[full_name]
+        logging.info(f"仓库 {full_name} 自上次清理（{state['last_cleanup_at']}）以来没有变化，跳过")
+
+    def close(self):
+        """
+        关闭状态文件。
+        """
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,135 @@
+# 导入json库，用于序列化响应头部
+import json
+# 导入logging库，用于记录日志
+import logging
+# 导入os库，用于创建缓存目录
+import os
+# 导入sqlite3库，用于持久化缓存
+import sqlite3
+# 导入threading库，保证多线程下的缓存读写安全
+import threading
+
+# 需要随缓存一起保存的响应头部，其余头部（如速率限制）每次都以最新响应为准
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Link')
+
+
+class ResponseCache:
+    """
+    基于ETag / Last-Modified的持久化响应缓存，以URL为键保存在SQLite文件中。
+    客户端据此发送条件请求，收到304时直接使用缓存内容（304不计入GitHub速率限制）。
+    """
+
+    def __init__(self, path):
+        """
+        打开（必要时创建）缓存文件。
+
+        参数:
+        path - SQLite缓存文件路径。
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.hits = 0  # 以304命中缓存的次数
+        self.misses = 0  # 需要重新下载的次数
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, headers TEXT, body BLOB)"
+        )
+        self._conn.commit()
+
+    def conditional_headers(self, url):
+        """
+        返回针对该URL的条件请求头部（If-None-Match / If-Modified-Since）。
+
+        参数:
+        url - 完整的请求URL（含查询参数）。
+
+        返回:
+        头部字典，没有缓存时为空字典。
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+        headers = {}
+        if row:
+            etag, last_modified = row
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def lookup(self, url):
+        """
+        在收到304时取出缓存的响应，并计为一次命中。
+
+        参数:
+        url - 完整的请求URL。
+
+        返回:
+        (headers, body)元组，缓存不存在时返回None。
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT headers, body FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.hits += 1
+        return json.loads(row[0]), row[1]
+
+    def store(self, url, headers, body):
+        """
+        记录一次未命中，并在响应带有ETag或Last-Modified时保存它。
+
+        参数:
+        url - 完整的请求URL。
+        headers - 响应头部（映射类型）。
+        body - 响应体（bytes）。
+        """
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        with self._lock:
+            self.misses += 1
+            if not etag and not last_modified:
+                return
+            kept = {name: headers[name] for name in CACHED_HEADERS if name in headers}
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (url, etag, last_modified, json.dumps(kept), body),
+            )
+            self._conn.commit()
+
+    def stats(self):
+        """
+        返回缓存命中统计。
+
+        返回:
+        包含hits、misses和hit_rate的字典。
+        """
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+        }
+
+    def log_stats(self):
+        """
+        将命中统计写入日志。
+        """
+        stats = self.stats()
+        logging.info(
+            f"响应缓存统计: 命中 {stats['hits']} 次, 未命中 {stats['misses']} 次, 命中率 {stats['hit_rate']:.1%}"
+        )
+
+    def close(self):
+        """
+        关闭缓存文件。
+        """
+        with self._lock:
+            self._conn.close()
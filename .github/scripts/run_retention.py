@@ -0,0 +1,162 @@
+import logging
+import os
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import run_table
+
+# 保留规则名称，按评估顺序排列
+SUPERSEDED = "superseded"  # 不是同名工作流的最新运行
+NON_SUCCESSFUL = "non_successful"  # 结论不是success
+DEPENDABOT = "dependabot"  # 由 dependabot[bot] 触发
+EXPIRED = "expired"  # 创建时间超过 max_age_days 天（未设置时不启用）
+
+RULES = (SUPERSEDED, NON_SUCCESSFUL, DEPENDABOT, EXPIRED)
+
+# 运行超过该天数即删除（包括各工作流的最新运行）；为空时不启用
+DEFAULT_MAX_AGE_DAYS = int(os.getenv("GH_RUN_MAX_AGE_DAYS") or 0) or None
+
+# 运行数达到该数量且安装了NumPy时，按列向量化评估规则
+COLUMNAR_MIN_RUNS = 2000
+
+
+class RetentionPlan:
+    """
+    一次保留策略评估的结果：去重后的待删除记录，以及每条规则匹配的运行数量。
+    """
+
+    def __init__(self, total, deletions, matched, active):
+        self.total = total  # 快照中的运行总数
+        self.deletions = deletions  # 待删除的WorkflowRun列表（每条运行最多出现一次）
+        self.matched = matched  # 各规则匹配的运行数（一条运行可以同时匹配多条规则）
+        self.active = active  # 被规则匹配但尚未结束、因而不删除的运行数
+
+    def summary(self):
+        """
+        返回用于日志的一行汇总。
+        """
+        rules = ", ".join(f"{rule}={self.matched[rule]}" for rule in RULES)
+        return (
+            f"共 {self.total} 个运行，待删除 {len(self.deletions)} 个"
+            f"（{rules}；运行中跳过 {self.active}）"
+        )
+
+
+def latest_run_ids(runs):
+    """
+    找出每个工作流名称下创建时间最新的运行。
+
+    :param runs: WorkflowRun列表。
+    :return: 最新运行ID的集合。
+    """
+    latest = {}
+    for run in runs:
+        # ISO 8601 UTC时间字符串可以直接按字典序比较
+        if run.name not in latest or latest[run.name].created_at < run.created_at:
+            latest[run.name] = run
+    return {run.id for run in latest.values()}
+
+
+def matched_rules(run, keep_ids, expire_before=None):
+    """
+    返回一条运行匹配的所有删除规则。
+
+    :param run: WorkflowRun记录。
+    :param keep_ids: 每个工作流最新运行的ID集合。
+    :param expire_before: 过期截止时间（ISO 8601字符串），为None时不检查过期。
+    :return: 规则名称列表。
+    """
+    rules = []
+    if run.id not in keep_ids:
+        rules.append(SUPERSEDED)
+    if run.conclusion != "success":
+        rules.append(NON_SUCCESSFUL)
+    if run.actor == "dependabot[bot]":
+        rules.append(DEPENDABOT)
+    if expire_before is not None and run.created_at < expire_before:
+        rules.append(EXPIRED)
+    return rules
+
+
+def plan_retention(runs, max_age_days=DEFAULT_MAX_AGE_DAYS, now=None):
+    """
+    在同一份运行快照上一次性评估所有保留规则：保留每个工作流的最新运行、
+    删除未成功的运行、删除 dependabot 触发的运行，以及（设置了max_age_days时）删除过期的运行。
+
+    与依次执行各删除步骤的结果相同：未成功或由dependabot触发的最新运行同样会被删除。
+    运行数较多且安装了NumPy时改用列式表向量化计算，结果相同。
+
+    :param runs: WorkflowRun列表（一次列举得到的快照）。
+    :param max_age_days: 运行保留的最长天数，为None时不启用过期规则。
+    :param now: 当前时间（datetime，UTC），默认为当前时间。
+    :return: RetentionPlan实例。
+    """
+    runs = list(runs)
+    now = now or datetime.now(timezone.utc)
+    if run_table.np is not None and len(runs) >= COLUMNAR_MIN_RUNS:
+        return plan_retention_columnar(runs, max_age_days, now)
+    expire_before = None
+    if max_age_days is not None:
+        expire_before = (now - timedelta(days=max_age_days)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    keep_ids = latest_run_ids(runs)
+    matched = Counter({rule: 0 for rule in RULES})
+    deletions = []
+    active = 0
+    for run in runs:
+        rules = matched_rules(run, keep_ids, expire_before)
+        if not rules:
+            continue
+        matched.update(rules)
+        if run.is_active:
+            active += 1
+        else:
+            deletions.append(run)
+    return RetentionPlan(len(runs), deletions, matched, active)
+
+
+def retention_masks(table, max_age_days=None, now=None):
+    """
+    在列式表上以掩码运算评估各条规则。
+
+    :param table: RunTable实例（NumPy列）。
+    :param max_age_days: 运行保留的最长天数，为None时不启用过期规则。
+    :param now: 当前时间（datetime，UTC），默认为当前时间。
+    :return: {规则名称: 布尔ndarray}。
+    """
+    np = run_table.np
+    masks = {
+        SUPERSEDED: ~table.latest_mask(),
+        NON_SUCCESSFUL: table.non_success_mask(),
+        DEPENDABOT: table.actor_mask("dependabot[bot]"),
+        EXPIRED: np.zeros(len(table), dtype=bool),
+    }
+    if max_age_days is not None:
+        now = now or datetime.now(timezone.utc)
+        masks[EXPIRED] = table.older_than_mask(max_age_days, now.timestamp())
+    return masks
+
+
+def plan_retention_columnar(runs, max_age_days=None, now=None):
+    """
+    plan_retention的列式实现：先构建RunTable，每条规则一次掩码运算，再合并为删除集合。
+
+    :param runs: WorkflowRun列表。
+    :param max_age_days: 运行保留的最长天数，为None时不启用过期规则。
+    :param now: 当前时间（datetime，UTC），默认为当前时间。
+    :return: RetentionPlan实例。
+    """
+    np = run_table.np
+    table = run_table.RunTable.from_runs(runs)
+    masks = retention_masks(table, max_age_days, now)
+    matched_any = np.logical_or.reduce(list(masks.values()))
+    delete = matched_any & ~table.active
+    matched = Counter({rule: int(mask.sum()) for rule, mask in masks.items()})
+    deletions = [runs[i] for i in np.flatnonzero(delete)]
+    return RetentionPlan(len(runs), deletions, matched, int((matched_any & table.active).sum()))
+
+
+def log_plan(owner, repo, plan):
+    """
+    记录保留策略的评估结果。
+    """
+    logging.info(f"仓库 {owner}/{repo} 的工作流运行保留策略：{plan.summary()}")
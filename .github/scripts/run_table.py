@@ -0,0 +1,146 @@
+from array import array
+from datetime import datetime, timezone
+
+try:
+    import numpy as np  # 可选依赖：安装后保留规则按列向量化计算
+except ImportError:
+    np = None
+
+from workflow_runs import ACTIVE_STATUSES
+
+
+def iso_to_epoch(value):
+    """
+    把 "2024-01-01T00:00:00Z" 形式的时间转换为UTC秒数。
+    """
+    return int(datetime.fromisoformat(value[:19]).replace(tzinfo=timezone.utc).timestamp())
+
+
+def intern_codes(values):
+    """
+    把字符串列编码为整数：相同的字符串得到相同的编码。
+
+    :param values: 字符串（可为None）的可迭代对象。
+    :return: (编码列表, {字符串: 编码})。
+    """
+    table = {}
+    return [table.setdefault(value, len(table)) for value in values], table
+
+
+class RunTable:
+    """
+    按列保存一个仓库的工作流运行：ID、创建时间（UTC秒）、工作流名称编码、触发者编码、
+    是否运行中、是否成功。安装NumPy时各列为ndarray，保留规则以分组和掩码运算一次算出；
+    否则各列为array模块的数组，规则逐行计算。
+
+    所有 *_mask 方法返回与运行等长的布尔序列（NumPy时为布尔ndarray，否则为list）。
+    """
+
+    def __init__(self, ids, created, workflows, actors, active, success, workflow_codes, actor_codes):
+        self.ids = ids
+        self.created = created
+        self.workflows = workflows
+        self.actors = actors
+        self.active = active
+        self.success = success
+        self.workflow_codes = workflow_codes  # {工作流名称: 编码}
+        self.actor_codes = actor_codes  # {触发者: 编码}
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_runs(cls, runs):
+        """
+        从WorkflowRun列表构建列式表。
+
+        :param runs: WorkflowRun列表。
+        :return: RunTable实例。
+        """
+        workflows, workflow_codes = intern_codes(run.name for run in runs)
+        actors, actor_codes = intern_codes(run.actor for run in runs)
+        ids = [run.id for run in runs]
+        active = [run.status in ACTIVE_STATUSES for run in runs]
+        success = [run.conclusion == "success" for run in runs]
+        if np is not None:
+            # 去掉末尾的Z再交给datetime64解析，避免NumPy关于时区的弃用警告
+            created = np.array([run.created_at[:19] for run in runs], dtype="datetime64[s]").astype(np.int64)
+            return cls(
+                np.array(ids, dtype=np.int64),
+                created,
+                np.array(workflows, dtype=np.int32),
+                np.array(actors, dtype=np.int32),
+                np.array(active, dtype=bool),
+                np.array(success, dtype=bool),
+                workflow_codes,
+                actor_codes,
+            )
+        return cls(
+            array("q", ids),
+            array("q", (iso_to_epoch(run.created_at) for run in runs)),
+            array("l", workflows),
+            array("l", actors),
+            array("b", active),
+            array("b", success),
+            workflow_codes,
+            actor_codes,
+        )
+
+    def latest_mask(self):
+        """
+        每个工作流名称下创建时间最新的运行为True；创建时间相同时取列表中靠前的一条，
+        与run_retention.latest_run_ids的结果一致。
+        """
+        n = len(self)
+        if np is None:
+            latest = {}
+            for i in range(n):
+                code = self.workflows[i]
+                if code not in latest or self.created[latest[code]] < self.created[i]:
+                    latest[code] = i
+            mask = [False] * n
+            for i in latest.values():
+                mask[i] = True
+            return mask
+        mask = np.zeros(n, dtype=bool)
+        if n == 0:
+            return mask
+        # 按(工作流, 创建时间, 位置倒序)排序后，每组的最后一条即为最新且最靠前的运行
+        order = np.lexsort((-np.arange(n), self.created, self.workflows))
+        grouped = self.workflows[order]
+        last_in_group = np.append(grouped[1:] != grouped[:-1], True)
+        mask[order[last_in_group]] = True
+        return mask
+
+    def non_success_mask(self):
+        """
+        结论不是success的运行为True。
+        """
+        if np is None:
+            return [not success for success in self.success]
+        return ~self.success
+
+    def actor_mask(self, login):
+        """
+        由指定账号触发的运行为True。
+        """
+        code = self.actor_codes.get(login)
+        if np is None:
+            return [actor == code for actor in self.actors]
+        if code is None:
+            return np.zeros(len(self), dtype=bool)
+        return self.actors == code
+
+    def older_than_mask(self, days, now=None):
+        """
+        创建时间早于 now - days 天的运行为True。
+
+        :param days: 天数。
+        :param now: 当前时间（UTC秒），默认为当前时间。
+        """
+        if now is None:
+            now = datetime.now(timezone.utc).timestamp()
+        cutoff = int(now - days * 86400)
+        if np is None:
+            return [created < cutoff for created in self.created]
+        return self.created < cutoff
@@ -0,0 +1,132 @@
+# 导入json库，用于读写水位文件
+import json
+# 导入logging库，用于记录日志
+import logging
+# 导入os库，用于创建状态目录和原子替换文件
+import os
+# 导入threading库，删除流水线的工作线程会在完成删除后更新水位
+import threading
+
+from workflow_runs import WorkflowRun
+
+
+class RunWatermarkStore:
+    """
+    按仓库保存工作流运行的增量扫描水位（created时间）以及上次扫描后仍未删除的运行。
+
+    每次保留策略执行后，早于水位的运行要么已被删除，要么保存在survivors中，
+    因此下一次只需列举 created>=水位 的运行，再与survivors合并即可得到完整快照。
+    """
+
+    def __init__(self, path):
+        """
+        读取（不存在时新建）水位文件。
+
+        参数:
+        path - JSON水位文件路径。
+        """
+        self.path = path
+        self._repos = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    self._repos = json.load(f)
+            except (OSError, ValueError) as e:
+                # 文件损坏时退回全量扫描，而不是中断维护任务
+                logging.warning(f"无法读取运行水位文件 {path}，将全量扫描: {e}")
+                self._repos = {}
+
+    def clear(self):
+        """
+        清空所有仓库的水位，下一次扫描为全量扫描。
+        """
+        with self._lock:
+            self._repos = {}
+
+    def get(self, owner, repo):
+        """
+        返回仓库的水位和未删除的运行。
+
+        参数:
+        owner - 仓库所有者。
+        repo - 仓库名称。
+
+        返回:
+        (水位字符串, WorkflowRun列表)；没有记录时为 (None, [])。
+        """
+        entry = self._repos.get(f"{owner}/{repo}")
+        if not entry:
+            return None, []
+        return entry['watermark'], [WorkflowRun.from_dict(run) for run in entry['survivors']]
+
+    def update(self, owner, repo, watermark, survivors):
+        """
+        更新仓库的水位和未删除的运行。
+
+        参数:
+        owner - 仓库所有者。
+        repo - 仓库名称。
+        watermark - 下次扫描的起点（ISO 8601时间字符串）；为None时删除该仓库的记录。
+        survivors - 本次扫描后仍然存在的WorkflowRun列表。
+        """
+        key = f"{owner}/{repo}"
+        entry = None
+        if watermark is not None:
+            entry = {
+                'watermark': watermark,
+                'survivors': [run.to_dict() for run in survivors],
+            }
+        with self._lock:
+            if entry is None:
+                self._repos.pop(key, None)
+            else:
+                self._repos[key] = entry
+
+    def save(self):
+        """
+        写回水位文件（先写临时文件再替换，避免进程中断时留下半个文件）。
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with self._lock, open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._repos, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+def next_watermark(runs):
+    """
+    计算下次扫描的水位：快照中最新运行的创建时间；若有尚未结束的运行，
+    则取其中最早的创建时间，使这些运行在下次扫描时以最新状态重新列出。
+
+    参数:
+    runs - 本次快照的WorkflowRun列表（包括本次删除的运行）。
+
+    返回:
+    ISO 8601时间字符串；快照为空时为None。
+    """
+    if not runs:
+        return None
+    active = [run.created_at for run in runs if run.is_active]
+    if active:
+        return min(active)
+    return max(run.created_at for run in runs)
+
+
+def merge_snapshot(survivors, new_runs):
+    """
+    合并上次保存的未删除运行和本次增量列举的运行，同一ID以本次列举的数据为准。
+
+    参数:
+    survivors - 上次保存的WorkflowRun列表。
+    new_runs - 本次列举的WorkflowRun可迭代对象。
+
+    返回:
+    WorkflowRun列表。
+    """
+    runs = {run.id: run for run in survivors}
+    for run in new_runs:
+        runs[run.id] = run
+    return list(runs.values())
@@ -1,9 +1,15 @@
 import asyncio
-import aiohttp
 import os
 import logging
-import shutil
 import subprocess
+import time
+
+from requests.exceptions import RequestException
+
+from api_metrics import install_exit_handler
+from fork_compare import ForkCompareCache
+from github_transport import get_transport, is_rate_limited
+from mirror_cache import MirrorCache, git_auth_env, run_git
 
 # 设置日志配置
 logging.basicConfig(
@@ -11,14 +17,34 @@ logging.basicConfig(
 )
 
 # 从环境变量中获取 GitHub API Token 和用户名
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+# merge-upstream 需要对 fork 有写权限，工作流自带的 GITHUB_TOKEN 只能写当前仓库，
+# 因此优先使用与其他维护脚本相同的 GH_TOKEN（PAT）
+GITHUB_TOKEN = os.getenv("GH_TOKEN") or os.getenv("GITHUB_TOKEN")
 GITHUB_USERNAME = os.getenv("GITHUB_USERNAME")
 
 # GitHub API 基础 URL
 GITHUB_API_URL = "https://api.github.com"
 
+# 同步方式：api 使用 merge-upstream 接口（仅在冲突时回退到本地 git），git 始终克隆后合并
+SYNC_MODE = os.getenv("SYNC_MODE", "api").lower()
+# 同时同步的 fork 数量
+SYNC_CONCURRENCY = int(os.getenv("SYNC_CONCURRENCY", "16"))
+# 相邻两次 merge-upstream 请求之间的最小间隔（秒）。预检查并发进行，
+# 但写入类请求密集发送会触发GitHub的次级速率限制，与 cleanup_forks 一样逐个间隔发送
+WRITE_INTERVAL = float(os.getenv("GH_WRITE_INTERVAL", "1"))
+# 本地 git 合并时使用的提交者身份
+GIT_USER_NAME = os.getenv("GIT_USER_NAME", "github-actions[bot]")
+GIT_USER_EMAIL = os.getenv("GIT_USER_EMAIL", "41898282+github-actions[bot]@users.noreply.github.com")
+
+# 保证并发同步时只检查（安装）一次 Git
+_git_lock = None
+_git_checked = False
+# 串行发送 merge-upstream 请求，并记录上一次请求结束的时间
+_write_lock = None
+_last_write = 0.0
 
-async def fetch_forks(session):
+
+async def fetch_forks(transport):
     """获取当前用户的所有仓库"""
     url = f"{GITHUB_API_URL}/users/{GITHUB_USERNAME}/repos"
     headers = {
@@ -30,55 +56,143 @@ async def fetch_forks(session):
     page = 1
     while True:
         params = {"page": page, "per_page": 100}  # 每页请求 100 个仓库
-        async with session.get(url, headers=headers, params=params) as response:
-            if response.status != 200:
-                logging.error(f"请求失败，状态码: {response.status}")
-                break
+        response = await transport.request_async("GET", url, headers=headers, params=params)
+        if response.status_code != 200:
+            logging.error(f"请求失败，状态码: {response.status_code}")
+            break
 
-            repos = await response.json()
-            if not repos:
-                break
+        repos = response.json()
+        if not repos:
+            break
 
-            forks.extend(repos)
-            page += 1
+        forks.extend(repos)
+        page += 1
 
     return forks
 
 
-async def get_upstream_info(session, repo_full_name):
-    """获取上游仓库的信息，包括默认分支"""
+async def get_upstream_info(transport, repo_full_name):
+    """
+    获取 fork 的父仓库信息。/users/{username}/repos 的列表不包含 parent 字段，
+    需要单独请求 fork 自身的详情。
+
+    :return: 包含 full_name、owner、url、default_branch 的字典，失败时返回 None。
+    """
     url = f"{GITHUB_API_URL}/repos/{repo_full_name}"
     headers = {
         "Authorization": f"token {GITHUB_TOKEN}",
         "Accept": "application/vnd.github.v3+json",
     }
 
-    async with session.get(url, headers=headers) as response:
-        if response.status != 200:
-            logging.error(f"无法获取上游仓库信息，状态码: {response.status}")
-            return None, None
+    response = await transport.request_async("GET", url, headers=headers)
+    if response.status_code != 200:
+        logging.error(f"无法获取上游仓库信息，状态码: {response.status_code}")
+        return None
 
-        repo_info = await response.json()
-        upstream_url = repo_info.get("html_url")
-        default_branch = repo_info.get("default_branch")
+    parent = response.json().get("parent")
+    if not parent:
+        return None
+    return {
+        "full_name": parent["full_name"],
+        "owner": parent["owner"]["login"],
+        "url": parent.get("clone_url") or parent["html_url"],
+        "default_branch": parent.get("default_branch"),
+    }
 
-        return upstream_url, default_branch
 
+async def get_branch_sha(transport, repo_full_name, branch):
+    """只读取分支的 head SHA（sha 媒体类型的响应体就是 SHA 本身），失败时返回 None"""
+    url = f"{GITHUB_API_URL}/repos/{repo_full_name}/commits/{branch}"
+    headers = {
+        "Authorization": f"token {GITHUB_TOKEN}",
+        "Accept": "application/vnd.github.sha",
+    }
 
-def clone_repo(repo_url, repo_dir):
-    """尝试使用 Git 命令克隆仓库"""
+    response = await transport.request_async("GET", url, headers=headers)
+    if response.status_code != 200:
+        logging.warning(
+            f"无法获取 {repo_full_name} 的 {branch} 分支 SHA，状态码: {response.status_code}"
+        )
+        return None
+    return response.text.strip()
+
+
+async def compare_with_parent(transport, repo_full_name, branch, parent_owner, parent_branch):
+    """
+    调用 compare 接口比较 fork 的分支与父仓库的默认分支（两者名称可能不同，如 master 与 main）。
+
+    :return: (ahead_by, behind_by)，失败时返回 None。
+    """
+    url = f"{GITHUB_API_URL}/repos/{repo_full_name}/compare/{branch}...{parent_owner}:{parent_branch}"
+    headers = {
+        "Authorization": f"token {GITHUB_TOKEN}",
+        "Accept": "application/vnd.github.v3+json",
+    }
+    # 只需要 ahead_by / behind_by，不需要提交列表
+    params = {"per_page": 1}
+
+    response = await transport.request_async("GET", url, headers=headers, params=params)
+    if response.status_code != 200:
+        logging.warning(
+            f"比较 {repo_full_name} 与 upstream 失败，状态码: {response.status_code}"
+        )
+        return None
+    result = response.json()
+    # 以 fork 为 base、upstream 为 head：ahead_by 是 upstream 领先 fork 的提交数
+    return result["behind_by"], result["ahead_by"]
+
+
+async def precheck_fork(transport, repo, compare_cache):
+    """
+    同步前的预检查：解析 fork 的父仓库和分支，确认 fork 确实落后于 upstream。
+    两边分支的 head SHA 没有变化时直接使用缓存的比较结果，不再调用 compare 接口。
+
+    :return: 需要同步时返回父仓库信息（附带要同步的 fork 分支 branch 和 upstream 分支 parent_branch），
+             否则返回 None。
+    """
+    upstream = await get_upstream_info(transport, repo["full_name"])
+    if not upstream:
+        logging.error(f"无法获取 {repo['full_name']} 的父仓库信息，跳过该仓库。")
+        return None
+    upstream["branch"] = repo.get("default_branch") or upstream["default_branch"]
+    # fork 创建后父仓库可能重命名了默认分支，upstream 一侧始终以父仓库的默认分支为准
+    upstream["parent_branch"] = upstream["default_branch"] or upstream["branch"]
+    branch = upstream["branch"]
+
+    fork_sha, parent_sha = await asyncio.gather(
+        get_branch_sha(transport, repo["full_name"], branch),
+        get_branch_sha(transport, upstream["full_name"], upstream["parent_branch"]),
+    )
+    counts = None
+    if fork_sha and parent_sha:
+        counts = compare_cache.get(fork_sha, parent_sha)
+    if counts is None:
+        counts = await compare_with_parent(
+            transport, repo["full_name"], branch, upstream["owner"], upstream["parent_branch"]
+        )
+        if counts is None:
+            # 无法确认时按落后处理，交给同步流程
+            return upstream
+        if fork_sha and parent_sha:
+            compare_cache.put(fork_sha, parent_sha, *counts)
+
+    ahead_by, behind_by = counts
+    if behind_by == 0:
+        logging.info(f"{repo['full_name']} 的 {branch} 分支未落后于 upstream，跳过同步。")
+        return None
+    logging.info(
+        f"{repo['full_name']} 的 {branch} 分支落后 upstream {behind_by} 个提交（领先 {ahead_by} 个）。"
+    )
+    return upstream
+
+
+def clone_url(repo):
+    """返回仓库的 HTTPS 克隆地址"""
+    repo_url = repo.get("clone_url") or repo["git_url"]
     # 将 git:// 替换为 https://
     if repo_url.startswith("git://"):
         repo_url = repo_url.replace("git://", "https://")
-
-    try:
-        logging.info(f"正在使用 Git 命令克隆 {repo_url} 到 {repo_dir}...")
-        subprocess.run(["git", "clone", repo_url, repo_dir], check=True)
-        logging.info(f"{repo_url} 克隆成功。")
-    except subprocess.CalledProcessError:
-        logging.error(f"使用 Git 命令克隆 {repo_url} 失败。")
-        return False
-    return True
+    return repo_url
 
 
 def install_git():
@@ -94,94 +208,208 @@ def install_git():
         logging.info("Git 安装完成。")
 
 
-async def sync_fork(session, repo):
-    try:
-        # 获取父仓库的 URL 和默认分支
-        upstream_url, default_branch = await get_upstream_info(
-            session, repo["full_name"]
-        )
-        if not upstream_url:
-            logging.error(f"无法获取 {repo['full_name']} 的父仓库信息，跳过该仓库。")
-            return
-        # 克隆 fork 的仓库
-        repo_dir = f"./{repo['name']}"
-        if not os.path.exists(repo_dir):
-            logging.info(f"正在克隆 {repo['full_name']}...")
-
-            # 尝试使用 Git 命令克隆
-            if not clone_repo(repo["git_url"], repo_dir):
-                install_git()  # 检查 Git 是否安装
-                if not clone_repo(repo["git_url"], repo_dir):
-                    logging.error(f"无法克隆 {repo['full_name']}，请手动检查。")
-                    return
-
-        # 添加 upstream 远程仓库
-        logging.info(f"添加 upstream 远程仓库 {upstream_url} 到 {repo['full_name']}...")
-        subprocess.run(
-            ["git", "-C", repo_dir, "remote", "add", "upstream", upstream_url],
-            check=True,
+async def merge_upstream(transport, repo_full_name, branch):
+    """
+    调用 merge-upstream 接口，将上游的更新合并到 fork 的指定分支。
+
+    :return: "merged" 表示已合并（或已是最新），"conflict" 表示存在冲突需要本地处理，
+             "failed" 表示其他错误。
+    并发同步时请求依次发送，相邻两次之间至少间隔 WRITE_INTERVAL 秒。
+    """
+    global _write_lock, _last_write
+    url = f"{GITHUB_API_URL}/repos/{repo_full_name}/merge-upstream"
+    headers = {
+        "Authorization": f"token {GITHUB_TOKEN}",
+        "Accept": "application/vnd.github.v3+json",
+    }
+
+    if _write_lock is None:
+        _write_lock = asyncio.Lock()
+    async with _write_lock:
+        delay = _last_write + WRITE_INTERVAL - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        try:
+            response = await transport.request_async("POST", url, headers=headers, json={"branch": branch})
+        finally:
+            _last_write = time.monotonic()
+    if response.status_code == 200:
+        result = response.json()
+        if result.get("merge_type") == "none":
+            logging.info(f"{repo_full_name} 的 {branch} 分支已与 upstream 同步。")
+        else:
+            logging.info(
+                f"{repo_full_name} 的 {branch} 分支同步成功（{result.get('merge_type')}）。"
+            )
+        return "merged"
+    if response.status_code == 409:
+        logging.warning(f"{repo_full_name} 的 {branch} 分支与 upstream 存在冲突。")
+        return "conflict"
+    if response.status_code in (401, 403) and not is_rate_limited(response):
+        # 令牌没有该 fork 的写权限时本地 git 推送同样会失败，不做回退
+        logging.error(
+            f"{repo_full_name} 调用 merge-upstream 被拒绝（{response.status_code}）："
+            f"令牌没有该仓库的写权限，请通过 GH_TOKEN 提供具有 repo 权限的个人访问令牌。"
         )
+        return "failed"
+    logging.error(
+        f"{repo_full_name} 调用 merge-upstream 失败，状态码: {response.status_code}, 响应: {response.text}"
+    )
+    return "failed"
+
+
+async def ensure_git():
+    """在线程中检查（必要时安装）Git，并发调用时只执行一次"""
+    global _git_lock, _git_checked
+    if _git_lock is None:
+        _git_lock = asyncio.Lock()
+    async with _git_lock:
+        if not _git_checked:
+            await asyncio.to_thread(install_git)
+            _git_checked = True
+
+
+async def sync_fork(transport, repo, cache, upstream):
+    """
+    同步单个 fork：默认通过 merge-upstream 接口完成，只有 GitHub 报告冲突时才回退到本地 git。
+    SYNC_MODE=git 时始终使用本地 git。
+
+    :param upstream: precheck_fork 返回的父仓库信息。
+    :return: 同步结果（见 sync_fork_with_git）。
+    """
+    if SYNC_MODE == "git":
+        return await sync_fork_with_git(repo, cache, upstream)
+
+    try:
+        result = await merge_upstream(transport, repo["full_name"], upstream["branch"])
+    except RequestException as e:
+        logging.error(f"处理 {repo['full_name']} 时出错: {e}")
+        return "failed"
+
+    if result == "conflict":
+        logging.info(f"{repo['full_name']} 回退到本地 git 同步...")
+        return await sync_fork_with_git(repo, cache, upstream)
+    return result
+
+
+async def sync_fork_with_git(repo, cache, upstream):
+    """
+    在镜像缓存的临时工作树中获取 upstream 更新并在本地合并，合并成功后推送回 fork。
+    存在冲突时不修改 fork，记录为需要手动处理。
 
-        # 获取 upstream 的更新
+    :return: "merged" 表示已合并并推送，"up-to-date" 表示无需同步，
+             "conflict" 表示存在冲突，"failed" 表示其他错误。
+    """
+    try:
+        upstream_url = upstream["url"]
+        default_branch = upstream["branch"]
+        parent_branch = upstream.get("parent_branch", default_branch)
+        # 创建或增量更新 fork 的镜像
+        repo_url = clone_url(repo)
+        if not await cache.ensure_mirror(repo["full_name"], repo_url):
+            await ensure_git()  # 检查 Git 是否安装
+            if not await cache.ensure_mirror(repo["full_name"], repo_url):
+                logging.error(f"无法克隆 {repo['full_name']}，请手动检查。")
+                return "failed"
+
+        # 添加 upstream 远程仓库并获取更新（同样只获取提交和树，不获取文件内容）
         logging.info(f"获取 {repo['full_name']} 的 upstream 更新...")
-        subprocess.run(["git", "-C", repo_dir, "fetch", "upstream"], check=True)
-
-        # 检查 fork 是否落后于 upstream
-        logging.info(f"检查 {repo['full_name']} 是否落后于 upstream...")
-        if (
-            subprocess.run(
-                [
-                    "git",
-                    "-C",
-                    repo_dir,
-                    "merge-base",
-                    "--is-ancestor",
-                    f"upstream/{default_branch}",
-                    "HEAD",
-                ]
-            ).returncode
-            == 0
-        ):
+        await cache.set_remote(repo["full_name"], "upstream", upstream_url)
+        upstream_ref = f"refs/remotes/upstream/{parent_branch}"
+        await cache.fetch(
+            repo["full_name"], "--filter=blob:none", "upstream",
+            f"+refs/heads/{parent_branch}:{upstream_ref}",
+        )
+
+        async with cache.worktree(repo["full_name"], default_branch) as work_dir:
+            # 检查 fork 是否落后于 upstream
+            logging.info(f"检查 {repo['full_name']} 是否落后于 upstream...")
+            try:
+                await run_git("merge-base", "--is-ancestor", upstream_ref, "HEAD", cwd=work_dir)
+                logging.info(f"{repo['full_name']} 已与 upstream 同步。")
+                return "up-to-date"
+            except subprocess.CalledProcessError:
+                pass
+
             logging.info(f"{repo['full_name']} 落后于 upstream，正在尝试同步...")
             try:
-                subprocess.run(
-                    ["git", "-C", repo_dir, "merge", f"upstream/{default_branch}"],
-                    check=True,
+                await run_git(
+                    "-c", f"user.name={GIT_USER_NAME}", "-c", f"user.email={GIT_USER_EMAIL}",
+                    "merge", "--no-edit", upstream_ref, cwd=work_dir,
                 )
-                logging.info(f"{repo['full_name']} 同步成功。")
+            except subprocess.TimeoutExpired as e:
+                logging.error(f"{repo['full_name']} 合并超时: {e}")
+                return "failed"
             except subprocess.CalledProcessError as e:
-                logging.error(f"{repo['full_name']} 发生冲突，需要手动处理。")
-                logging.error(e)
-        else:
-            logging.info(f"{repo['full_name']} 已与 upstream 同步。")
+                logging.error(f"{repo['full_name']} 与 upstream 存在冲突，fork 未修改，需要手动处理。")
+                logging.error(e.stdout or e.stderr or e)
+                return "conflict"
+
+            try:
+                await cache.push(repo["full_name"], work_dir, default_branch)
+            except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+                logging.error(f"{repo['full_name']} 推送合并结果失败: {e.stderr or e}")
+                return "failed"
+            logging.info(f"{repo['full_name']} 同步成功，已推送到 {default_branch} 分支。")
+            return "merged"
 
     except Exception as e:
         logging.error(f"处理 {repo['full_name']} 时出错: {e}")
-    finally:
-        # 删除克隆的仓库
-        if os.path.exists(repo_dir):
-            logging.info(f"正在删除克隆的仓库 {repo['full_name']}...")
-            shutil.rmtree(repo_dir)
+        return "failed"
 
 
 async def main():
-    async with aiohttp.ClientSession() as session:
-        # 获取所有 fork 仓库
-        forks = await fetch_forks(session)
-
-        for repo in forks:
-            # 检查是否为分叉且有父仓库
-            if repo.get("fork") == True:  # 确保 fork 为 True
-                await sync_fork(session, repo)  # 确保依次处理每个仓库
-            else:
-                logging.info(
-                    f"跳过仓库 {repo['full_name']}，因为它不是有效的有父仓库的 fork。"
-                )
+    # clone/fetch/push 使用同一个令牌认证，推送需要对 fork 的写权限
+    cache = MirrorCache(git_env=git_auth_env(GITHUB_TOKEN))
+    compare_cache = ForkCompareCache()
+    semaphore = asyncio.Semaphore(SYNC_CONCURRENCY)
+
+    async def sync_bounded(transport, repo):
+        async with semaphore:
+            try:
+                upstream = await precheck_fork(transport, repo, compare_cache)
+            except RequestException as e:
+                logging.error(f"预检查 {repo['full_name']} 时出错: {e}")
+                return "failed"
+            # 只有确实落后于 upstream 的 fork 才进入同步流程
+            if not upstream:
+                return "up-to-date"
+            return await sync_fork(transport, repo, cache, upstream)
+
+    # 与其他维护脚本共用同一个连接池、限速器和重试策略
+    transport = get_transport()
+    # 获取所有 fork 仓库
+    forks = await fetch_forks(transport)
+
+    tasks = []
+    synced = []
+    for repo in forks:
+        # 检查是否为分叉且有父仓库
+        if repo.get("fork") == True:  # 确保 fork 为 True
+            tasks.append(sync_bounded(transport, repo))
+            synced.append(repo)
+        else:
+            logging.info(
+                f"跳过仓库 {repo['full_name']}，因为它不是有效的有父仓库的 fork。"
+            )
+    # 并发同步所有 fork，git 的网络和磁盘操作另外受镜像缓存的信号量限制
+    results = await asyncio.gather(*tasks)
+    conflicted = [repo["full_name"] for repo, result in zip(synced, results) if result == "conflict"]
+    if conflicted:
+        logging.warning(f"以下 fork 与 upstream 存在冲突，需要手动合并: {', '.join(conflicted)}")
+
+    logging.info(
+        f"比较结果缓存：命中 {compare_cache.hits} 次，未命中 {compare_cache.misses} 次"
+    )
+    compare_cache.close()
+    # 按最近使用时间淘汰超出大小上限的镜像
+    cache.evict()
 
 
 if __name__ == "__main__":
     # 确保环境变量已设置
     if not GITHUB_TOKEN or not GITHUB_USERNAME:
-        logging.error("请设置环境变量 GITHUB_TOKEN 和 GITHUB_USERNAME。")
+        logging.error("请设置环境变量 GH_TOKEN（或 GITHUB_TOKEN）和 GITHUB_USERNAME。")
     else:
+        install_exit_handler(name="api_metrics_sync_forks")
         asyncio.run(main())
@@ -0,0 +1,84 @@
+# test_api_metrics.py
+
+import json
+
+import pytest
+
+from api_metrics import APIMetrics, endpoint_template
+from github_api_client import build_response
+
+
+@pytest.mark.parametrize("endpoint, template", [
+    ("repos/a/b/actions/runs/123?page=2", "repos/{o}/{r}/actions/runs/{id}"),
+    ("/repos/a/b/pulls/7/comments", "repos/{o}/{r}/pulls/{id}/comments"),
+    ("users/octocat/repos", "users/{u}/repos"),
+    ("orgs/acme/repos", "orgs/{u}/repos"),
+    ("repos/a/b/branches/main", "repos/{o}/{r}/branches/{branch}"),
+    ("repos/a/b/branches/feature/x", "repos/{o}/{r}/branches/{branch}"),
+    ("repos/a/b/commits/main", "repos/{o}/{r}/commits/{ref}"),
+    ("repos/a/b/commits/release/1.2", "repos/{o}/{r}/commits/{ref}"),
+    ("repos/a/b/commits", "repos/{o}/{r}/commits"),
+    ("repos/a/b/compare/main...c:main", "repos/{o}/{r}/compare/{basehead}"),
+    ("repos/a/b/compare/feature/x...c:feature/x", "repos/{o}/{r}/compare/{basehead}"),
+    ("repos/a/b/contents/docs/README.md", "repos/{o}/{r}/contents/{path}"),
+    ("graphql", "graphql"),
+    ("pypi.org/pypi/requests/json", "pypi.org/pypi/{path}"),
+    ("pypi.org/pypi/numpy/1.26.0/json", "pypi.org/pypi/{path}"),
+    ("example.com/health", "example.com/health"),
+])
+def test_endpoint_template(endpoint, template):
+    assert endpoint_template(endpoint) == template
+
+
+def test_branch_names_share_one_template():
+    metrics = APIMetrics()
+    for branch in ("main", "feature/x", "release/1.2/hotfix"):
+        metrics.record("get", f"repos/a/b/commits/{branch}", 200, 0.1)
+    assert list(metrics.summary()) == ["GET repos/{o}/{r}/commits/{ref}"]
+    assert metrics.summary()["GET repos/{o}/{r}/commits/{ref}"]["requests"] == 3
+
+
+def recorded_metrics():
+    metrics = APIMetrics()
+    ok = build_response(200, {}, b"0123456789", "https://api.github.com/repos/a/b/pulls")
+    metrics.record("GET", "repos/a/b/pulls", 200, 0.07, response=ok)
+    metrics.record("GET", "repos/c/d/pulls", 502, 3.0, retry=True)
+    metrics.record("GET", "repos/c/d/pulls", 200, 0.2, response=ok, retry=True)
+    return metrics
+
+
+def test_write_json(tmp_path):
+    path = tmp_path / "api_metrics.json"
+    recorded_metrics().write_json(path)
+
+    data = json.loads(path.read_text(encoding="utf-8"))
+    stats = data["GET repos/{o}/{r}/pulls"]
+    assert stats["requests"] == 3
+    assert stats["statuses"] == {"200": 2, "502": 1}
+    assert stats["retries"] == 2
+    assert stats["bytes_received"] == 20
+    assert stats["rate_limit_units"] == 2
+    assert stats["latency_histogram"]["0.1"] == 1
+    assert stats["latency_histogram"]["0.25"] == 1
+    assert stats["latency_histogram"]["5.0"] == 1
+
+
+def test_write_prometheus(tmp_path):
+    path = tmp_path / "api_metrics.prom"
+    recorded_metrics().write_prometheus(path)
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    labels = 'method="GET",endpoint="repos/{o}/{r}/pulls"'
+    assert f'github_api_requests_total{{{labels},status="200"}} 2' in lines
+    assert f'github_api_requests_total{{{labels},status="502"}} 1' in lines
+    assert f'github_api_retries_total{{{labels}}} 2' in lines
+    assert f'github_api_received_bytes_total{{{labels}}} 20' in lines
+    assert f'github_api_rate_limit_units_total{{{labels}}} 2' in lines
+    # 直方图的桶是累计的
+    assert f'github_api_request_duration_seconds_bucket{{{labels},le="0.05"}} 0' in lines
+    assert f'github_api_request_duration_seconds_bucket{{{labels},le="0.1"}} 1' in lines
+    assert f'github_api_request_duration_seconds_bucket{{{labels},le="0.25"}} 2' in lines
+    assert f'github_api_request_duration_seconds_bucket{{{labels},le="+Inf"}} 3' in lines
+    assert f'github_api_request_duration_seconds_count{{{labels}}} 3' in lines
+    assert f'github_api_request_duration_seconds_sum{{{labels}}} 3.270000' in lines
+    assert "# TYPE github_api_request_duration_seconds histogram" in lines
@@ -0,0 +1,102 @@
+# test_async_github_repo_manager.py
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, Mock
+
+from async_github_api_client import AsyncGitHubAPIClient
+from async_github_repo_manager import AsyncGitHubRepoManager
+from github_transport import build_response
+from pr_activity import activity_cutoff
+
+OLD = "2000-01-01T00:00:00Z"
+RECENT = "2999-01-01T00:00:00Z"
+
+
+def ok(status, body, headers=None):
+    return build_response(status, headers or {}, json.dumps(body).encode(), "https://api.github.com/")
+
+
+def make_manager(responses=()):
+    client = Mock()
+    client.api_request = AsyncMock(side_effect=list(responses))
+    return AsyncGitHubRepoManager(max_concurrency=4, client=client)
+
+
+def requested(manager):
+    return [(call.args[0], call.args[1]) for call in manager.client.api_request.call_args_list]
+
+
+def test_graphql_prs_are_judged_by_last_activity_without_extra_requests():
+    manager = make_manager([ok(201, {}), ok(200, {})])
+    pull_requests = [
+        {"number": 1, "user": {"login": "a"}, "updated_at": OLD, "last_activity_at": OLD},
+        # updated_at 较早但最近有评论，GraphQL清单已经把评论时间计入 last_activity_at
+        {"number": 2, "user": {"login": "b"}, "updated_at": OLD, "last_activity_at": RECENT},
+    ]
+
+    async def run():
+        snapshot = await manager.get_pr_snapshot("o", "r", pull_requests)
+        await manager.close_inactive_pull_requests_for_repo("o", "r", snapshot)
+        return snapshot
+
+    snapshot = asyncio.run(run())
+    assert requested(manager) == [("POST", "repos/o/r/issues/1/comments"), ("PATCH", "repos/o/r/pulls/1")]
+    assert [pr["number"] for pr in snapshot.open_pull_requests()] == [2]
+
+
+def test_rest_prs_check_comments_then_timeline():
+    timeline_first = ok(200, [{"created_at": OLD}], {
+        "Link": '<https://api.github.com/repos/o/r/issues/1/timeline?per_page=100&page=3>; rel="last"'
+    })
+    manager = make_manager([ok(200, []), timeline_first, ok(200, [{"created_at": RECENT}])])
+    snapshot_prs = [{"number": 1, "user": {"login": "a"}, "updated_at": OLD}]
+
+    async def run():
+        snapshot = await manager.get_pr_snapshot("o", "r", snapshot_prs)
+        await manager.close_inactive_pull_requests_for_repo("o", "r", snapshot)
+
+    asyncio.run(run())
+    calls = manager.client.api_request.call_args_list
+    assert calls[0].kwargs["params"]["per_page"] == 1
+    assert calls[0].kwargs["params"]["since"] <= activity_cutoff()
+    assert calls[2].kwargs["params"]["page"] == 3
+    # 时间线最后一页有最近的事件，不关闭
+    assert len(calls) == 3
+
+
+def test_pr_inventory_uses_async_graphql():
+    manager = make_manager()
+    manager.client.graphql = AsyncMock(return_value={"repositoryOwner": {"repositories": {
+        "pageInfo": {"hasNextPage": False, "endCursor": None},
+        "nodes": [{
+            "name": "r", "owner": {"login": "o"}, "isArchived": False,
+            "pullRequests": {"pageInfo": {"hasNextPage": False, "endCursor": None}, "nodes": [{
+                "number": 7, "author": {"__typename": "Bot", "login": "dependabot"},
+                "createdAt": OLD, "updatedAt": OLD, "mergeable": "MERGEABLE", "mergeStateStatus": "BEHIND",
+            }]},
+        }],
+    }}})
+
+    inventory = asyncio.run(manager.get_pr_inventory("o"))
+    assert [pr["user"]["login"] for pr in inventory[("o", "r")]] == ["dependabot[bot]"]
+
+
+def test_client_paginate_yields_pages_in_order(monkeypatch):
+    monkeypatch.setenv("GH_HTTP_CACHE", "0")
+    client = AsyncGitHubAPIClient(transport=Mock())
+    last = '<https://api.github.com/repos/o/r/pulls?per_page=2&page=3>; rel="last"'
+    delays = {1: 0, 2: 0.03, 3: 0}
+
+    async def api_request(method, endpoint, **kwargs):
+        page = kwargs["params"]["page"]
+        # 第2页最后完成，条目仍按页序产出
+        await asyncio.sleep(delays[page])
+        return ok(200, [page * 10, page * 10 + 1], {"Link": last})
+
+    client.api_request = api_request
+
+    async def run():
+        return [item async for item in client.paginate("repos/o/r/pulls", per_page=2)]
+
+    assert asyncio.run(run()) == [10, 11, 20, 21, 30, 31]
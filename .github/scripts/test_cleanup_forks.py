@@ -0,0 +1,42 @@
+# test_cleanup_forks.py
+
+from unittest.mock import MagicMock
+
+from cleanup_forks import plan_pull_requests, sync_pr_key
+
+
+def fork(name, parent_owner="up"):
+    return {
+        "name": name,
+        "full_name": f"me/{name}",
+        "default_branch": "main",
+        "parent": {"full_name": f"{parent_owner}/{name}", "default_branch": "dev", "owner": {"login": parent_owner}},
+    }
+
+
+def compare_transport(behind):
+    transport = MagicMock()
+
+    def request(method, url, headers=None, params=None):
+        response = MagicMock()
+        response.json.return_value = {"ahead_by": behind[url.split("/")[5]], "behind_by": 0}
+        return response
+
+    transport.request.side_effect = request
+    return transport
+
+
+def test_sync_pr_key():
+    assert sync_pr_key(fork("r")) == ("up", "dev", "main")
+    assert sync_pr_key({"name": "r", "default_branch": "main"}) is None
+
+
+def test_plan_skips_open_prs_and_up_to_date_forks():
+    transport = compare_transport({"behind": 3, "current": 0})
+    forks = [fork("behind"), fork("current"), fork("open")]
+    open_heads = {"me/open": {("up", "dev", "main")}}
+
+    planned = plan_pull_requests(transport, forks, open_heads, "t", workers=2)
+    assert [repo["name"] for repo in planned] == ["behind"]
+    # 已有同步PR的fork不需要比较
+    assert transport.request.call_count == 2
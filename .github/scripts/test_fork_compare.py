@@ -0,0 +1,24 @@
+# test_fork_compare.py
+
+from fork_compare import ForkCompareCache
+
+
+def test_comparison_cached_by_sha_pair(tmp_path):
+    path = str(tmp_path / "fork_compare.sqlite3")
+    cache = ForkCompareCache(path)
+    assert cache.get("a1", "b1") is None
+    cache.put("a1", "b1", 2, 5)
+    cache.close()
+
+    cache = ForkCompareCache(path)
+    assert cache.get("a1", "b1") == (2, 5)
+    # 任一边的 head 变化都需要重新比较
+    assert cache.get("a1", "b2") is None
+    assert cache.get("a2", "b1") is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_identical_heads_need_no_lookup(tmp_path):
+    cache = ForkCompareCache(str(tmp_path / "fork_compare.sqlite3"))
+    assert cache.get("same", "same") == (0, 0)
+    assert (cache.hits, cache.misses) == (0, 0)
@@ -0,0 +1,30 @@
+# test_fork_parents.py
+
+from fork_parents import ForkParentCache, slim_parent
+
+PARENT = {
+    "full_name": "up/r",
+    "default_branch": "main",
+    "owner": {"login": "up", "html_url": "https://github.com/up", "id": 1},
+    "stargazers_count": 10,
+}
+
+
+def test_slim_parent_keeps_sync_fields():
+    assert slim_parent(PARENT) == {
+        "full_name": "up/r",
+        "default_branch": "main",
+        "owner": {"login": "up", "html_url": "https://github.com/up"},
+    }
+
+
+def test_cache_invalidated_by_updated_at(tmp_path):
+    path = str(tmp_path / "state" / "fork_parents.json")
+    cache = ForkParentCache(path)
+    assert cache.get("me/r", "2024-01-01T00:00:00Z") is None
+    cache.update("me/r", "2024-01-01T00:00:00Z", slim_parent(PARENT))
+    cache.save()
+
+    cache = ForkParentCache(path)
+    assert cache.get("me/r", "2024-01-01T00:00:00Z")["full_name"] == "up/r"
+    assert cache.get("me/r", "2024-02-01T00:00:00Z") is None
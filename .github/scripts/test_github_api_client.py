@@ -0,0 +1,100 @@
+# test_github_api_client.py
+
+import json
+import threading
+import time
+
+from github_api_client import GitHubAPIClient, last_page_number
+from github_transport import build_response
+
+URL = "https://api.github.com/repos/o/r/pulls"
+
+
+def page_response(page, last=None):
+    headers = {}
+    if last:
+        headers["Link"] = (
+            f'<{URL}?per_page=2&page={page + 1}>; rel="next", <{URL}?per_page=2&page={last}>; rel="last"'
+        )
+    return build_response(200, headers, json.dumps([page * 10, page * 10 + 1]).encode(), f"{URL}?page={page}")
+
+
+def make_client(monkeypatch, fetch):
+    """fetch(page) 返回该页的响应（或None表示失败），记录请求过的页码"""
+    monkeypatch.setenv("GH_HTTP_CACHE", "0")
+    client = GitHubAPIClient(transport="requests")
+    client.requested = []
+    lock = threading.Lock()
+
+    def api_request(method, endpoint, **kwargs):
+        page = kwargs["params"]["page"]
+        with lock:
+            client.requested.append(page)
+        return fetch(page)
+
+    client.api_request = api_request
+    return client
+
+
+def test_last_page_number_reads_rel_last():
+    assert last_page_number(page_response(1, last=7)) == 7
+    # 只有一页时没有Link头部
+    assert last_page_number(page_response(1)) == 1
+
+
+def test_single_page_without_link_header(monkeypatch):
+    client = make_client(monkeypatch, lambda page: page_response(page))
+    assert list(client.paginate("repos/o/r/pulls", per_page=2)) == [10, 11]
+    assert client.requested == [1]
+
+
+def test_items_arrive_in_page_order_when_pages_finish_out_of_order(monkeypatch):
+    later_pages_done = threading.Event()
+    finished = []
+
+    def fetch(page):
+        if page == 2:
+            # 第2页等到第3、4页都完成后才返回
+            later_pages_done.wait(5)
+        response = page_response(page, last=4)
+        finished.append(page)
+        if len([p for p in finished if p in (3, 4)]) == 2:
+            later_pages_done.set()
+        return response
+
+    client = make_client(monkeypatch, fetch)
+    items = list(client.paginate("repos/o/r/pulls", per_page=2, max_workers=3))
+    assert items == [10, 11, 20, 21, 30, 31, 40, 41]
+    assert finished.index(2) > finished.index(3)
+
+
+def test_stopping_early_cancels_pending_pages(monkeypatch):
+    started, release = threading.Event(), threading.Event()
+
+    def fetch(page):
+        if page == 3:
+            started.set()
+            release.wait(5)
+        return page_response(page, last=6)
+
+    client = make_client(monkeypatch, fetch)
+    pages = client.paginate("repos/o/r/pulls", per_page=2, max_workers=1)
+    assert [next(pages) for _ in range(3)] == [10, 11, 20]
+    assert started.wait(5)
+    pages.close()
+    release.set()
+    time.sleep(0.05)
+    # 第3页已经开始，其余排队中的页面被取消
+    assert sorted(client.requested) == [1, 2, 3]
+
+
+def test_first_page_failure_yields_nothing(monkeypatch):
+    client = make_client(monkeypatch, lambda page: None)
+    assert list(client.paginate("repos/o/r/pulls")) == []
+    assert client.requested == [1]
+
+
+def test_failure_on_a_later_page_stops_iteration(monkeypatch):
+    client = make_client(monkeypatch, lambda page: None if page == 3 else page_response(page, last=4))
+    # 第3页失败后不再产出第4页的条目，避免调用方把不完整的列表当作完整结果
+    assert list(client.paginate("repos/o/r/pulls", per_page=2, max_workers=1)) == [10, 11, 20, 21]
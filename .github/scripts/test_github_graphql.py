@@ -0,0 +1,84 @@
+# test_github_graphql.py
+
+from unittest.mock import Mock
+
+from github_graphql import PR_INVENTORY_QUERY, REPO_PRS_QUERY, fetch_pr_inventory, normalize_pull_request
+
+
+def pr_node(number, login="octocat", typename="User", updated="2024-01-02T00:00:00Z", **extra):
+    return {
+        "number": number,
+        "author": {"__typename": typename, "login": login},
+        "createdAt": "2024-01-01T00:00:00Z",
+        "updatedAt": updated,
+        "mergeable": "MERGEABLE",
+        "mergeStateStatus": "CLEAN",
+        **extra,
+    }
+
+
+def page_info(cursor=None):
+    return {"hasNextPage": cursor is not None, "endCursor": cursor}
+
+
+def repo_node(name, prs, cursor=None):
+    return {
+        "name": name,
+        "owner": {"login": "u"},
+        "isArchived": False,
+        "pullRequests": {"pageInfo": page_info(cursor), "nodes": prs},
+    }
+
+
+def inventory_page(repos, cursor=None):
+    return {"repositoryOwner": {"repositories": {"pageInfo": page_info(cursor), "nodes": repos}}}
+
+
+def test_bot_author_gets_rest_suffix():
+    pr = normalize_pull_request(pr_node(1, login="dependabot", typename="Bot"))
+    assert pr["user"] == {"login": "dependabot[bot]"}
+    assert normalize_pull_request(pr_node(2))["user"] == {"login": "octocat"}
+    # 已删除的账号没有作者
+    assert normalize_pull_request(pr_node(3, author=None))["user"] == {"login": None}
+
+
+def test_last_activity_without_comments_or_timeline():
+    pr = normalize_pull_request(pr_node(1, comments=None, timelineItems=None))
+    assert pr["last_activity_at"] == "2024-01-02T00:00:00Z"
+    assert (pr["mergeable"], pr["mergeable_state"]) == (True, "clean")
+
+    pr = normalize_pull_request(pr_node(
+        1,
+        comments={"nodes": [{"createdAt": "2024-03-01T00:00:00Z"}]},
+        timelineItems={"updatedAt": "2024-02-01T00:00:00Z"},
+    ))
+    assert pr["last_activity_at"] == "2024-03-01T00:00:00Z"
+
+
+def test_inventory_follows_repository_and_pull_request_cursors():
+    client = Mock()
+    client.graphql = Mock(side_effect=[
+        inventory_page([repo_node("a", [pr_node(1)], cursor="pr-1")], cursor="repo-1"),
+        {"repository": {"pullRequests": {"pageInfo": page_info("pr-2"), "nodes": [pr_node(2)]}}},
+        {"repository": {"pullRequests": {"pageInfo": page_info(), "nodes": [pr_node(3)]}}},
+        inventory_page([repo_node("b", [])]),
+    ])
+
+    inventory = list(fetch_pr_inventory(client, "u", repos_per_page=1))
+
+    assert [(repo["name"], [pr["number"] for pr in repo["pull_requests"]]) for repo in inventory] == [
+        ("a", [1, 2, 3]),
+        ("b", []),
+    ]
+    calls = client.graphql.call_args_list
+    assert [call.args[0] for call in calls] == [PR_INVENTORY_QUERY, REPO_PRS_QUERY, REPO_PRS_QUERY, PR_INVENTORY_QUERY]
+    assert calls[0].args[1] == {"login": "u", "first": 1, "after": None}
+    assert calls[1].args[1] == {"owner": "u", "name": "a", "after": "pr-1"}
+    assert calls[2].args[1]["after"] == "pr-2"
+    assert calls[3].args[1]["after"] == "repo-1"
+
+
+def test_inventory_stops_on_error():
+    client = Mock()
+    client.graphql = Mock(return_value=None)
+    assert list(fetch_pr_inventory(client, "u")) == []
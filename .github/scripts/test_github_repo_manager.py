@@ -0,0 +1,68 @@
+# test_github_repo_manager.py
+
+import json
+from unittest.mock import Mock
+
+import pytest
+
+from github_api_client import build_response
+from github_repo_manager import GitHubRepoManager
+from pr_activity import TIMELINE_PER_PAGE, activity_cutoff
+
+OLD = "2000-01-01T00:00:00Z"
+RECENT = "2999-01-01T00:00:00Z"
+TIMELINE_LAST = '<https://api.github.com/repos/o/r/issues/1/timeline?per_page=100&page=3>; rel="last"'
+
+
+def ok(status, body, headers=None):
+    return build_response(status, headers or {}, json.dumps(body).encode(), "https://api.github.com/")
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.setenv("GH_HTTP_CACHE", "0")
+    manager = GitHubRepoManager()
+    manager.client.api_request = Mock()
+    return manager
+
+
+def test_recent_comment_skips_timeline(manager):
+    manager.client.api_request.side_effect = [ok(200, [{"updated_at": RECENT}])]
+
+    assert manager.has_recent_activity("o", "r", 1)
+    call = manager.client.api_request.call_args
+    assert call.args == ("GET", "repos/o/r/issues/1/comments")
+    # 只请求截止时间之后更新过的评论，最多一条
+    assert call.kwargs["params"]["per_page"] == 1
+    assert call.kwargs["params"]["since"] <= activity_cutoff()
+
+
+def test_recent_timeline_event_on_last_page_counts_as_activity(manager):
+    manager.client.api_request.side_effect = [
+        ok(200, []),
+        ok(200, [{"created_at": OLD}], {"Link": TIMELINE_LAST}),
+        ok(200, [{"created_at": OLD}, {"committer": {"date": RECENT}}]),
+    ]
+
+    # 没有新评论，但时间线最后一页有最近的提交
+    assert manager.has_recent_activity("o", "r", 1)
+    calls = manager.client.api_request.call_args_list
+    assert [call.args[1] for call in calls] == [
+        "repos/o/r/issues/1/comments", "repos/o/r/issues/1/timeline", "repos/o/r/issues/1/timeline",
+    ]
+    assert calls[1].kwargs["params"] == {"per_page": TIMELINE_PER_PAGE}
+    assert calls[2].kwargs["params"] == {"per_page": TIMELINE_PER_PAGE, "page": 3}
+
+
+def test_single_page_timeline_is_not_fetched_twice(manager):
+    manager.client.api_request.side_effect = [ok(200, []), ok(200, [{"created_at": OLD}])]
+
+    assert not manager.has_recent_activity("o", "r", 1)
+    assert manager.client.api_request.call_count == 2
+
+
+def test_failed_timeline_last_page_is_not_activity(manager):
+    manager.client.api_request.side_effect = [ok(200, []), ok(200, [], {"Link": TIMELINE_LAST}), ok(502, {})]
+
+    assert not manager.has_recent_activity("o", "r", 1)
+    assert manager.client.api_request.call_count == 3
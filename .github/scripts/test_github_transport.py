@@ -0,0 +1,112 @@
+# test_github_transport.py
+
+from unittest.mock import Mock
+
+import pytest
+import requests
+
+from api_metrics import APIMetrics
+from github_transport import Transport, build_response, retry_delay, should_retry
+from rate_limiter import RateLimiter
+
+URL = "https://api.github.com/repos/o/r/pulls"
+
+
+def response(status, headers=None):
+    return build_response(status, headers or {}, b"{}", URL)
+
+
+def make_transport(*responses):
+    session = Mock()
+    session.request = Mock(side_effect=list(responses))
+    return Transport(session, RateLimiter(), APIMetrics())
+
+
+def test_retry_policy():
+    assert should_retry("GET", response(502))
+    assert should_retry("GET", None)
+    assert not should_retry("GET", response(404))
+    # 写请求只在速率限制（请求未被处理）时重试
+    assert not should_retry("POST", response(502))
+    assert should_retry("POST", response(403, {"Retry-After": "3"}))
+    assert retry_delay(1, response(429, {"Retry-After": "7"})) == 7
+    assert retry_delay(2) == 4
+
+
+def test_request_retries_then_records_metrics(monkeypatch):
+    monkeypatch.setattr("github_transport.time.sleep", lambda seconds: None)
+    transport = make_transport(response(503), response(200))
+
+    assert transport.request("GET", URL).status_code == 200
+    stats = transport.metrics.summary()["GET repos/{o}/{r}/pulls"]
+    assert stats["requests"] == 2 and stats["retries"] == 1
+
+
+def test_non_github_hosts_are_not_rate_limited():
+    transport = make_transport(response(200))
+    transport.rate_limiter = Mock()
+    transport.request("GET", "https://pypi.org/pypi/requests/json")
+    transport.rate_limiter.acquire.assert_not_called()
+    assert "GET pypi.org/pypi/{path}" in transport.metrics.summary()
+
+
+def test_rate_limited_expected_status_is_retried(monkeypatch):
+    from github_api_client import GitHubAPIClient
+
+    monkeypatch.setattr("github_api_client.time.sleep", lambda seconds: None)
+    monkeypatch.setenv("GH_HTTP_CACHE", "0")
+    client = GitHubAPIClient(transport="requests")
+    limited = response(403, {"Retry-After": "1"})
+    client.session.request = Mock(side_effect=[limited, response(204), response(403)])
+
+    # 次级速率限制的403不作为调用方处理的状态码返回，而是按Retry-After重试
+    assert client.api_request("DELETE", "repos/o/r/actions/runs/1", expected_statuses=(403, 404, 409)).status_code == 204
+    # 普通的403仍然直接返回给调用方
+    assert client.api_request("DELETE", "repos/o/r/actions/runs/2", expected_statuses=(403, 404, 409)).status_code == 403
+
+
+def test_http2_transport_matches_requests_semantics():
+    httpx = pytest.importorskip("httpx")
+    pytest.importorskip("h2")
+    from github_transport import HTTP2Transport
+
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        if request.url.path == "/slow":
+            raise httpx.ReadTimeout("timed out", request=request)
+        if request.url.path == "/down":
+            raise httpx.ConnectError("refused", request=request)
+        return httpx.Response(200, content=b"{}")
+
+    transport = HTTP2Transport()
+    transport._client = httpx.Client(transport=httpx.MockTransport(handler), timeout=None)
+
+    # 字典按表单编码发送；未指定timeout时不限时，与requests一致
+    transport.request("POST", "https://example.com/form", data={"a": "1"})
+    assert seen[-1].content == b"a=1"
+    assert seen[-1].headers["content-type"] == "application/x-www-form-urlencoded"
+    assert seen[-1].extensions["timeout"] == {"connect": None, "read": None, "write": None, "pool": None}
+    transport.request("GET", "https://example.com/", timeout=(3, 10))
+    assert seen[-1].extensions["timeout"]["connect"] == 3 and seen[-1].extensions["timeout"]["read"] == 10
+
+    with pytest.raises(requests.Timeout):
+        transport.request("GET", "https://example.com/slow")
+    with pytest.raises(requests.ConnectionError):
+        transport.request("GET", "https://example.com/down")
+
+
+def test_async_client_sends_through_shared_transport(monkeypatch):
+    import asyncio
+    from async_github_api_client import AsyncGitHubAPIClient
+
+    monkeypatch.setattr("async_github_api_client.retry_delay", lambda attempt, response=None: 0)
+    monkeypatch.setenv("GH_HTTP_CACHE", "0")
+    transport = make_transport(response(502), response(200))
+    client = AsyncGitHubAPIClient(transport=transport)
+
+    assert asyncio.run(client.api_request("GET", "repos/o/r/pulls")).status_code == 200
+    # 认证头部按请求发送，限速和指标由共享传输层负责
+    assert transport.session.request.call_args.kwargs["headers"]["Authorization"].startswith("token ")
+    assert transport.metrics.summary()["GET repos/{o}/{r}/pulls"]["retries"] == 1
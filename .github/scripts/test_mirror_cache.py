@@ -0,0 +1,124 @@
+# test_mirror_cache.py
+
+import asyncio
+import os
+import subprocess
+import tempfile
+
+from mirror_cache import MirrorCache, git_auth_env, run_git
+
+
+def make_mirror(cache, full_name, size, used_at):
+    path = cache.mirror_path(full_name)
+    os.makedirs(path)
+    with open(os.path.join(path, "pack"), "wb") as f:
+        f.write(b"x" * size)
+    os.utime(path, (used_at, used_at))
+    return path
+
+
+def git(*args, cwd=None):
+    command = ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args]
+    return subprocess.run(command, cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+def make_origin(tmp_path):
+    """创建一个带有 main 分支的裸仓库，返回其路径"""
+    work = tmp_path / "seed"
+    git("init", "-q", "-b", "main", str(work))
+    (work / "README").write_text("seed\n")
+    git("add", "README", cwd=work)
+    git("commit", "-q", "-m", "seed", cwd=work)
+    origin = str(tmp_path / "origin.git")
+    git("clone", "-q", "--bare", str(work), origin)
+    return origin
+
+
+def test_evicts_least_recently_used_until_under_limit(tmp_path):
+    cache = MirrorCache(str(tmp_path), max_bytes=250)
+    old = make_mirror(cache, "u/old", 100, 1000)
+    mid = make_mirror(cache, "u/mid", 100, 2000)
+    new = make_mirror(cache, "u/new", 100, 3000)
+
+    assert cache.evict() == 1
+    assert not os.path.exists(old)
+    assert os.path.exists(mid) and os.path.exists(new)
+
+
+def test_touch_protects_recently_used_mirror(tmp_path):
+    cache = MirrorCache(str(tmp_path), max_bytes=150)
+    first = make_mirror(cache, "u/first", 100, 1000)
+    second = make_mirror(cache, "u/second", 100, 2000)
+    cache.touch("u/first")
+
+    cache.evict()
+    assert os.path.exists(first) and not os.path.exists(second)
+
+
+def test_run_git_raises_on_failure_without_blocking(tmp_path):
+    async def run():
+        # 两条命令并发执行，失败的命令以 CalledProcessError 报告
+        return await asyncio.gather(
+            run_git("--version"),
+            run_git("rev-parse", "HEAD", cwd=str(tmp_path)),
+            return_exceptions=True,
+        )
+
+    version, failure = asyncio.run(run())
+    assert version.startswith("git version")
+    assert isinstance(failure, subprocess.CalledProcessError)
+
+
+def test_git_commands_respect_concurrency_limits(tmp_path, monkeypatch):
+    cache = MirrorCache(str(tmp_path / "mirrors"), network_concurrency=3, disk_concurrency=1)
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    in_flight = {"network": 0, "worktree": 0}
+    peak = {"network": 0, "worktree": 0}
+
+    async def fake_run_git(*args, cwd=None, timeout=None, env=None):
+        kind = "network" if args[0] in ("fetch", "push") else args[0]
+        in_flight[kind] += 1
+        peak[kind] = max(peak[kind], in_flight[kind])
+        await asyncio.sleep(0.01)
+        in_flight[kind] -= 1
+
+    async def use_worktree(i):
+        async with cache.worktree(f"u/r{i}", "main") as work_dir:
+            await cache.push(f"u/r{i}", work_dir, "main")
+
+    async def run():
+        await asyncio.gather(
+            *(cache.fetch(f"u/r{i}", "origin") for i in range(8)),
+            *(use_worktree(i) for i in range(4)),
+        )
+
+    monkeypatch.setattr("mirror_cache.run_git", fake_run_git)
+    asyncio.run(run())
+    # 同时在途的 git 网络操作（fetch、push）和工作树数量不超过配置的上限
+    assert peak == {"network": 3, "worktree": 1}
+
+
+def test_worktree_changes_are_pushed_to_origin(tmp_path):
+    origin = make_origin(tmp_path)
+    cache = MirrorCache(str(tmp_path / "mirrors"))
+
+    async def run():
+        assert await cache.ensure_mirror("u/r", origin)
+        async with cache.worktree("u/r", "main") as work_dir:
+            with open(os.path.join(work_dir, "README"), "a") as f:
+                f.write("change\n")
+            git("commit", "-q", "-am", "change", cwd=work_dir)
+            head = git("rev-parse", "HEAD", cwd=work_dir)
+            await cache.push("u/r", work_dir, "main")
+        return head
+
+    head = asyncio.run(run())
+    assert git("rev-parse", "main", cwd=origin) == head
+
+
+def test_auth_env_keeps_token_out_of_arguments():
+    env = git_auth_env("secret")
+    assert env["GIT_CONFIG_KEY_0"] == "http.https://github.com/.extraheader"
+    assert env["GIT_CONFIG_VALUE_0"].startswith("AUTHORIZATION: basic ")
+    assert "secret" not in env["GIT_CONFIG_VALUE_0"]
+    assert git_auth_env(None) == {}
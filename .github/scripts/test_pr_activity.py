@@ -0,0 +1,24 @@
+# test_pr_activity.py
+
+from pr_activity import activity_cutoff, latest_timeline_time, timeline_item_time
+
+
+def test_timeline_item_time_fields():
+    assert timeline_item_time({"event": "commented", "created_at": "2024-01-01T00:00:00Z"}) == "2024-01-01T00:00:00Z"
+    assert timeline_item_time({"event": "reviewed", "submitted_at": "2024-01-02T00:00:00Z"}) == "2024-01-02T00:00:00Z"
+    assert timeline_item_time({"event": "committed", "committer": {"date": "2024-01-03T00:00:00Z"}}) == "2024-01-03T00:00:00Z"
+    assert timeline_item_time({"event": "unknown"}) is None
+
+
+def test_latest_timeline_time():
+    items = [
+        {"created_at": "2024-01-02T00:00:00Z"},
+        {"committer": {"date": "2024-01-05T00:00:00Z"}},
+        {"event": "unknown"},
+    ]
+    assert latest_timeline_time(items) == "2024-01-05T00:00:00Z"
+    assert latest_timeline_time([]) is None
+
+
+def test_cutoff_is_comparable_with_github_timestamps():
+    assert "2000-01-01T00:00:00Z" < activity_cutoff() < "2999-01-01T00:00:00Z"
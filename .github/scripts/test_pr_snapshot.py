@@ -0,0 +1,19 @@
+# test_pr_snapshot.py
+
+from pr_snapshot import PullRequestSnapshot
+
+
+def test_closed_prs_are_hidden_from_later_steps():
+    snapshot = PullRequestSnapshot("o", "r", [{"number": 1}, {"number": 2}])
+    snapshot.mark_closed(1)
+    assert [pr["number"] for pr in snapshot.open_pull_requests()] == [2]
+    assert not snapshot.is_open(1) and snapshot.is_open(2)
+    assert len(snapshot) == 1
+
+
+def test_details_are_fetched_once():
+    snapshot = PullRequestSnapshot("o", "r", [{"number": 1}, {"number": 2, "mergeable": True, "mergeable_state": "clean"}])
+    assert snapshot.needs_details(1) and not snapshot.needs_details(2)
+    snapshot.update_details(1, {"mergeable": False, "mergeable_state": "behind", "title": "x"})
+    assert not snapshot.needs_details(1)
+    assert snapshot.get(1)["mergeable_state"] == "behind"
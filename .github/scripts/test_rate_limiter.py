@@ -0,0 +1,64 @@
+# test_rate_limiter.py
+
+import pytest
+
+from rate_limiter import RateLimiter, resource_for
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def headers(remaining, reset, limit=5000, resource="core"):
+    return {
+        "X-RateLimit-Remaining": str(remaining),
+        "X-RateLimit-Reset": str(reset),
+        "X-RateLimit-Limit": str(limit),
+        "X-RateLimit-Resource": resource,
+    }
+
+
+def test_resource_for():
+    assert resource_for("repos/o/r/pulls") == "core"
+    assert resource_for("search/issues?q=x") == "search"
+    assert resource_for("graphql") == "graphql"
+
+
+def test_no_pacing_before_first_response():
+    limiter = RateLimiter(clock=FakeClock())
+    assert limiter.reserve("core") == 0
+
+
+def test_burst_then_even_pacing():
+    clock = FakeClock()
+    limiter = RateLimiter(burst_fraction=0.01, clock=clock)
+    # 剩余1000次，窗口还剩1000秒：突发额度为50次，之后每秒1次
+    limiter.update(headers(1000, 2000), "core")
+
+    delays = [limiter.reserve("core") for _ in range(52)]
+    assert delays[:50] == [0] * 50
+    assert delays[50] == pytest.approx(1.0)
+    assert delays[51] == pytest.approx(2.0)
+
+
+def test_resources_are_tracked_separately():
+    clock = FakeClock()
+    limiter = RateLimiter(burst_fraction=0.01, clock=clock)
+    limiter.update(headers(0, 1060, limit=30, resource="search"), "search")
+
+    assert limiter.reserve("search") == pytest.approx(60)
+    assert limiter.reserve("core") == 0
+
+
+def test_retry_after_blocks_resource():
+    clock = FakeClock()
+    limiter = RateLimiter(clock=clock)
+    limiter.update({"Retry-After": "30"}, "core")
+
+    assert limiter.reserve("core") == pytest.approx(30)
+    clock.now += 30
+    assert limiter.reserve("core") == 0
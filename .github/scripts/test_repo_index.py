@@ -0,0 +1,23 @@
+# test_repo_index.py
+
+from repo_index import needs_run_probe, repo_capabilities
+
+REPO = {"full_name": "o/r", "archived": False, "disabled": False, "size": 10, "has_issues": True, "open_issues_count": 0}
+
+
+def test_archived_and_empty_repos_are_not_probed():
+    assert needs_run_probe(REPO)
+    assert not needs_run_probe(dict(REPO, archived=True))
+    assert not needs_run_probe(dict(REPO, size=0))
+
+
+def test_routing():
+    caps = repo_capabilities(REPO, run_count=3, last_run_id=9)
+    assert caps.needs_retention and not caps.needs_pr_steps and caps.skip_reason() is None
+
+    caps = repo_capabilities(dict(REPO, open_issues_count=2))
+    assert not caps.needs_retention and caps.needs_pr_steps
+
+    assert repo_capabilities(dict(REPO, archived=True, open_issues_count=2), run_count=3).skip_reason() == "已归档"
+    assert repo_capabilities(dict(REPO, size=0)).skip_reason() == "空仓库"
+    assert repo_capabilities(REPO).skip_reason() == "没有工作流运行和开放PR"
@@ -0,0 +1,55 @@
+# test_repo_state.py
+
+from collections import Counter
+
+from repo_state import RepoStateStore, mark_cleaned_on_success, repo_fingerprint
+from workflow_runs import DELETED, SKIPPED, WorkflowRun
+
+REPO = {"pushed_at": "2024-01-01T00:00:00Z", "updated_at": "2024-01-02T00:00:00Z", "open_issues_count": 0}
+
+
+def test_skip_only_when_fingerprint_unchanged(tmp_path):
+    path = str(tmp_path / "repo_state.sqlite3")
+    store = RepoStateStore(path)
+    fingerprint = repo_fingerprint(REPO, 42)
+    assert not store.should_skip("o/r", fingerprint)
+    store.mark_cleaned("o/r", fingerprint)
+    store.close()
+
+    store = RepoStateStore(path)
+    assert store.should_skip("o/r", repo_fingerprint(REPO, 42))
+    assert not store.should_skip("o/r", repo_fingerprint(REPO, 43))
+    assert not store.should_skip("o/r", repo_fingerprint(dict(REPO, pushed_at="2024-02-01T00:00:00Z"), 42))
+
+
+def test_repos_with_open_prs_are_never_skipped(tmp_path):
+    store = RepoStateStore(str(tmp_path / "repo_state.sqlite3"))
+    fingerprint = repo_fingerprint(dict(REPO, open_issues_count=1), 42)
+    store.mark_cleaned("o/r", fingerprint)
+    assert not store.should_skip("o/r", fingerprint)
+
+
+def run(id, status="completed", created_at="2024-01-01T00:00:00Z"):
+    return WorkflowRun(id, "ci", 1, status, "success", created_at, "octocat", "main", "sha")
+
+
+def test_marks_clean_with_latest_surviving_run(tmp_path):
+    store = RepoStateStore(str(tmp_path / "repo_state.sqlite3"))
+    repo = dict(REPO, full_name="o/r")
+    # 最新的运行（43）已被删除，指纹记录保留下来的最新运行
+    mark_cleaned_on_success(store, repo)(Counter({DELETED: 1}), [run(41), run(42, created_at="2024-01-02T00:00:00Z")])
+    assert store.should_skip("o/r", repo_fingerprint(REPO, 42))
+
+
+def test_repo_with_active_or_skipped_runs_is_not_marked_clean(tmp_path):
+    store = RepoStateStore(str(tmp_path / "repo_state.sqlite3"))
+    repo = dict(REPO, full_name="o/r")
+    on_complete = mark_cleaned_on_success(store, repo)
+
+    # 运行中的记录结束后可能需要删除，而指纹不会变化，因此不能记录为已清理
+    on_complete(Counter(), [run(41), run(42, status="in_progress")])
+    assert store.get("o/r") is None
+    on_complete(Counter({SKIPPED: 1}), [run(41)])
+    assert store.get("o/r") is None
+    on_complete(Counter(), [run(41)])
+    assert store.should_skip("o/r", repo_fingerprint(REPO, 41))
@@ -0,0 +1,44 @@
+# test_response_cache.py
+
+from unittest.mock import Mock
+
+from github_api_client import GitHubAPIClient, build_response
+from response_cache import ResponseCache
+
+
+def test_store_and_lookup(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    cache.store("https://api.github.com/x", {"ETag": '"v1"', "X-RateLimit-Remaining": "10"}, b"[1]")
+
+    assert cache.conditional_headers("https://api.github.com/x") == {"If-None-Match": '"v1"'}
+    headers, body = cache.lookup("https://api.github.com/x")
+    # 速率限制等易变头部不应被缓存
+    assert headers == {"ETag": '"v1"'}
+    assert body == b"[1]"
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_response_without_validators_is_not_stored(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    cache.store("https://api.github.com/x", {}, b"[]")
+
+    assert cache.conditional_headers("https://api.github.com/x") == {}
+    assert cache.stats()["misses"] == 1
+
+
+def test_api_request_serves_304_from_cache(tmp_path):
+    client = GitHubAPIClient(cache=ResponseCache(str(tmp_path / "cache.sqlite3")), transport="requests")
+    url = "https://api.github.com/users/u/repos"
+    first = build_response(200, {"ETag": '"v1"'}, b'[{"name": "repo1"}]', url)
+    second = build_response(304, {"ETag": '"v1"'}, b"", url)
+    client.session.request = Mock(side_effect=[first, second])
+
+    assert client.api_request("GET", "users/u/repos").json() == [{"name": "repo1"}]
+    response = client.api_request("GET", "users/u/repos")
+
+    assert response.status_code == 200
+    assert response.json() == [{"name": "repo1"}]
+    # 第二次请求应携带If-None-Match
+    assert client.session.request.call_args.kwargs["headers"]["If-None-Match"] == '"v1"'
+    assert client.session.request.call_args.kwargs["headers"]["Authorization"].startswith("token ")
+    assert client.cache.stats()["hits"] == 1
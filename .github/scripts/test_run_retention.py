@@ -0,0 +1,69 @@
+# test_run_retention.py
+
+import pytest
+
+from run_retention import (
+    DEPENDABOT,
+    EXPIRED,
+    NON_SUCCESSFUL,
+    SUPERSEDED,
+    plan_retention,
+    plan_retention_columnar,
+)
+from workflow_runs import WorkflowRun
+
+
+def run(id, name, day, conclusion="success", actor="octocat", status="completed"):
+    return WorkflowRun(id, name, 1, status, conclusion, f"2024-01-{day:02d}T00:00:00Z", actor, "main", "sha")
+
+
+def test_keeps_latest_successful_run_per_workflow():
+    runs = [run(1, "ci", 1), run(2, "ci", 3), run(3, "lint", 2)]
+    plan = plan_retention(runs)
+    assert [r.id for r in plan.deletions] == [1]
+    assert plan.matched[SUPERSEDED] == 1
+
+
+def test_each_run_deleted_once_and_rules_counted_separately():
+    runs = [
+        run(1, "ci", 1, conclusion="failure", actor="dependabot[bot]"),
+        run(2, "ci", 2),
+        run(3, "lint", 3, conclusion="failure"),
+        run(4, "deps", 4, actor="dependabot[bot]"),
+    ]
+    plan = plan_retention(runs)
+    # 最新运行如果失败或由dependabot触发，同样会被删除
+    assert sorted(r.id for r in plan.deletions) == [1, 3, 4]
+    assert plan.matched[SUPERSEDED] == 1
+    assert plan.matched[NON_SUCCESSFUL] == 2
+    assert plan.matched[DEPENDABOT] == 2
+    assert plan.total == 4
+
+
+def test_active_runs_are_not_deleted():
+    runs = [run(1, "ci", 1, conclusion=None, status="in_progress"), run(2, "ci", 2)]
+    plan = plan_retention(runs)
+    assert plan.deletions == []
+    assert plan.active == 1
+    assert plan.matched[SUPERSEDED] == 1
+
+
+def test_columnar_plan_matches_row_plan():
+    pytest.importorskip("numpy")
+    from datetime import datetime, timezone
+
+    runs = [
+        run(1, "ci", 1, conclusion="failure"),
+        run(2, "ci", 3),
+        run(3, "ci", 3),  # 与2创建时间相同，保留列表中靠前的一条
+        run(4, "lint", 2, actor="dependabot[bot]"),
+        run(5, "lint", 9, conclusion=None, status="queued"),
+        run(6, "deploy", 20),
+    ]
+    now = datetime(2024, 1, 25, tzinfo=timezone.utc)
+    row = plan_retention(runs, max_age_days=10, now=now)
+    column = plan_retention_columnar(runs, max_age_days=10, now=now)
+    assert [r.id for r in column.deletions] == [r.id for r in row.deletions]
+    assert column.matched == row.matched
+    assert column.active == row.active
+    assert column.matched[EXPIRED] == 5
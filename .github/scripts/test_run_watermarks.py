@@ -0,0 +1,31 @@
+# test_run_watermarks.py
+
+from run_watermarks import RunWatermarkStore, merge_snapshot, next_watermark
+from workflow_runs import WorkflowRun
+
+
+def run(id, day, status="completed"):
+    return WorkflowRun(id, "ci", 1, status, "success", f"2024-01-{day:02d}T00:00:00Z", "octocat", "main", "sha")
+
+
+def test_store_round_trip(tmp_path):
+    path = tmp_path / "state" / "run_watermarks.json"
+    store = RunWatermarkStore(str(path))
+    assert store.get("o", "r") == (None, [])
+    store.update("o", "r", "2024-01-02T00:00:00Z", [run(2, 2)])
+    store.save()
+
+    watermark, survivors = RunWatermarkStore(str(path)).get("o", "r")
+    assert watermark == "2024-01-02T00:00:00Z"
+    assert [(r.id, r.created_at) for r in survivors] == [(2, "2024-01-02T00:00:00Z")]
+
+
+def test_watermark_stays_at_oldest_active_run():
+    assert next_watermark([run(1, 1), run(3, 3)]) == "2024-01-03T00:00:00Z"
+    assert next_watermark([run(1, 1), run(2, 2, status="queued"), run(3, 3)]) == "2024-01-02T00:00:00Z"
+    assert next_watermark([]) is None
+
+
+def test_merge_prefers_newly_listed_runs():
+    merged = merge_snapshot([run(1, 1, status="in_progress")], [run(1, 1), run(2, 2)])
+    assert sorted((r.id, r.status) for r in merged) == [(1, "completed"), (2, "completed")]
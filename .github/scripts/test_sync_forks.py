@@ -0,0 +1,225 @@
+# test_sync_forks.py
+
+import asyncio
+import json
+import subprocess
+import time
+from unittest.mock import AsyncMock, Mock
+
+import sync_forks
+from fork_compare import ForkCompareCache
+from github_transport import build_response
+import mirror_cache
+from mirror_cache import MirrorCache
+
+URL = "https://api.github.com/repos/u/fork/merge-upstream"
+
+
+def make_transport(*responses):
+    transport = Mock()
+    transport.request_async = AsyncMock(side_effect=list(responses))
+    return transport
+
+
+def test_merge_upstream_without_write_access_is_not_retried_with_git(caplog):
+    transport = make_transport(build_response(403, {}, b'{"message": "Resource not accessible"}', URL))
+    cache = Mock()
+
+    asyncio.run(sync_forks.sync_fork(transport, {"full_name": "u/fork"}, cache, {"branch": "main"}))
+    # 令牌没有写权限时不回退到本地 git
+    transport.request_async.assert_awaited_once()
+    cache.ensure_mirror.assert_not_called()
+    assert "GH_TOKEN" in caplog.text
+
+
+def test_merge_upstream_posts_are_serialised_and_spaced(monkeypatch):
+    monkeypatch.setattr(sync_forks, "WRITE_INTERVAL", 0.05)
+    monkeypatch.setattr(sync_forks, "_write_lock", None)
+    monkeypatch.setattr(sync_forks, "_last_write", 0.0)
+    in_flight = []
+    started = []
+
+    async def request_async(method, url, **kwargs):
+        in_flight.append(url)
+        started.append(time.monotonic())
+        assert len(in_flight) == 1
+        await asyncio.sleep(0.01)
+        in_flight.remove(url)
+        return build_response(200, {}, b'{"merge_type": "fast-forward"}', url)
+
+    transport = Mock()
+    transport.request_async = request_async
+
+    async def run():
+        return await asyncio.gather(
+            *(sync_forks.merge_upstream(transport, f"u/fork{i}", "main") for i in range(3))
+        )
+
+    assert asyncio.run(run()) == ["merged"] * 3
+    # 间隔从上一次请求结束时算起
+    assert all(b - a >= 0.05 for a, b in zip(started, started[1:]))
+
+
+def precheck_transport(compare):
+    """按 URL 返回 fork 详情、分支 SHA 和 compare 结果的模拟传输层；父仓库的默认分支已从 master 改为 main"""
+    parent = {"full_name": "up/repo", "owner": {"login": "up"}, "clone_url": "https://github.com/up/repo.git",
+              "default_branch": "main"}
+    responses = {
+        "repos/u/fork": build_response(200, {}, json.dumps({"parent": parent}).encode(), URL),
+        "repos/u/fork/commits/master": build_response(200, {}, b"fork-sha", URL),
+        "repos/up/repo/commits/main": build_response(200, {}, b"parent-sha", URL),
+        "repos/u/fork/compare/master...up:main": build_response(200, {}, json.dumps(compare).encode(), URL),
+    }
+
+    async def request_async(method, url, **kwargs):
+        return responses[url.split(sync_forks.GITHUB_API_URL + "/", 1)[1]]
+
+    transport = Mock()
+    transport.request_async = AsyncMock(side_effect=request_async)
+    return transport
+
+
+def test_precheck_compares_fork_branch_with_parent_default_branch(tmp_path):
+    # fork 为 base、upstream 为 head：compare 的 ahead_by 是 upstream 领先的提交数，即 fork 落后的提交数
+    transport = precheck_transport({"ahead_by": 3, "behind_by": 1})
+    compare_cache = ForkCompareCache(str(tmp_path / "compare.db"))
+    repo = {"full_name": "u/fork", "default_branch": "master"}
+
+    upstream = asyncio.run(sync_forks.precheck_fork(transport, repo, compare_cache))
+    assert upstream["branch"] == "master"
+    assert upstream["parent_branch"] == "main"
+    requested = [call.args[1] for call in transport.request_async.await_args_list]
+    assert f"{sync_forks.GITHUB_API_URL}/repos/up/repo/commits/main" in requested
+    assert f"{sync_forks.GITHUB_API_URL}/repos/u/fork/compare/master...up:main" in requested
+    # 缓存中保存的是 (ahead_by, behind_by)，即 fork 领先 1 个、落后 3 个
+    assert compare_cache.get("fork-sha", "parent-sha") == (1, 3)
+
+
+def test_precheck_skips_fork_that_is_not_behind(tmp_path):
+    # fork 只领先 upstream，没有落后，不需要同步
+    transport = precheck_transport({"ahead_by": 0, "behind_by": 2})
+    compare_cache = ForkCompareCache(str(tmp_path / "compare.db"))
+    repo = {"full_name": "u/fork", "default_branch": "master"}
+
+    assert asyncio.run(sync_forks.precheck_fork(transport, repo, compare_cache)) is None
+    assert compare_cache.get("fork-sha", "parent-sha") == (2, 0)
+
+    # 两边 SHA 不变时再次预检查直接使用缓存，不再调用 compare 接口
+    transport.request_async.reset_mock()
+    assert asyncio.run(sync_forks.precheck_fork(transport, repo, compare_cache)) is None
+    assert not any("/compare/" in call.args[1] for call in transport.request_async.await_args_list)
+
+
+def git(*args, cwd=None):
+    command = ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args]
+    return subprocess.run(command, cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+def commit(work, name, content):
+    (work / name).write_text(content)
+    git("add", name, cwd=work)
+    git("commit", "-q", "-m", f"update {name}", cwd=work)
+    git("push", "-q", "origin", "main", cwd=work)
+
+
+def make_fork(tmp_path):
+    """创建本地的 upstream 和 fork 裸仓库，各自带一个工作副本用于提交"""
+    tmp_path.mkdir(parents=True, exist_ok=True)
+    seed = tmp_path / "seed"
+    git("init", "-q", "-b", "main", str(seed))
+    (seed / "README").write_text("seed\n")
+    git("add", "README", cwd=seed)
+    git("commit", "-q", "-m", "seed", cwd=seed)
+    remotes = {}
+    for name in ("upstream", "fork"):
+        remotes[name] = str(tmp_path / f"{name}.git")
+        git("clone", "-q", "--bare", str(seed), remotes[name])
+        git("clone", "-q", remotes[name], str(tmp_path / f"{name}-work"))
+    return remotes, tmp_path / "upstream-work", tmp_path / "fork-work"
+
+
+def sync_with_git(tmp_path, remotes, parent_branch="main"):
+    cache = MirrorCache(str(tmp_path / "mirrors"))
+    repo = {"full_name": "u/fork", "clone_url": remotes["fork"]}
+    upstream = {"url": remotes["upstream"], "branch": "main", "parent_branch": parent_branch}
+    return asyncio.run(sync_forks.sync_fork_with_git(repo, cache, upstream))
+
+
+def test_git_sync_pushes_merge_to_fork(tmp_path):
+    remotes, upstream_work, fork_work = make_fork(tmp_path)
+    commit(upstream_work, "upstream.txt", "upstream\n")
+    commit(fork_work, "fork.txt", "fork\n")
+
+    assert sync_with_git(tmp_path, remotes) == "merged"
+    # fork 的 main 分支是包含两边提交的合并提交，提交者为配置的身份
+    upstream_head = git("rev-parse", "main", cwd=remotes["upstream"])
+    fork_parents = git("log", "-1", "--format=%P", "main", cwd=remotes["fork"]).split()
+    assert upstream_head in fork_parents and len(fork_parents) == 2
+    assert git("log", "-1", "--format=%cn", "main", cwd=remotes["fork"]) == sync_forks.GIT_USER_NAME
+
+    # 再次同步时已是最新，不产生新的提交
+    assert sync_with_git(tmp_path, remotes) == "up-to-date"
+
+
+def test_git_sync_merges_parent_default_branch_into_fork_branch(tmp_path):
+    # 父仓库的默认分支改名为 trunk 后，fork 的 main 分支应从 trunk 获取更新
+    remotes, upstream_work, _ = make_fork(tmp_path)
+    (upstream_work / "upstream.txt").write_text("upstream\n")
+    git("add", "upstream.txt", cwd=upstream_work)
+    git("commit", "-q", "-m", "update upstream.txt", cwd=upstream_work)
+    git("push", "-q", "origin", "main:trunk", cwd=upstream_work)
+
+    assert sync_with_git(tmp_path, remotes, parent_branch="trunk") == "merged"
+    assert git("rev-parse", "main", cwd=remotes["fork"]) == git("rev-parse", "trunk", cwd=remotes["upstream"])
+
+
+def test_git_sync_leaves_conflicting_fork_unchanged(tmp_path):
+    remotes, upstream_work, fork_work = make_fork(tmp_path)
+    commit(upstream_work, "README", "upstream\n")
+    commit(fork_work, "README", "fork\n")
+    fork_head = git("rev-parse", "main", cwd=remotes["fork"])
+
+    assert sync_with_git(tmp_path, remotes) == "conflict"
+    assert git("rev-parse", "main", cwd=remotes["fork"]) == fork_head
+
+
+def test_concurrent_git_syncs_update_every_fork_within_limits(tmp_path, monkeypatch):
+    forks = []
+    for i in range(4):
+        remotes, upstream_work, _ = make_fork(tmp_path / f"r{i}")
+        commit(upstream_work, "upstream.txt", f"upstream {i}\n")
+        forks.append(remotes)
+    cache = MirrorCache(str(tmp_path / "mirrors"), network_concurrency=2, disk_concurrency=1)
+    in_flight = {"network": 0, "merge": 0}
+    peak = {"network": 0, "merge": 0}
+    real_run_git = mirror_cache.run_git
+
+    async def counting_run_git(*args, **kwargs):
+        kind = "network" if args[0] in ("clone", "fetch", "push") else "merge" if "merge" in args else None
+        if kind:
+            in_flight[kind] += 1
+            peak[kind] = max(peak[kind], in_flight[kind])
+        try:
+            return await real_run_git(*args, **kwargs)
+        finally:
+            if kind:
+                in_flight[kind] -= 1
+
+    monkeypatch.setattr(mirror_cache, "run_git", counting_run_git)
+    monkeypatch.setattr(sync_forks, "run_git", counting_run_git)
+
+    async def run():
+        return await asyncio.gather(*(
+            sync_forks.sync_fork_with_git(
+                {"full_name": f"u/fork{i}", "clone_url": remotes["fork"]},
+                cache,
+                {"url": remotes["upstream"], "branch": "main"},
+            )
+            for i, remotes in enumerate(forks)
+        ))
+
+    assert asyncio.run(run()) == ["merged"] * 4
+    # 每个 fork 都快进到了 upstream 的提交；并发的 git 命令不超过镜像缓存的上限
+    for remotes in forks:
+        assert git("rev-parse", "main", cwd=remotes["fork"]) == git("rev-parse", "main", cwd=remotes["upstream"])
+    assert peak["network"] <= 2 and peak["merge"] <= 1
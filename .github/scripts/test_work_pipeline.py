@@ -0,0 +1,38 @@
+# test_work_pipeline.py
+
+import threading
+
+from work_pipeline import WorkPipeline, when_all_done
+from workflow_runs import DELETED, FAILED
+
+
+def test_round_robin_between_repos():
+    order = []
+    gate = threading.Event()
+
+    def task(repo, i):
+        gate.wait()
+        order.append((repo, i))
+        return DELETED
+
+    pipeline = WorkPipeline(workers=1, max_pending=100)
+    for i in range(3):
+        pipeline.submit("o/big", "delete_run", task, "big", i)
+    pipeline.submit("o/small", "delete_run", task, "small", 0)
+    with pipeline:
+        gate.set()
+    # 小仓库的任务不必等大仓库的任务全部完成
+    assert order.index(("small", 0)) <= 1
+    assert pipeline.report["delete_run"][DELETED] == 4
+
+
+def test_failures_and_callback():
+    def boom():
+        raise RuntimeError("x")
+
+    results = []
+    with WorkPipeline(workers=2) as pipeline:
+        futures = [pipeline.submit("o/r", "delete_run", lambda: DELETED), pipeline.submit("o/r", "delete_run", boom)]
+        when_all_done(futures, results.extend)
+    assert results == [DELETED, FAILED]
+    assert pipeline.report["delete_run"] == {DELETED: 1, FAILED: 1}
@@ -0,0 +1,73 @@
+# test_workflow_runs.py
+
+import json
+
+import pytest
+
+from github_api_client import build_response
+from github_repo_manager import GitHubRepoManager
+from workflow_runs import TruncatedListing, latest_run_id, truncation_guard
+
+URL = "https://api.github.com/repos/o/r/actions/runs"
+
+
+def page(total_count, ids):
+    runs = [
+        {"id": i, "name": "ci", "workflow_id": 1, "status": "completed", "conclusion": "success",
+         "created_at": "2024-01-01T00:00:00Z", "actor": {"login": "octocat"}, "head_branch": "main", "head_sha": "s"}
+        for i in ids
+    ]
+    return build_response(200, {}, json.dumps({"total_count": total_count, "workflow_runs": runs}).encode(), URL)
+
+
+def test_guard_only_checks_first_page():
+    decode = truncation_guard(limit=2)
+    with pytest.raises(TruncatedListing):
+        decode(page(3, [1]))
+    decode = truncation_guard(limit=2)
+    assert [run.id for run in decode(page(2, [1, 2]))] == [1, 2]
+    # 之后的页面不再检查总数
+    assert [run.id for run in decode(page(5, [3]))] == [3]
+
+
+def test_truncated_filtered_listing_falls_back_to_full_listing(monkeypatch):
+    monkeypatch.setenv("GH_HTTP_CACHE", "0")
+    manager = GitHubRepoManager()
+    calls = []
+
+    def paginate(endpoint, params=None, per_page=100, decode=None):
+        calls.append(params)
+        # 带created过滤时报告超过返回上限；不带过滤时返回完整列表
+        response = page(1001, [3, 2]) if "created" in params else page(3, [3, 2, 1])
+        yield from decode(response)
+
+    manager.client.paginate = paginate
+    runs = list(manager.iter_workflow_runs("o", "r", created=">=2024-01-01T00:00:00Z"))
+    assert [run.id for run in runs] == [3, 2, 1]
+    assert "created" not in calls[-1]
+
+    # 没有过滤条件时不受返回上限影响，只请求一次完整列表
+    calls.clear()
+    assert [run.id for run in manager.iter_workflow_runs("o", "r")] == [3, 2, 1]
+    assert len(calls) == 1 and "created" not in calls[0]
+
+
+def test_completion_reports_latest_surviving_run(monkeypatch):
+    monkeypatch.setenv("GH_HTTP_CACHE", "0")
+    manager = GitHubRepoManager()
+    body = {"total_count": 2, "workflow_runs": [
+        {"id": 2, "name": "lint", "workflow_id": 2, "status": "completed", "conclusion": "failure",
+         "created_at": "2024-01-02T00:00:00Z", "actor": {"login": "octocat"}},
+        {"id": 1, "name": "ci", "workflow_id": 1, "status": "completed", "conclusion": "success",
+         "created_at": "2024-01-01T00:00:00Z", "actor": {"login": "octocat"}},
+    ]}
+    manager.client.paginate = lambda endpoint, params=None, per_page=100, decode=None: decode(
+        build_response(200, {}, json.dumps(body).encode(), URL)
+    )
+    manager.client.api_request = lambda method, endpoint, **kwargs: build_response(204, {}, b"", URL)
+    completed = []
+
+    manager.apply_retention("o", "r", on_complete=lambda outcomes, remaining: completed.append(remaining))
+    # 最新的运行失败被删除后，回调只收到保留下来的运行
+    assert [[run.id for run in remaining] for remaining in completed] == [[1]]
+    assert latest_run_id(completed[0]) == 1
@@ -5,11 +5,13 @@ import json
 import logging
 import sys
 from packaging.version import parse
-import httpx
+from requests.exceptions import RequestException
 
-# 定义全局常量，用于控制重试次数和请求之间的延迟
+from api_metrics import install_exit_handler
+from github_transport import get_transport
+
+# 定义全局常量，用于控制重试次数（重试间隔由共享传输层的重试策略决定）
 MAX_RETRIES = 3  # 最大重试次数
-DELAY_BETWEEN_REQUESTS = 1  # 请求之间的延迟，单位秒
 
 # 配置 logging
 logging.basicConfig(
@@ -40,30 +42,23 @@ async def fetch_latest_version(package):
     """
     异步获取指定Python包的最新版本。
 
-    尝试从PyPI网站获取指定包的最新版本信息。如果请求失败，将根据重试策略进行重试。
+    尝试从PyPI网站获取指定包的最新版本信息。如果请求失败，将根据共享传输层的重试策略进行重试。
     """
     base_url = "https://pypi.org/pypi/{}/json"
-    retries = 0
-    while retries <= MAX_RETRIES:
-        try:
-            logging.info(f"正在请求包 {package} 的最新版本...")
-            async with httpx.AsyncClient() as client:
-                response = await client.get(base_url.format(package))
-                response.raise_for_status()
-                releases = response.json()["releases"]
-                latest_version = max(parse(version) for version in releases)
-                logging.info(f"成功获取包 {package} 的最新版本: {latest_version}")
-                return str(latest_version)
-        except httpx.RequestError as e:
-            logging.warning(
-                f"请求错误: {e}，包: {package}，重试次数: {retries + 1}/{MAX_RETRIES}"
-            )
-            retries += 1
-            if retries <= MAX_RETRIES:
-                logging.info(f"等待 {DELAY_BETWEEN_REQUESTS} 秒后重试...")
-                await asyncio.sleep(DELAY_BETWEEN_REQUESTS)  # 等待一段时间后重试
-    logging.error(f"重试失败，无法获取包 {package} 的版本信息。")
-    return None
+    try:
+        logging.info(f"正在请求包 {package} 的最新版本...")
+        # 与其他维护脚本共用同一个连接池，重试由共享传输层处理
+        response = await get_transport().request_async(
+            "GET", base_url.format(package), max_retries=MAX_RETRIES + 1
+        )
+        response.raise_for_status()
+        releases = response.json()["releases"]
+        latest_version = max(parse(version) for version in releases)
+        logging.info(f"成功获取包 {package} 的最新版本: {latest_version}")
+        return str(latest_version)
+    except RequestException as e:
+        logging.error(f"请求错误: {e}，无法获取包 {package} 的版本信息。")
+        return None
 
 
 async def get_latest_versions(packages):
@@ -150,4 +145,5 @@ async def main():
 
 # 如果是直接运行这个文件，则执行main函数
 if __name__ == "__main__":
+    install_exit_handler(name="api_metrics_upgrade_packages")
     asyncio.run(main())
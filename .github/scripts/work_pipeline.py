@@ -0,0 +1,167 @@
+# 导入logging库，用于记录日志
+import logging
+# 导入os库，用于获取环境变量
+import os
+# 导入threading库，用于工作线程和条件变量
+import threading
+# 导入Counter、OrderedDict、defaultdict、deque，用于结果统计和按仓库轮转的任务队列
+from collections import Counter, OrderedDict, defaultdict, deque
+# 导入Future，用于把任务结果返回给提交方
+from concurrent.futures import Future
+
+from workflow_runs import FAILED
+
+# PR操作的结果（删除运行的结果见workflow_runs）
+CLOSED = "closed"
+COMMENTED = "commented"
+
+# 默认工作线程数
+DEFAULT_WORKERS = int(os.getenv('GH_PIPELINE_WORKERS', '8'))
+# 队列中等待执行的任务上限，超过时提交方阻塞（背压），避免列举远远跑在删除前面
+DEFAULT_MAX_PENDING = int(os.getenv('GH_PIPELINE_MAX_PENDING', '500'))
+
+
+class WorkPipeline:
+    """
+    生产者/消费者流水线：列举（生产者）把删除运行、关闭PR、发表评论等写操作提交到有界队列，
+    一组工作线程并发执行。每个仓库一条子队列，工作线程在仓库之间轮转取任务，
+    运行记录很多的仓库不会让其它仓库长时间等待。
+
+    用法:
+        with WorkPipeline(workers=8) as pipeline:
+            pipeline.submit("owner/repo", "delete_run", func, *args)
+        pipeline.log_report()
+    """
+
+    def __init__(self, workers=None, max_pending=None):
+        """
+        参数:
+        workers - 工作线程数，默认读取GH_PIPELINE_WORKERS（8）。
+        max_pending - 队列中等待执行的任务上限，默认读取GH_PIPELINE_MAX_PENDING（500）。
+        """
+        self.workers = workers or DEFAULT_WORKERS
+        self.max_pending = max_pending or DEFAULT_MAX_PENDING
+        self.report = defaultdict(Counter)  # {任务类型: Counter({结果: 数量})}
+        self._lanes = OrderedDict()  # {仓库: deque([任务])}，按轮转顺序排列
+        self._pending = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._threads = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def start(self):
+        """
+        启动工作线程。
+        """
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"pipeline-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, key, kind, func, *args):
+        """
+        提交一个任务；队列已满时阻塞，直到有工作线程取走任务。
+
+        参数:
+        key - 公平调度的分组键，通常为 "owner/repo"。
+        kind - 任务类型（如"delete_run"、"close_pr"），用于汇总结果。
+        func - 任务函数，返回结果字符串（如DELETED、SKIPPED、FAILED）。
+        *args - 传给func的参数。
+
+        返回:
+        Future，完成后的结果为func的返回值。
+        """
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("流水线已关闭")
+            while self._pending >= self.max_pending:
+                self._cond.wait()
+            self._lanes.setdefault(key, deque()).append((kind, func, args, future))
+            self._pending += 1
+            self._cond.notify_all()
+        return future
+
+    def _next_task(self):
+        """
+        按仓库轮转取出下一个任务；队列为空且已关闭时返回None。
+        """
+        with self._cond:
+            while not self._lanes and not self._closed:
+                self._cond.wait()
+            if not self._lanes:
+                return None
+            key, lane = next(iter(self._lanes.items()))
+            task = lane.popleft()
+            if lane:
+                self._lanes.move_to_end(key)
+            else:
+                del self._lanes[key]
+            self._pending -= 1
+            self._cond.notify_all()
+            return task
+
+    def _work(self):
+        while True:
+            task = self._next_task()
+            if task is None:
+                return
+            kind, func, args, future = task
+            try:
+                outcome = func(*args)
+            except Exception as e:
+                logging.error(f"流水线任务 {kind}{args} 出错: {e}")
+                outcome = FAILED
+            with self._cond:
+                self.report[kind][outcome] += 1
+            future.set_result(outcome)
+
+    def close(self):
+        """
+        停止接受新任务，等待队列中的任务全部执行完毕。
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def log_report(self):
+        """
+        按任务类型记录结果汇总，例如 delete_run: deleted=120, skipped=3, failed=1。
+        """
+        for kind, outcomes in sorted(self.report.items()):
+            summary = ", ".join(f"{outcome}={count}" for outcome, count in sorted(outcomes.items()))
+            logging.info(f"流水线结果 {kind}: {summary}")
+
+
+def when_all_done(futures, callback):
+    """
+    所有Future完成后，以按提交顺序排列的结果列表调用callback（在最后完成的工作线程中执行）。
+
+    参数:
+    futures - Future列表。
+    callback - 接收结果列表的函数。
+    """
+    if not futures:
+        callback([])
+        return
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def done(_):
+        with lock:
+            remaining[0] -= 1
+            finished = remaining[0] == 0
+        if finished:
+            callback([future.result() for future in futures])
+
+    for future in futures:
+        future.add_done_callback(done)
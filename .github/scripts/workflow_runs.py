@@ -0,0 +1,160 @@
+import json
+
+try:
+    import orjson  # 可选依赖：解码速度明显快于标准库json
+except ImportError:
+    orjson = None
+
+# 尚未结束的运行状态，删除这些运行会被GitHub拒绝
+ACTIVE_STATUSES = frozenset({"in_progress", "queued", "requested", "waiting", "pending"})
+
+# 删除单个运行的结果
+DELETED = "deleted"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+# 使用这些过滤条件时，/actions/runs 最多只返回最新的1000条结果
+CAPPED_FILTERS = frozenset({"created", "status", "actor", "branch", "event"})
+FILTERED_RESULT_LIMIT = 1000
+
+
+class TruncatedListing(Exception):
+    """
+    带过滤条件的运行列表超过 FILTERED_RESULT_LIMIT 条，GitHub只会返回其中最新的部分。
+    """
+
+    def __init__(self, total_count, limit=FILTERED_RESULT_LIMIT):
+        super().__init__(f"过滤后的运行共 {total_count} 条，超过 {limit} 条的返回上限")
+        self.total_count = total_count
+
+
+class WorkflowRun:
+    """
+    精简的工作流运行记录，只保留保留策略需要读取的字段。
+    GitHub返回的完整JSON带有repository、head_commit、actor等嵌套对象，
+    在运行记录很多的仓库中会占用大量内存；使用 __slots__ 的记录只占其中很小一部分。
+    """
+
+    __slots__ = (
+        "id",
+        "name",
+        "workflow_id",
+        "status",
+        "conclusion",
+        "created_at",
+        "actor",
+        "head_branch",
+        "head_sha",
+    )
+
+    def __init__(self, id, name, workflow_id, status, conclusion, created_at, actor, head_branch, head_sha):
+        self.id = id
+        self.name = name
+        self.workflow_id = workflow_id
+        self.status = status
+        self.conclusion = conclusion
+        self.created_at = created_at
+        self.actor = actor  # 触发者登录名（优先triggering_actor）
+        self.head_branch = head_branch
+        self.head_sha = head_sha
+
+    @classmethod
+    def from_json(cls, run):
+        """
+        从GitHub返回的运行记录字典中提取所需字段。
+
+        :param run: /actions/runs 返回的单条运行记录。
+        :return: WorkflowRun实例。
+        """
+        actor = run.get("triggering_actor") or run.get("actor")
+        # triggering_actor 结构为 dict，actor 也可能为 dict
+        if isinstance(actor, dict):
+            actor = actor.get("login")
+        return cls(
+            run["id"],
+            run.get("name"),
+            run.get("workflow_id"),
+            run.get("status"),
+            run.get("conclusion"),
+            run.get("created_at"),
+            actor,
+            run.get("head_branch"),
+            run.get("head_sha"),
+        )
+
+    def to_dict(self):
+        """
+        转换为可以写入JSON的字典（用于在状态目录中保存未删除的运行）。
+        """
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        从to_dict的结果恢复记录。
+        """
+        return cls(**{field: data.get(field) for field in cls.__slots__})
+
+    @property
+    def is_active(self):
+        """运行是否尚未结束（根据列表中获取到的状态判断）。"""
+        return self.status in ACTIVE_STATUSES
+
+    def __repr__(self):
+        return (
+            f"WorkflowRun(id={self.id}, name={self.name!r}, status={self.status!r}, "
+            f"conclusion={self.conclusion!r}, created_at={self.created_at!r})"
+        )
+
+
+def decode_runs_page(response):
+    """
+    解码一页 /actions/runs 响应并立即转换为精简记录，整页的原始字典随即被释放。
+    安装了orjson时使用orjson解码。
+
+    :param response: requests.Response对象。
+    :return: WorkflowRun列表。
+    """
+    return [WorkflowRun.from_json(run) for run in _load(response).get("workflow_runs", [])]
+
+
+def truncation_guard(limit=FILTERED_RESULT_LIMIT):
+    """
+    返回一个与 decode_runs_page 相同的解码函数，但在第一页的 total_count 超过上限时
+    抛出 TruncatedListing。分页器在产出条目、预取剩余页面之前就会解码第一页，
+    因此调用方可以在没有任何多余请求的情况下改用不带过滤条件的列表。
+
+    :param limit: 过滤结果的返回上限。
+    :return: 解码函数。
+    """
+    checked = []
+
+    def decode(response):
+        data = _load(response)
+        if not checked:
+            checked.append(True)
+            if data.get("total_count", 0) > limit:
+                raise TruncatedListing(data["total_count"], limit)
+        return [WorkflowRun.from_json(run) for run in data.get("workflow_runs", [])]
+
+    return decode
+
+
+def latest_run_id(runs):
+    """
+    返回最新一次运行的ID，与 per_page=1 探测得到的第一条记录相同（按创建时间倒序）。
+
+    :param runs: WorkflowRun可迭代对象。
+    :return: 运行ID；没有运行时为None。
+    """
+    latest = max(runs, key=lambda run: (run.created_at or "", run.id), default=None)
+    return latest.id if latest is not None else None
+
+
+def capped_filters(filters):
+    """返回会触发1000条返回上限的非空过滤条件"""
+    return {key for key, value in filters.items() if value is not None and key in CAPPED_FILTERS}
+
+
+def _load(response):
+    return orjson.loads(response.content) if orjson is not None else json.loads(response.content)